@@ -1,42 +1,116 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Match
 from pydantic import BaseModel
 from typing import List, Optional
-import uvicorn
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import httpx
 import re
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
 import base64
 import json
+import asyncio
+import hashlib
+import hmac
+import time
+import random
+from contextlib import asynccontextmanager
 from urllib.parse import quote
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
 
 load_dotenv()
 
+from doc_cache import create_document_cache, memory_budget
+from github_client import github_session, close_github_client, get_github_client, background_priority
+from singleflight import single_flight, flights
+from commit_store import CommitStore, get_branch_head_sha
+from commit_index import CommitIndex, StaleCursor
+from precompute import PrecomputeQueue
+from blob_store import get_blob_store
+from tree_walker import fetch_repository_tree, tree_cache
+import metrics
+from metrics import confluence_endpoint
+from timings import span, count, start_trace, trace_summary, wants_profile, RequestProfiler
+from file_ranking import CHARS_PER_TOKEN, candidate_pool, import_in_degree, rank_files, rank_tree, select_within_budget
+from cpu_pool import cpu_pool, CPU_POOL_INLINE_BYTES, CPU_POOL_INLINE_ITEMS
+from confluence_markup import chunk_markdown_for_confluence, markdown_to_confluence_storage, parse_evolution_commits
+from collaborators import aggregate_collaborators
+from model_router import get_model_router
+from diff_compaction import DIFF_FORMAT, compact_files
+from commit_graph import CommitGraph
+from commit_records import CommitRecord
+
 CONFLUENCE_BASE_URL = os.getenv("CONFLUENCE_BASE_URL")
 CONFLUENCE_USERNAME = os.getenv("CONFLUENCE_USERNAME") 
 CONFLUENCE_API_TOKEN = os.getenv("CONFLUENCE_API_TOKEN")
 CONFLUENCE_SPACE_KEY = os.getenv("CONFLUENCE_SPACE_KEY")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-
-# Configure Gemini
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel("models/gemini-2.5-pro")
-
-def gemini_response(text):
-    response = model.generate_content(text)
+# Chunked publishing: split documents whose storage body is larger than this into child pages
+CONFLUENCE_MAX_PAGE_BYTES = int(os.getenv("CONFLUENCE_MAX_PAGE_BYTES", "500000"))
+CONFLUENCE_MAX_CONCURRENCY = int(os.getenv("CONFLUENCE_MAX_CONCURRENCY", "4"))
+CONFLUENCE_MAX_RETRIES = int(os.getenv("CONFLUENCE_MAX_RETRIES", "4"))
+CONFLUENCE_RETRY_BASE_SECONDS = float(os.getenv("CONFLUENCE_RETRY_BASE_SECONDS", "1.0"))
+# Only these are retried after a 5xx or transport error; a POST may already have gone through
+CONFLUENCE_IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+# Page property holding the SHA-256 of the last published storage body (used by upserts)
+CONFLUENCE_HASH_PROPERTY = "gitlit_content_hash"
+
+# Built now so that a bad GEMINI_TASK_TIERS fails at startup rather than on the first prompt
+get_model_router()
+
+def gemini_response(text: str, task: str = "default") -> str:
+    """Send a prompt to the model tier routed for `task` (see model_router.py)"""
+    router = get_model_router()
+    tier = router.tier_for(task)
+    started = time.perf_counter()
+    try:
+        with span("gemini"):
+            response = router.client(tier).generate_content(text)
+    except Exception:
+        elapsed = time.perf_counter() - started
+        router.record(tier, elapsed, error=True)
+        metrics.gemini_requests.inc(status="error", tier=tier.name)
+        metrics.gemini_request_duration.observe(elapsed, tier=tier.name)
+        raise
+    elapsed = time.perf_counter() - started
+    metrics.gemini_request_duration.observe(elapsed, tier=tier.name)
+    metrics.gemini_requests.inc(status="ok", tier=tier.name)
+    prompt_tokens, response_tokens = record_gemini_tokens(text, response, tier.name)
+    cost = router.record(tier, elapsed, prompt_tokens, response_tokens)
+    metrics.gemini_cost.inc(cost, tier=tier.name)
+    count("gemini_calls")
+    count(f"gemini_calls_{tier.name}")
+    count("prompt_chars", len(text))
+    count("response_chars", len(response.text))
     return response.text
 
+def record_gemini_tokens(prompt: str, response, tier: str) -> tuple:
+    """Token counts from the response's usage metadata (estimated from characters if absent)"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) or len(prompt) // CHARS_PER_TOKEN
+    response_tokens = getattr(usage, "candidates_token_count", None) or len(response.text) // CHARS_PER_TOKEN
+    metrics.gemini_tokens.inc(prompt_tokens, kind="prompt", tier=tier)
+    metrics.gemini_tokens.inc(response_tokens, kind="response", tier=tier)
+    return prompt_tokens, response_tokens
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Stop queued background refreshes, then close pooled HTTP clients on shutdown
+    await precompute_queue.shutdown()
+    cpu_pool.shutdown()
+    if _confluence_client is not None:
+        await _confluence_client.aclose()
+    await close_github_client()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Project Handoff Assistant API",
     description="AI-powered documentation generation from Git repositories",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -46,7 +120,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+
+def route_template(request: Request) -> str:
+    """The matched route's path template (a bounded label set for metrics)"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Collect per-phase timings for every request and return them as a Server-Timing header"""
+    route = route_template(request)
+    method = request.method
+    status = 500
+    started = time.perf_counter()
+    metrics.http_in_flight.inc(route=route)
+    with start_trace() as trace:
+        profiler = None
+        if wants_profile(request.headers, request.query_params):
+            profiler = RequestProfiler(request.url.path)
+            profiler.start()
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            profile_path = profiler.stop() if profiler is not None else None
+            metrics.http_in_flight.dec(route=route)
+            metrics.http_request_duration.observe(time.perf_counter() - started, route=route, method=method)
+            metrics.http_requests.inc(route=route, method=method, status=status)
+        response.headers["Server-Timing"] = trace.server_timing()
+        if profile_path:
+            response.headers["X-Profile-Path"] = profile_path
+    return response
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 # New Pydantic models for our three endpoints
@@ -68,10 +177,12 @@ class DocumentationResponse(BaseModel):
     generated_at: datetime
     markdown_content: str
     processing_time_seconds: float
+    timings: Optional[dict] = None  # per-phase durations, call counts and prompt sizes
 
 class AskEvolutionResponse(BaseModel):
     answer: str
     commit_count_used: int
+    timings: Optional[dict] = None
 
 class CollaboratorContribution(BaseModel):
     name: str
@@ -95,6 +206,7 @@ class CollaboratorAnalysisResponse(BaseModel):
     collaborators: List[CollaboratorContribution]
     team_summary: str
     processing_time_seconds: float
+    timings: Optional[dict] = None
 
 # Existing models (keeping for backward compatibility)
 class ProjectStats(BaseModel):
@@ -145,7 +257,7 @@ async def get_github_branches(owner: str, repo: str) -> List[BranchInfo]:
         headers["Authorization"] = f"token {GITHUB_TOKEN}"
         headers["Accept"] = "application/vnd.github.v3+json"
     
-    async with httpx.AsyncClient() as client:
+    async with github_session() as client:
         # Get branches
         response = await client.get(github_api_url, headers=headers)
         if response.status_code == 404:
@@ -184,8 +296,219 @@ async def get_github_branches(owner: str, repo: str) -> List[BranchInfo]:
         
         return branches
 
-# Temporary storage for evolution-summary markdown (in-memory dict, keyed by repo+branch)
-evolution_summary_cache = {}
+def analysis_flight_key(repo_url: str, branch: str, **params) -> tuple:
+    """Single-flight key for an analysis: normalized repository, branch and remaining parameters"""
+    try:
+        owner, repo = parse_github_url(repo_url)
+        repo_key = f"{owner}/{repo}".lower()
+    except ValueError:
+        repo_key = repo_url
+    return (repo_key, branch, tuple(sorted(params.items())))
+
+# Temporary storage for evolution-summary markdown (keyed by repo+branch), bounded by size and TTL
+evolution_summary_cache = create_document_cache("evolution_summary")
+
+# Generated documents keyed by (owner/repo, branch, head SHA, document type). A document is
+# only valid for the exact commit it was generated from, so a push naturally invalidates it.
+generated_doc_store = create_document_cache("generated_docs")
+
+def generated_doc_key(owner: str, repo: str, branch: str, head_sha: str, document_type: str) -> str:
+    return "|".join([f"{owner}/{repo}".lower(), branch, head_sha, document_type])
+
+def cached_doc_response(repo_url: str, branch: str, document_type: str, cached: dict, start_time: datetime) -> DocumentationResponse:
+    return DocumentationResponse(
+        repository_url=repo_url,
+        branch=branch,
+        document_type=document_type,
+        generated_at=datetime.fromisoformat(cached["generated_at"]),
+        markdown_content=cached["markdown_content"],
+        processing_time_seconds=(datetime.now() - start_time).total_seconds(),
+        timings=trace_summary()
+    )
+
+# Branch commit lists, kept in memory and refreshed incrementally against the branch head
+commit_store = CommitStore()
+# The same histories in SQLite, indexed for paginated and filtered /api/commits queries
+commit_index = CommitIndex()
+
+# Diffs and commit stats never change for a given SHA, so they are cached by SHA alone
+diff_cache = create_document_cache("diffs")
+commit_detail_cache = create_document_cache("commit_details")
+
+# Commit-by-commit history markdown (with diffs) of the latest head of each branch; shared
+# by the evolution summary and history Q&A, and extended in the background after pushes
+history_digest_cache = create_document_cache("history_digests")
+
+async def fetch_branch_commits(client, owner: str, repo: str, branch: str, headers: dict) -> List[CommitRecord]:
+    """All commits on a branch (CommitRecords, newest first)"""
+    with span("fetch_commits"):
+        commits = await commit_store.get_commits(client, owner, repo, branch, headers)
+        # Indexing a full history takes a while, so it runs off the event loop
+        await asyncio.to_thread(commit_index.sync, commit_store.key(owner, repo, branch), commits)
+    return commits
+
+async def fetch_compare_files(client, owner: str, repo: str, base_sha: str, head_sha: str, headers: dict) -> Optional[List[dict]]:
+    """Files changed between two commits, compacted to [{filename, patch, note}], or None if GitHub returned an error"""
+    key = f"{owner}/{repo}".lower() + f"|{base_sha}...{head_sha}|{DIFF_FORMAT}"
+    files = diff_cache.get(key)
+    if files is not None:
+        return files
+    compare_url = f"https://api.github.com/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}"
+    resp = await client.get(compare_url, headers=headers)
+    if resp.status_code != 200:
+        return None
+    raw_files = resp.json().get("files", [])
+    files = compact_files(raw_files)
+    count("diff_chars_raw", sum(len(file.get("patch") or "") for file in raw_files))
+    count("diff_chars_compacted", sum(len(file["patch"] or "") for file in files))
+    diff_cache.set(key, files)
+    return files
+
+async def fetch_commit_detail(client, owner: str, repo: str, sha: str, headers: dict,
+                              errors: Optional[dict] = None) -> Optional[dict]:
+    """
+    Line stats and touched files (with per-file stats) of one commit, or None if GitHub
+    returned an error (its status is recorded in errors[sha] when errors is given)
+    """
+    key = f"{owner}/{repo}".lower() + f"|{sha}"
+    detail = commit_detail_cache.get(key)
+    if detail is not None:
+        return detail
+    resp = await client.get(f"https://api.github.com/repos/{owner}/{repo}/commits/{sha}", headers=headers)
+    if resp.status_code != 200:
+        if errors is not None:
+            errors[sha] = resp.status_code
+        return None
+    commit_data = resp.json()
+    detail = {
+        "additions": commit_data.get("stats", {}).get("additions", 0),
+        "deletions": commit_data.get("stats", {}).get("deletions", 0),
+        "files": [file["filename"] for file in commit_data.get("files", [])],
+        "file_stats": [[file["filename"], file.get("additions", 0), file.get("deletions", 0)]
+                       for file in commit_data.get("files", [])],
+    }
+    commit_detail_cache.set(key, detail)
+    return detail
+
+# Merged commits listed under a merge commit in first-parent histories
+MERGE_SUMMARY_MAX_COMMITS = 20
+
+def plan_commit_history(commits: List[CommitRecord], first_parent: bool) -> tuple:
+    """
+    Commits to describe (oldest first) and, for each merge commit, the number of commits it
+    merged and, with first_parent=True, the (sha, subject line) of the first
+    MERGE_SUMMARY_MAX_COMMITS of them, newest first
+    """
+    graph = CommitGraph(commits)
+    by_sha = {c.sha: c for c in commits}
+    if first_parent:
+        ordered = [by_sha[sha] for sha in graph.first_parent_chain(commits[0].sha)]
+    else:
+        # The listing is newest first, so reverse for chronological order
+        ordered = list(reversed(commits))
+    merged = {}
+    for commit in ordered:
+        if commit.is_merge:
+            parents = commit.parents
+            # Every commit is described on its own unless first_parent is set, so only the count is needed then
+            listed, n_merged = [], 0
+            for sha in graph.range(parents[:1], parents[1:]):
+                if first_parent and n_merged < MERGE_SUMMARY_MAX_COMMITS:
+                    listed.append((sha, by_sha[sha].subject))
+                n_merged += 1
+            merged[commit.sha] = (n_merged, listed)
+    return ordered, merged
+
+def history_sequence_hash(commits: List[CommitRecord]) -> str:
+    return hashlib.sha256("".join(c.sha for c in commits).encode("ascii")).hexdigest()
+
+def plan_history_update(commits: List[CommitRecord], first_parent: bool, previous: Optional[dict]) -> tuple:
+    """
+    plan_commit_history, plus how many of the described commits the previous digest of the
+    branch already covers: all of its commits when they are still the oldest ones described,
+    in the same order (the usual case after a push), otherwise none
+    """
+    ordered, merged = plan_commit_history(commits, first_parent)
+    reused = 0
+    if previous is not None and previous["count"] <= len(ordered) \
+            and history_sequence_hash(ordered[:previous["count"]]) == previous["sequence"]:
+        reused = previous["count"]
+    return ordered, merged, reused, history_sequence_hash(ordered)
+
+async def render_commit_sections(client, owner: str, repo: str, commits: List[CommitRecord], merged: dict,
+                                 headers: dict, first_parent: bool) -> str:
+    """The markdown section of each commit (oldest first), with its diff fetched from GitHub"""
+    with span("fetch_diffs"):
+        diffs = await asyncio.gather(*(
+            fetch_compare_files(client, owner, repo, c.parents[0], c.sha, headers)
+            for c in commits if len(c.parents) == 1
+        ))
+    diffs = iter(diffs)
+
+    parts = []
+    for commit in commits:
+        sha, parents = commit.sha, commit.parents
+        parts.append(f"### Commit `{sha[:7]}`\n")
+        parts.append(f"- **Date:** {commit.date}\n")
+        parts.append(f"- **Author:** {commit.author_name}\n")
+        parts.append(f"- **Message:** {commit.message}\n")
+
+        if not parents:
+            parts.append("_Initial commit (no diff)_\n\n")
+        elif sha in merged:
+            n_merged, listed = merged[sha]
+            parts.append(f"_Merge of {n_merged} commit{'s' if n_merged != 1 else ''} "
+                         f"(`{parents[0][:7]}..{parents[-1][:7]}`)_\n")
+            # With first_parent the merged commits are not described on their own, so list what they did
+            for merged_sha, subject in listed:
+                parts.append(f"  - `{merged_sha[:7]}` {subject}\n")
+            if first_parent and n_merged > len(listed):
+                parts.append(f"  - ...and {n_merged - len(listed)} more\n")
+        else:
+            files = next(diffs)
+            if files is None:
+                parts.append("_Could not fetch diff_\n")
+            else:
+                notes = []
+                for file in files:
+                    if file["patch"]:
+                        renamed = f" ({file['note']})" if file.get("note") else ""
+                        parts.append(f"\n#### `{file['filename']}`{renamed}\n```diff\n{file['patch']}\n```\n")
+                    elif file.get("note"):
+                        notes.append(f"- `{file['filename']}`: {file['note']}\n")
+                if notes:
+                    parts.append("\n#### Other changed files\n" + "".join(notes))
+        parts.append("\n---\n\n")
+    return "".join(parts)
+
+async def build_commit_history_markdown(client, owner: str, repo: str, repo_url: str, branch: str,
+                                        commits: List[CommitRecord], headers: dict, first_parent: bool = False) -> str:
+    """
+    Commit-by-commit markdown (metadata plus diff against the commit's first parent) for a
+    branch. Merge commits are summarized by the commits they merged instead of their diff;
+    with first_parent=True only the first-parent chain of the head is described.
+
+    The commit sections of a branch's latest head are cached. After a push only the new
+    commits are rendered (and their diffs fetched); the sections of the commits that were
+    already described are reused as long as the history before them did not change.
+    """
+    key = "|".join([f"{owner}/{repo}".lower(), branch, DIFF_FORMAT, "first-parent" if first_parent else "all"])
+    digest = history_digest_cache.get(key)
+    if digest is None or digest["head"] != commits[0].sha:
+        ordered, merged, reused, sequence = await asyncio.to_thread(plan_history_update, commits, first_parent, digest)
+        count("history_digest_commits_reused", reused)
+        count("history_digest_commits_rendered", len(ordered) - reused)
+        sections = await render_commit_sections(client, owner, repo, ordered[reused:], merged, headers, first_parent)
+        digest = {"head": commits[0].sha, "count": len(ordered), "sequence": sequence,
+                  "sections": (digest["sections"] if reused else "") + sections}
+        history_digest_cache.set(key, digest)
+
+    return "".join([
+        f"# How We Got Here - {repo_url} ({branch} branch{', first-parent history' if first_parent else ''})\n\n",
+        f"Total commits: {digest['count']}\n\n",
+        "## Commit-by-Commit Evolution\n\n",
+        digest["sections"],
+    ])
 
 # API Endpoints
 @app.get("/")
@@ -193,6 +516,77 @@ async def root():
     """Health check endpoint"""
     return {"message": "Project Handoff Assistant API is running", "status": "healthy"}
 
+def document_caches() -> list:
+    return [evolution_summary_cache, generated_doc_store, diff_cache, commit_detail_cache,
+            history_digest_cache, file_context_cache, tree_cache, timeline_cache]
+
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    """Hit/miss counters and size of the document caches in this worker"""
+    return {
+        "caches": [cache.stats() for cache in document_caches()],
+        "memory_budget": memory_budget.status(),
+        "commit_store": {**commit_store.stats, "branches": len(commit_store)},
+        "commit_index": commit_index.status(),
+        "single_flight": {**flights.stats, "in_flight": flights.in_flight()},
+        "precompute": precompute_queue.status(),
+        "blob_store": get_blob_store().status(),
+        "cpu_pool": cpu_pool.status()
+    }
+
+@app.get("/api/github-status")
+async def get_github_status():
+    """Rate-limit budget and conditional-request counters of the shared GitHub client"""
+    return get_github_client().status()
+
+@app.get("/api/model-status")
+async def get_model_status():
+    """Task -> model tier routing and per-tier calls, latency, tokens and estimated cost"""
+    return get_model_router().status()
+
+def collect_service_metrics():
+    """Scrape-time metric families: GitHub budget, caches, in-flight work"""
+    github = get_github_client()
+    yield ("gitlit_github_rate_limit_remaining", "gauge", "Requests left in the current GitHub rate-limit window",
+           [({}, github.rate_remaining)] if github.rate_remaining is not None else [])
+    yield ("gitlit_github_rate_limit_limit", "gauge", "Size of the GitHub rate-limit window",
+           [({}, github.rate_limit)] if github.rate_limit is not None else [])
+    yield ("gitlit_github_rate_limit_reset_timestamp_seconds", "gauge", "When the GitHub rate-limit window resets",
+           [({}, github.rate_reset_at)] if github.rate_reset_at is not None else [])
+
+    cache_stats = [cache.stats() for cache in document_caches()]
+    for name, metric_type, help_text, field in [
+        ("gitlit_cache_hits_total", "counter", "Document cache hits", "hits"),
+        ("gitlit_cache_misses_total", "counter", "Document cache misses", "misses"),
+        ("gitlit_cache_evictions_total", "counter", "Document cache evictions", "evictions"),
+        ("gitlit_cache_hit_ratio", "gauge", "Document cache hit ratio since start", "hit_ratio"),
+        ("gitlit_cache_entries", "gauge", "Entries held by a document cache", "entries"),
+        ("gitlit_cache_bytes", "gauge", "Bytes held by a document cache", "bytes"),
+    ]:
+        yield (name, metric_type, help_text, [({"cache": stats["namespace"]}, stats[field]) for stats in cache_stats])
+
+    blob_store = get_blob_store().status()
+    yield ("gitlit_blob_store_hits_total", "counter", "Blob store hits", [({}, blob_store["hits"])])
+    yield ("gitlit_blob_store_misses_total", "counter", "Blob store misses", [({}, blob_store["misses"])])
+    yield ("gitlit_blob_store_bytes", "gauge", "Compressed bytes in the blob store", [({}, blob_store["bytes"])])
+    yield ("gitlit_single_flight_in_flight", "gauge", "Distinct analyses currently running", [({}, flights.in_flight())])
+    yield ("gitlit_single_flight_coalesced_total", "counter", "Analysis calls that joined a running one",
+           [({}, flights.stats["coalesced"])])
+    pool = cpu_pool.status()
+    yield ("gitlit_cpu_pool_tasks_running", "gauge", "Tasks running in the CPU process pool", [({}, pool["running"])])
+    yield ("gitlit_cpu_pool_tasks_total", "counter", "CPU pool tasks by outcome",
+           [({"outcome": outcome}, pool[outcome]) for outcome in ("submitted", "inline", "timeouts", "failures")])
+    precompute = precompute_queue.status()
+    yield ("gitlit_precompute_jobs", "gauge", "Webhook refresh jobs by state",
+           [({"state": "pending"}, precompute["pending"]), ({"state": "running"}, precompute["running"])])
+
+metrics.REGISTRY.register_collector(collect_service_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of request, GitHub, Confluence, Gemini and cache metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Test endpoint to check Confluence connection
 @app.get("/api/test-confluence")
 async def test_confluence_connection():
@@ -240,11 +634,17 @@ async def save_documentation_to_confluence(
     repo_url: str, 
     branch: str, 
     document_type: str,  # "usage_guide" or "evolution_history"
-    space_key: str = None
+    space_key: str = None,
+    chunked: bool = False,  # split documents over CONFLUENCE_MAX_PAGE_BYTES into child pages
+    upsert: bool = True  # update an existing page with the same title (no-op if unchanged)
 ):
-    """Generate documentation and save it to Confluence"""
+    """
+    Generate documentation and save it to Confluence. A document already generated for the
+    branch's current head commit (e.g. just reviewed in the UI) is reused, so only the
+    Confluence upload is paid for.
+    """
     try:
-        # Generate the documentation first
+        # Generate the documentation first (served from generated_doc_store when available)
         if document_type == "usage_guide":
             doc_response = await generate_usage_guide(repo_url, branch)
         elif document_type == "evolution_history":
@@ -261,7 +661,9 @@ async def save_documentation_to_confluence(
         confluence_result = await save_to_confluence(
             title=title,
             markdown_content=doc_response.markdown_content,
-            space_key=space_key
+            space_key=space_key,
+            chunked=chunked,
+            upsert=upsert
         )
         
         return {
@@ -278,6 +680,8 @@ async def save_documentation_to_confluence(
 class MarkdownRequest(BaseModel):
     title: str
     markdown_content: str
+    chunked: bool = False
+    upsert: bool = True
 
 @app.post("/api/save-markdown-to-confluence")
 async def save_markdown_to_confluence(request: MarkdownRequest):
@@ -286,7 +690,9 @@ async def save_markdown_to_confluence(request: MarkdownRequest):
         confluence_result = await save_to_confluence(
             title=request.title,
             markdown_content=request.markdown_content,
-            space_key=None  # Use default from environment
+            space_key=None,  # Use default from environment
+            chunked=request.chunked,
+            upsert=request.upsert
         )
         
         return {
@@ -321,8 +727,14 @@ async def get_branches(repo_url: str):
 
 
 @app.get("/api/evolution-summary", response_model=DocumentationResponse)
-async def generate_evolution_summary(repo_url: str, branch: str):
-   """Generate 'How We Got Here' documentation from complete Git history using GitHub API"""
+@single_flight("evolution-summary", key_func=analysis_flight_key)
+async def generate_evolution_summary(repo_url: str, branch: str, refresh: bool = False, first_parent: bool = False):
+   """
+   Generate 'How We Got Here' documentation from complete Git history using GitHub API.
+   Returns the stored document when one was already generated for the branch's current head
+   commit, unless refresh=True. With first_parent=True only the first-parent chain of the
+   branch is described, and merges are summarized by the commits they brought in.
+   """
    try:
        start_time = datetime.now()
        owner, repo = parse_github_url(repo_url)
@@ -332,79 +744,32 @@ async def generate_evolution_summary(repo_url: str, branch: str):
            headers["Accept"] = "application/vnd.github.v3+json"
 
 
-       async with httpx.AsyncClient() as client:
-           # Get all commits for the branch (paginated)
-           commits = []
-           page = 1
-           while True:
-               commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
-               resp = await client.get(commits_url, headers=headers)
-               if resp.status_code != 200:
-                   raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
-               page_commits = resp.json()
-               if not page_commits:
-                   break
-               commits.extend(page_commits)
-               page += 1
-
+       async with github_session() as client:
+           with span("resolve_head"):
+               head_sha = await get_branch_head_sha(client, owner, repo, branch, headers)
+           doc_key = generated_doc_key(owner, repo, branch, head_sha,
+                                       "evolution_history_first_parent" if first_parent else "evolution_history")
+           cached = generated_doc_store.get(doc_key)
+           if cached and not refresh:
+               evolution_summary_cache.set(f"{repo_url}::{branch}", cached["markdown_content"])
+               return cached_doc_response(repo_url, branch, "evolution-summary", cached, start_time)
 
+           commits = await fetch_branch_commits(client, owner, repo, branch, headers)
            if not commits:
                raise HTTPException(status_code=404, detail="No commits found on this branch.")
 
-
-           # For each commit, get the diff (compare with previous commit)
-           summary = f"# How We Got Here - {repo_url} ({branch} branch)\n\n"
-           summary += f"Total commits: {len(commits)}\n\n"
-           summary += "## Commit-by-Commit Evolution\n\n"
-
-
-           # Commits are newest first, so reverse for chronological order
-           commits = list(reversed(commits))
-
-
-           for i, commit in enumerate(commits):
-               sha = commit["sha"]
-               author = commit["commit"]["author"]["name"]
-               date = commit["commit"]["author"]["date"]
-               message = commit["commit"]["message"]
-
-
-               summary += f"### Commit `{sha[:7]}`\n"
-               summary += f"- **Date:** {date}\n"
-               summary += f"- **Author:** {author}\n"
-               summary += f"- **Message:** {message}\n"
-
-
-               # Get diff with previous commit (skip for first commit)
-               if i == 0:
-                   summary += "_Initial commit (no diff)_\n\n"
-               else:
-                   prev_sha = commits[i-1]["sha"]
-                   compare_url = f"https://api.github.com/repos/{owner}/{repo}/compare/{prev_sha}...{sha}"
-                   compare_resp = await client.get(compare_url, headers=headers)
-                   if compare_resp.status_code == 200:
-                       files = compare_resp.json().get("files", [])
-                       for file in files:
-                           filename = file["filename"]
-                           patch = file.get("patch")
-                           if patch:
-                               # Truncate large diffs for readability
-                               if len(patch) > 2000:
-                                   patch = patch[:2000] + "\n...diff truncated...\n"
-                               summary += f"\n#### `{filename}`\n"
-                               summary += "```diff\n"
-                               summary += patch
-                               summary += "\n```\n"
-                   else:
-                       summary += "_Could not fetch diff_\n"
-               summary += "\n---\n\n"
+           # Commit-by-commit history with diffs (cached per head commit, shared with history Q&A)
+           summary = await build_commit_history_markdown(client, owner, repo, repo_url, branch, commits, headers,
+                                                         first_parent=first_parent)
 
        # Generate AI-enhanced summary using Gemini
        ai_enhanced_summary = get_how_we_got_here_markdown(summary, repo_url, branch)
        
        # Cache the evolution-summary markdown in memory
        cache_key = f"{repo_url}::{branch}"
-       evolution_summary_cache[cache_key] = ai_enhanced_summary
+       evolution_summary_cache.set(cache_key, ai_enhanced_summary)
+       generated_at = datetime.now()
+       generated_doc_store.set(doc_key, {"markdown_content": ai_enhanced_summary, "generated_at": generated_at.isoformat()})
        
        processing_time = (datetime.now() - start_time).total_seconds()
        
@@ -412,9 +777,10 @@ async def generate_evolution_summary(repo_url: str, branch: str):
            repository_url=repo_url,
            branch=branch,
            document_type="evolution-summary",
-           generated_at=datetime.now(),
+           generated_at=generated_at,
            markdown_content=ai_enhanced_summary,
-           processing_time_seconds=processing_time
+           processing_time_seconds=processing_time,
+           timings=trace_summary()
        )
 
    except Exception as e:
@@ -456,23 +822,78 @@ def get_how_we_got_here_markdown(evolution_str: str, repo_url: str, branch: str)
    )
 
    # Get enhanced markdown from Gemini
-   markdown_result = gemini_response(prompt)
+   markdown_result = gemini_response(prompt, task="changelog")
    return markdown_result
 
 
+async def fetch_file_content(client, owner: str, repo: str, commit_sha: str, path: str, blob_sha: str) -> Optional[bytes]:
+    """
+    Raw bytes of a file at a commit, or None if it could not be fetched. Content is looked up
+    by blob SHA in the local blob store first, so identical files are only downloaded once
+    across commits, branches and repositories.
+    """
+    blob_store = get_blob_store()
+    data = blob_store.get(blob_sha)
+    if data is None:
+        raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{commit_sha}/{path}"
+        file_resp = await client.get(raw_url)
+        if file_resp.status_code != 200:
+            return None
+        data = file_resp.content
+        blob_store.put(blob_sha, data)
+    return data
+
+# Per-file context extracted for the usage guide, keyed by git blob SHA: a file whose blob is
+# unchanged between commits (or branches) is never downloaded and truncated twice
+file_context_cache = create_document_cache("file_contexts")
+
+USAGE_GUIDE_SYNTAX_MAP = {
+    'py': 'python', 'js': 'javascript', 'ts': 'typescript', 'jsx': 'javascript',
+    'json': 'json', 'yaml': 'yaml', 'yml': 'yaml', 'toml': 'toml',
+    'md': 'markdown', 'txt': 'text', 'dockerfile': 'dockerfile',
+    'java': 'java', 'go': 'go', 'php': 'php', 'rb': 'ruby'
+}
+
+# Prompt budget for file contents in the usage guide (tokens are estimated at 4 characters each)
+USAGE_GUIDE_CONTEXT_TOKENS = int(os.getenv("USAGE_GUIDE_CONTEXT_TOKENS", "100000"))
+USAGE_GUIDE_CONTEXT_BYTES = USAGE_GUIDE_CONTEXT_TOKENS * CHARS_PER_TOKEN
+
+def usage_guide_content_limit(file_item: dict) -> int:
+    """Characters of a file kept in the usage-guide prompt"""
+    return 12000 if file_item["critical"] else 8000
+
+async def fetch_usage_guide_file_context(client, owner: str, repo: str, commit_sha: str, file_item: dict) -> Optional[str]:
+    """File content as included in the usage-guide prompt (size-limited), or None if it could not be fetched"""
+    max_content_length = usage_guide_content_limit(file_item)
+    key = f"{file_item['sha']}|{max_content_length}"
+    content = file_context_cache.get(key)
+    if content is not None:
+        return content
+
+    data = await fetch_file_content(client, owner, repo, commit_sha, file_item["path"], file_item["sha"])
+    if data is None:
+        return None
+    content = data.decode("utf-8", errors="replace")
+    if len(content) > max_content_length:
+        content = content[:max_content_length] + "\n# ...Content Truncated for Size...\n"
+    file_context_cache.set(key, content)
+    return content
+
 @app.get("/api/usage-guide", response_model=DocumentationResponse)
-async def generate_usage_guide(repo_url: str, branch: str):
+async def generate_usage_guide(repo_url: str, branch: str, refresh: bool = False):
     """
     Generate comprehensive usage documentation by analyzing ALL files in the entire GitHub repository.
     
     This function:
     1. Fetches the complete repository tree structure
-    2. Downloads and analyzes ALL relevant files (not just recent changes)
-    3. Categorizes files by type (frontend, backend, config, docs, tests)
-    4. Prioritizes critical files (package.json, requirements.txt, main entry points, READMEs)
+    2. Categorizes files by role and area (frontend, backend, config, docs, tests)
+    3. Ranks files by role, import-graph centrality, size and depth, prioritizing critical files
+       (package.json, requirements.txt, main entry points, READMEs)
+    4. Analyzes the best-ranked files that fit in the prompt budget (USAGE_GUIDE_CONTEXT_TOKENS)
     5. Uses AI to generate accurate installation and usage instructions
     
-    Returns a complete README.md with proper setup and run instructions.
+    Returns a complete README.md with proper setup and run instructions. A guide already
+    generated for the branch's current head commit is returned as-is unless refresh=True.
     """
     try:
         start_time = datetime.now()
@@ -484,87 +905,55 @@ async def generate_usage_guide(repo_url: str, branch: str):
         if GITHUB_TOKEN:
             headers["Authorization"] = f"token {GITHUB_TOKEN}"
 
-        async with httpx.AsyncClient() as client:
+        async with github_session() as client:
             # 1. Get the latest commit SHA to access the current state of the repository
-            commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=1"
-            commits_resp = await client.get(commits_url, headers=headers)
-            if commits_resp.status_code != 200:
-                raise HTTPException(status_code=commits_resp.status_code, detail="Failed to fetch commits")
-
-            latest_commit = commits_resp.json()[0]
-            commit_sha = latest_commit["sha"]
+            with span("resolve_head"):
+                commit_sha = await get_branch_head_sha(client, owner, repo, branch, headers)
+            doc_key = generated_doc_key(owner, repo, branch, commit_sha, "usage_guide")
+            cached = generated_doc_store.get(doc_key)
+            if cached and not refresh:
+                return cached_doc_response(repo_url, branch, "usage_guide", cached, start_time)
 
             # 2. Get the complete tree of ALL files in the repository (not just changed files)
-            tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{commit_sha}?recursive=1"
-            tree_resp = await client.get(tree_url, headers=headers)
-            if tree_resp.status_code != 200:
-                raise HTTPException(status_code=tree_resp.status_code, detail="Failed to fetch repository tree")
-
-            tree_data = tree_resp.json()
+            # (large repositories whose recursive listing GitHub truncates are walked per directory)
+            with span("fetch_tree"):
+                tree_data = await fetch_repository_tree(client, owner, repo, commit_sha, headers)
             all_files = [item for item in tree_data["tree"] if item["type"] == "blob"]
 
-            # 3. Analyze ALL files and categorize them properly
-            critical_files = []  # Files essential for understanding how to use the project
-            all_analyzed_files = []  # ALL files we'll analyze
+            # 3. Classify files by role and project area (vendored, generated and binary files are
+            # dropped) and rank them on path metadata: role, depth and size
+            with span("rank_files"):
+                ranked_files = await cpu_pool.run(rank_tree, all_files, inline=len(all_files) < CPU_POOL_INLINE_ITEMS)
+            critical_files = [file_item for file_item in ranked_files if file_item["critical"]]
             project_structure = {"frontend": [], "backend": [], "config": [], "docs": [], "tests": [], "other": []}
-            
-            # Categorize ALL files in the repository
-            for file_item in all_files:
-                path = file_item["path"]
-                filename = path.split("/")[-1]
-                file_ext = filename.split('.')[-1].lower() if '.' in filename else ''
-                
-                # Critical configuration and setup files (highest priority for usage guide)
-                if filename in ['package.json', 'requirements.txt', 'Pipfile', 'pyproject.toml', 'setup.py', 
-                              'Dockerfile', 'docker-compose.yml', 'docker-compose.yaml', 'Makefile', 'CMakeLists.txt',
-                              'pom.xml', 'build.gradle', 'Cargo.toml', 'go.mod', '.env.example', '.env.template']:
-                    critical_files.append(file_item)
-                    project_structure["config"].append(path)
-                
-                # Main entry points and startup files
-                elif filename in ['main.py', 'app.py', 'run.py', 'server.py', 'manage.py', 'wsgi.py', 'asgi.py',
-                                'index.js', 'main.js', 'server.js', 'app.js', 'start.js',
-                                'index.html', 'index.htm', 'main.html']:
-                    critical_files.append(file_item)
-                    if filename.endswith(('.py',)):
-                        project_structure["backend"].append(path)
-                    elif filename.endswith(('.js', '.html', '.htm')):
-                        project_structure["frontend"].append(path)
-                
-                # Documentation files (critical for understanding usage)
-                elif filename.lower() in ['readme.md', 'readme.txt', 'readme.rst', 'install.md', 'installation.md',
-                                        'usage.md', 'getting-started.md', 'quickstart.md', 'setup.md'] or \
-                     (filename.endswith('.md') and any(keyword in filename.lower() for keyword in 
-                      ['readme', 'install', 'setup', 'usage', 'getting', 'start', 'quick', 'tutorial', 'guide'])):
-                    critical_files.append(file_item)
-                    project_structure["docs"].append(path)
-                
-                # Categorize all other files by type and location
-                elif any(indicator in path.lower() for indicator in ['frontend', 'client', 'public', 'web', 'ui', 'www']):
-                    project_structure["frontend"].append(path)
-                    if filename.endswith(('.js', '.jsx', '.ts', '.tsx', '.vue', '.html', '.css', '.scss', '.less')):
-                        all_analyzed_files.append(file_item)
-                
-                elif any(indicator in path.lower() for indicator in ['backend', 'server', 'api', 'src', 'lib']):
-                    project_structure["backend"].append(path)
-                    if filename.endswith(('.py', '.js', '.ts', '.java', '.go', '.php', '.rb', '.rs', '.cpp', '.c', '.cs')):
-                        all_analyzed_files.append(file_item)
-                
-                elif any(indicator in path.lower() for indicator in ['test', 'tests', 'spec', '__tests__']):
-                    project_structure["tests"].append(path)
-                    if filename.endswith(('.py', '.js', '.ts', '.java', '.go', '.php', '.rb')):
-                        all_analyzed_files.append(file_item)
-                
-                else:
-                    project_structure["other"].append(path)
-                    # Include other important files
-                    if filename.endswith(('.py', '.js', '.ts', '.java', '.go', '.php', '.rb', '.md', '.yml', '.yaml', '.json', '.toml')):
-                        all_analyzed_files.append(file_item)
-            
-            # Combine critical files and other analyzed files (prioritize critical files)
-            files_to_analyze = critical_files + [f for f in all_analyzed_files if f not in critical_files]
-
-            # 4. Build comprehensive content with full repository analysis
+            for file_item in ranked_files:
+                project_structure[file_item["area"]].append(file_item["path"])
+
+            # The guide is driven by the critical files: if none of their blobs changed since the
+            # last guide for this branch, reuse that guide instead of calling Gemini again
+            critical_blobs = {file_item["path"]: file_item["sha"] for file_item in critical_files}
+            latest_key = generated_doc_key(owner, repo, branch, "latest", "usage_guide")
+            previous = generated_doc_store.get(latest_key)
+            if previous and not refresh and previous.get("critical_blobs") == critical_blobs:
+                generated_doc_store.set(doc_key, {"markdown_content": previous["markdown_content"], "generated_at": previous["generated_at"]})
+                return cached_doc_response(repo_url, branch, "usage_guide", previous, start_time)
+
+            # 4. Fetch the most promising files (cached by blob SHA, so only files that changed since an
+            # earlier run are downloaded), re-rank them with import-graph centrality and keep the best
+            # ones that fit in the prompt budget
+            candidates = candidate_pool(ranked_files, USAGE_GUIDE_CONTEXT_BYTES, usage_guide_content_limit)
+            with span("fetch_files"):
+                candidate_contexts = await asyncio.gather(*(
+                    fetch_usage_guide_file_context(client, owner, repo, commit_sha, file_item)
+                    for file_item in candidates
+                ), return_exceptions=True)
+            contexts_by_path = {file_item["path"]: content for file_item, content in zip(candidates, candidate_contexts)}
+            with span("rank_files"):
+                import_in_degree(candidates, {path: c for path, c in contexts_by_path.items() if isinstance(c, str)})
+                files_to_analyze = select_within_budget(rank_files(candidates), USAGE_GUIDE_CONTEXT_BYTES, usage_guide_content_limit)
+            file_contexts = [contexts_by_path[file_item["path"]] for file_item in files_to_analyze]
+
+            # 5. Build comprehensive content with full repository analysis
             collected_content = f"# Complete Repository Analysis: {repo_url}\n"
             collected_content += f"## Branch: {branch}\n## Commit SHA: {commit_sha}\n\n"
             
@@ -591,38 +980,17 @@ async def generate_usage_guide(repo_url: str, branch: str):
                     collected_content += f"- {file_item['path']}\n"
                 collected_content += "\n"
 
-            # 5. Download and analyze ALL relevant files from the repository
-            for file_item in files_to_analyze:
-                filepath = file_item["path"]
-                
-                # Get file content via raw API
-                raw_url = f"https://raw.githubusercontent.com/{owner}/{repo}/{commit_sha}/{filepath}"
-                try:
-                    file_resp = await client.get(raw_url)
-                    if file_resp.status_code == 200:
-                        content = file_resp.text
-                        
+            # Append the content of every selected file
+            with span("build_prompt"):
+                for file_item, content in zip(files_to_analyze, file_contexts):
+                    filepath = file_item["path"]
+                    if isinstance(content, Exception):
+                        collected_content += f"\n### File: {filepath}\n*Could not read file: {str(content)}*\n\n"
+                    elif content is not None:
                         # Determine syntax highlighting
                         file_ext = filepath.split('.')[-1].lower() if '.' in filepath else 'text'
-                        syntax_map = {
-                            'py': 'python', 'js': 'javascript', 'ts': 'typescript', 'jsx': 'javascript',
-                            'json': 'json', 'yaml': 'yaml', 'yml': 'yaml', 'toml': 'toml',
-                            'md': 'markdown', 'txt': 'text', 'dockerfile': 'dockerfile',
-                            'java': 'java', 'go': 'go', 'php': 'php', 'rb': 'ruby'
-                        }
-                        syntax = syntax_map.get(file_ext, 'text')
-                        
-                        # Keep more content for better analysis, but still manage size
-                        max_content_length = 8000  # Increased from 4000
-                        if len(content) > max_content_length:
-                            # For critical files, keep more content
-                            if file_item in critical_files:
-                                max_content_length = 12000
-                            content = content[:max_content_length] + "\n# ...Content Truncated for Size...\n"
-                        
+                        syntax = USAGE_GUIDE_SYNTAX_MAP.get(file_ext, 'text')
                         collected_content += f"\n### File: {filepath}\n```{syntax}\n{content}\n```\n"
-                except Exception as e:
-                    collected_content += f"\n### File: {filepath}\n*Could not read file: {str(e)}*\n\n"
 
             # 6. Generate comprehensive usage documentation analyzing the entire repository
             prompt = f"""
@@ -676,23 +1044,31 @@ COMPLETE REPOSITORY DATA:
 Return ONLY the markdown content for the README.md file.
 """
             
-            markdown = gemini_response(prompt)
+            markdown = gemini_response(prompt, task="usage_guide")
+            generated_at = datetime.now()
+            generated_doc_store.set(doc_key, {"markdown_content": markdown, "generated_at": generated_at.isoformat()})
+            generated_doc_store.set(latest_key, {
+                "markdown_content": markdown,
+                "generated_at": generated_at.isoformat(),
+                "critical_blobs": critical_blobs
+            })
             processing_time = (datetime.now() - start_time).total_seconds()
             
             return DocumentationResponse(
                 repository_url=repo_url,
                 branch=branch,
                 document_type="usage_guide",
-                generated_at=datetime.now(),
+                generated_at=generated_at,
                 markdown_content=markdown,
-                processing_time_seconds=processing_time
+                processing_time_seconds=processing_time,
+                timings=trace_summary()
             )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating usage guide: {str(e)}")
 
 @app.post("/api/ask-evolution-question", response_model=AskEvolutionResponse)
-async def ask_evolution_question(repo_url: str, branch: str, question: str):
+async def ask_evolution_question(repo_url: str, branch: str, question: str, first_parent: bool = False):
     """Ask Gemini a question about recent commit history from a GitHub branch"""
     try:
         owner, repo = parse_github_url(repo_url)
@@ -702,64 +1078,13 @@ async def ask_evolution_question(repo_url: str, branch: str, question: str):
             headers["Authorization"] = f"token {GITHUB_TOKEN}"
             headers["Accept"] = "application/vnd.github.v3+json"
 
-        async with httpx.AsyncClient() as client:
-            # Get all commits for the branch (paginated)
-            commits = []
-            page = 1
-            while True:
-                commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
-                resp = await client.get(commits_url, headers=headers)
-                if resp.status_code != 200:
-                    raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
-                page_commits = resp.json()
-                if not page_commits:
-                    break
-                commits.extend(page_commits)
-                page += 1
-
+        async with github_session() as client:
+            commits = await fetch_branch_commits(client, owner, repo, branch, headers)
             if not commits:
                 raise HTTPException(status_code=404, detail="No commits found on this branch.")
 
-            # Build summary markdown
-            summary = f"# How We Got Here - {repo_url} ({branch} branch)\n\n"
-            summary += f"Total commits: {len(commits)}\n\n"
-            summary += "## Commit-by-Commit Evolution\n\n"
-
-            commits = list(reversed(commits))  # chronological order
-
-            for i, commit in enumerate(commits):
-                sha = commit["sha"]
-                author = commit["commit"]["author"]["name"]
-                date = commit["commit"]["author"]["date"]
-                message = commit["commit"]["message"]
-
-                summary += f"### Commit `{sha[:7]}`\n"
-                summary += f"- **Date:** {date}\n"
-                summary += f"- **Author:** {author}\n"
-                summary += f"- **Message:** {message}\n"
-
-                # Skip diff for first commit
-                if i == 0:
-                    summary += "_Initial commit (no diff)_\n\n"
-                else:
-                    prev_sha = commits[i - 1]["sha"]
-                    compare_url = f"https://api.github.com/repos/{owner}/{repo}/compare/{prev_sha}...{sha}"
-                    compare_resp = await client.get(compare_url, headers=headers)
-                    if compare_resp.status_code == 200:
-                        files = compare_resp.json().get("files", [])
-                        for file in files:
-                            filename = file["filename"]
-                            patch = file.get("patch")
-                            if patch:
-                                if len(patch) > 2000:
-                                    patch = patch[:2000] + "\n...diff truncated...\n"
-                                summary += f"\n#### `{filename}`\n"
-                                summary += "```diff\n"
-                                summary += patch
-                                summary += "\n```\n"
-                    else:
-                        summary += "_Could not fetch diff_\n"
-                summary += "\n---\n\n"
+            summary = await build_commit_history_markdown(client, owner, repo, repo_url, branch, commits, headers,
+                                                          first_parent=first_parent)
 
         # Step 3: Ask Gemini
         prompt = (
@@ -771,17 +1096,19 @@ async def ask_evolution_question(repo_url: str, branch: str, question: str):
             "Be concise but informative. Reference commits when possible."
         )
 
-        answer = gemini_response(prompt)
+        answer = gemini_response(prompt, task="qa")
 
         return AskEvolutionResponse(
             answer=answer,
-            commit_count_used=len(commits)
+            commit_count_used=len(commits),
+            timings=trace_summary()
         )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error answering commit history question: {str(e)}")
 
 @app.get("/api/collaborator-analysis", response_model=CollaboratorAnalysisResponse)
+@single_flight("collaborator-analysis", key_func=analysis_flight_key)
 async def analyze_collaborators(repo_url: str, branch: str):
     """Analyze all collaborators and their contributions with minimal LLM usage"""
     try:
@@ -793,129 +1120,28 @@ async def analyze_collaborators(repo_url: str, branch: str):
             headers["Authorization"] = f"token {GITHUB_TOKEN}"
             headers["Accept"] = "application/vnd.github.v3+json"
 
-        async with httpx.AsyncClient() as client:
-            # Get all commits for the branch
-            commits = []
-            page = 1
-            while True:
-                commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
-                resp = await client.get(commits_url, headers=headers)
-                if resp.status_code != 200:
-                    raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
-                page_commits = resp.json()
-                if not page_commits:
-                    break
-                commits.extend(page_commits)
-                page += 1
-
+        async with github_session() as client:
+            commits = await fetch_branch_commits(client, owner, repo, branch, headers)
             if not commits:
                 raise HTTPException(status_code=404, detail="No commits found on this branch.")
 
-            # Group commits by author
-            author_commits = {}
-            for commit in commits:
-                author_name = commit["commit"]["author"]["name"]
-                author_email = commit["commit"]["author"]["email"]
-                author_key = f"{author_name}|{author_email}"
-                
-                if author_key not in author_commits:
-                    author_commits[author_key] = []
-                author_commits[author_key].append(commit)
-
-            # Analyze each collaborator
-            collaborators = []
-            all_commit_messages = []  # Collect all messages for single LLM call
-            
-            for author_key, author_commit_list in author_commits.items():
-                author_name, author_email = author_key.split("|", 1)
-                
-                # Get detailed stats for this author
-                files_modified = set()
-                lines_added = 0
-                lines_removed = 0
-                commit_dates = []
-                commit_messages = []
-                
-                for commit in author_commit_list:
-                    commit_date = commit["commit"]["author"]["date"]
-                    commit_dates.append(commit_date)
-                    commit_messages.append(commit["commit"]["message"])
-                    
-                    # Get commit details for file changes and line counts
-                    commit_detail_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{commit['sha']}"
-                    commit_resp = await client.get(commit_detail_url, headers=headers)
-                    if commit_resp.status_code == 200:
-                        commit_data = commit_resp.json()
-                        if "stats" in commit_data:
-                            lines_added += commit_data["stats"].get("additions", 0)
-                            lines_removed += commit_data["stats"].get("deletions", 0)
-                        
-                        # Track files modified
-                        for file in commit_data.get("files", []):
-                            files_modified.add(file["filename"])
-
-                # Calculate commit frequency
-                if len(commit_dates) > 1:
-                    first_date = min(commit_dates)
-                    last_date = max(commit_dates)
-                    first_dt = datetime.fromisoformat(first_date.replace('Z', '+00:00'))
-                    last_dt = datetime.fromisoformat(last_date.replace('Z', '+00:00'))
-                    weeks_active = max(1, (last_dt - first_dt).days / 7)
-                    commit_frequency = len(commit_dates) / weeks_active
-                else:
-                    commit_frequency = len(commit_dates)
-                    first_date = commit_dates[0] if commit_dates else ""
-                    last_date = commit_dates[0] if commit_dates else ""
-
-                # Determine primary languages based on file extensions
-                file_extensions = {}
-                for filename in files_modified:
-                    ext = filename.split('.')[-1].lower() if '.' in filename else 'no-ext'
-                    file_extensions[ext] = file_extensions.get(ext, 0) + 1
-                
-                # Map extensions to languages
-                ext_to_lang = {
-                    'py': 'Python', 'js': 'JavaScript', 'jsx': 'React/JavaScript', 
-                    'ts': 'TypeScript', 'tsx': 'React/TypeScript', 'java': 'Java',
-                    'cpp': 'C++', 'c': 'C', 'cs': 'C#', 'php': 'PHP', 'rb': 'Ruby',
-                    'go': 'Go', 'rs': 'Rust', 'swift': 'Swift', 'kt': 'Kotlin',
-                    'html': 'HTML', 'css': 'CSS', 'scss': 'SCSS', 'md': 'Markdown',
-                    'json': 'JSON', 'xml': 'XML', 'yaml': 'YAML', 'yml': 'YAML',
-                    'sql': 'SQL', 'sh': 'Shell', 'dockerfile': 'Docker'
-                }
-                
-                primary_languages = []
-                for ext, count in sorted(file_extensions.items(), key=lambda x: x[1], reverse=True)[:3]:
-                    lang = ext_to_lang.get(ext, ext.upper())
-                    primary_languages.append(lang)
-
-                # Generate rule-based functionality summary (no LLM call)
-                functionality_summary = generate_rule_based_summary(commit_messages, files_modified, primary_languages)
-                
-                # Generate key areas based on file patterns
-                key_areas = identify_key_areas(files_modified, commit_messages)
-
-                collaborator = CollaboratorContribution(
-                    name=author_name,
-                    email=author_email,
-                    commit_count=len(author_commit_list),
-                    lines_added=lines_added,
-                    lines_removed=lines_removed,
-                    files_modified=list(files_modified)[:20],  # Limit to 20 files for response size
-                    primary_languages=primary_languages,
-                    functionality_summary=functionality_summary,
-                    first_commit_date=min(commit_dates) if commit_dates else "",
-                    last_commit_date=max(commit_dates) if commit_dates else "",
-                    commit_frequency_per_week=round(commit_frequency, 2),
-                    key_areas=key_areas
-                )
-                collaborators.append(collaborator)
-                
-                # Collect commit messages for team summary
-                all_commit_messages.extend([f"{author_name}: {msg}" for msg in commit_messages[:5]])
-
-            # Sort collaborators by commit count (most active first)
-            collaborators.sort(key=lambda x: x.commit_count, reverse=True)
+            # Per-commit stats and touched files, fetched concurrently (and cached by SHA)
+            with span("fetch_commit_details"):
+                details = await asyncio.gather(*(fetch_commit_detail(client, owner, repo, c.sha, headers) for c in commits))
+            # The same details feed the hotspot index (all cache hits by now)
+            await index_file_changes(client, owner, repo, branch, commits, headers)
+
+            # Per-author aggregation runs in the CPU pool for long histories; it gets one
+            # plain tuple per commit
+            rows = []
+            for commit, detail in zip(commits, details):
+                detail = detail or {"additions": 0, "deletions": 0, "files": []}
+                rows.append((commit.author_name, commit.author_email, commit.date, commit.message,
+                             detail["additions"], detail["deletions"], tuple(detail["files"])))
+            with span("aggregate"):
+                contributions, all_commit_messages = await cpu_pool.run(
+                    aggregate_collaborators, rows, inline=len(rows) < CPU_POOL_INLINE_ITEMS)
+            collaborators = [CollaboratorContribution(**contribution) for contribution in contributions]
 
             # Generate team summary with single LLM call
             team_summary = generate_team_summary(collaborators, all_commit_messages[:50])  # Limit messages
@@ -929,94 +1155,14 @@ async def analyze_collaborators(repo_url: str, branch: str):
                 analysis_date=datetime.now(),
                 collaborators=collaborators,
                 team_summary=team_summary,
-                processing_time_seconds=processing_time
+                processing_time_seconds=processing_time,
+                timings=trace_summary()
             )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing collaborators: {str(e)}")
 
 
-def generate_rule_based_summary(commit_messages: List[str], files_modified: set, primary_languages: List[str]) -> str:
-    """Generate a functionality summary using rules instead of LLM"""
-    
-    # Analyze commit message patterns
-    patterns = {
-        'feature': ['add', 'implement', 'create', 'new', 'feature'],
-        'bugfix': ['fix', 'bug', 'error', 'issue', 'resolve'],
-        'refactor': ['refactor', 'cleanup', 'reorganize', 'improve'],
-        'ui': ['ui', 'frontend', 'css', 'style', 'design', 'interface'],
-        'backend': ['api', 'backend', 'server', 'database', 'endpoint'],
-        'test': ['test', 'testing', 'spec', 'unit', 'integration'],
-        'docs': ['doc', 'readme', 'documentation', 'comment'],
-        'config': ['config', 'setup', 'deploy', 'build', 'ci']
-    }
-    
-    category_counts = {category: 0 for category in patterns}
-    
-    for message in commit_messages:
-        message_lower = message.lower()
-        for category, keywords in patterns.items():
-            if any(keyword in message_lower for keyword in keywords):
-                category_counts[category] += 1
-    
-    # Find top categories
-    top_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-    active_categories = [cat for cat, count in top_categories if count > 0]
-    
-    # Generate summary based on patterns and file types
-    if not active_categories:
-        summary = f"Contributed {len(commit_messages)} commits"
-    else:
-        summary = f"Focused on {', '.join(active_categories)}"
-    
-    if primary_languages:
-        summary += f" using {', '.join(primary_languages[:2])}"
-    
-    if len(files_modified) > 10:
-        summary += f", touching {len(files_modified)} files across multiple areas"
-    elif files_modified:
-        summary += f", working on {len(files_modified)} files"
-    
-    return summary + "."
-
-
-def identify_key_areas(files_modified: set, commit_messages: List[str]) -> List[str]:
-    """Identify key work areas based on file patterns"""
-    
-    areas = set()
-    
-    # File-based area detection
-    for filename in files_modified:
-        filename_lower = filename.lower()
-        
-        if any(pattern in filename_lower for pattern in ['frontend', 'src', 'components', 'ui']):
-            areas.add('Frontend')
-        if any(pattern in filename_lower for pattern in ['backend', 'api', 'server']):
-            areas.add('Backend')
-        if any(pattern in filename_lower for pattern in ['test', 'spec']):
-            areas.add('Testing')
-        if any(pattern in filename_lower for pattern in ['config', 'setup', '.yml', '.yaml', 'docker']):
-            areas.add('Configuration')
-        if filename_lower.endswith(('.md', '.txt', '.rst')):
-            areas.add('Documentation')
-        if any(pattern in filename_lower for pattern in ['css', 'scss', 'style']):
-            areas.add('Styling')
-        if filename_lower.endswith(('.py', '.js', '.ts', '.jsx', '.tsx')):
-            areas.add('Core Development')
-    
-    # Commit message-based area detection
-    for message in commit_messages:
-        message_lower = message.lower()
-        if any(word in message_lower for word in ['database', 'db', 'sql']):
-            areas.add('Database')
-        if any(word in message_lower for word in ['security', 'auth', 'login']):
-            areas.add('Security')
-        if any(word in message_lower for word in ['performance', 'optimize']):
-            areas.add('Performance')
-    
-    return list(areas)[:5]  # Limit to top 5 areas
-
-
 def generate_team_summary(collaborators: List[CollaboratorContribution], sample_commits: List[str]) -> str:
     """Generate team summary with single LLM call"""
     
@@ -1052,7 +1198,7 @@ def generate_team_summary(collaborators: List[CollaboratorContribution], sample_
     )
     
     try:
-        return gemini_response(prompt)
+        return gemini_response(prompt, task="team_summary")
     except Exception:
         # Fallback to rule-based summary if LLM fails
         return f"Team of {len(collaborators)} contributors with {collaborators[0].name} as the main contributor ({collaborators[0].commit_count} commits)."
@@ -1074,142 +1220,492 @@ async def get_project_stats():
         raise HTTPException(status_code=500, detail=f"Error fetching project stats: {str(e)}")
 
 
+COMMITS_PAGE_SIZE = int(os.getenv("COMMITS_PAGE_SIZE", "100"))
+COMMITS_PAGE_MAX = 1000
+# Rows read from the index per chunk of an NDJSON stream
+COMMITS_STREAM_BATCH = 500
+
+def normalize_commit_date(value: Optional[str], name: str, end_of_day: bool = False) -> Optional[str]:
+    """ISO 8601 date or datetime as the UTC "YYYY-MM-DDTHH:MM:SSZ" form GitHub dates use"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO 8601 date or datetime")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_of_day and "T" not in value:
+        # A bare date as upper bound includes that whole day
+        parsed += timedelta(days=1, seconds=-1)
+    return parsed.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+async def index_path_commits(client, owner: str, repo: str, branch: str, head_sha: str, path: str, headers: dict):
+    """Record in the commit index which commits up to head_sha touch path (GitHub's path-filtered listing)"""
+    branch_key = commit_store.key(owner, repo, branch)
+    if await asyncio.to_thread(commit_index.has_path, branch_key, path, head_sha):
+        return
+    shas = []
+    page = 1
+    while True:
+        url = (f"https://api.github.com/repos/{owner}/{repo}/commits"
+               f"?sha={head_sha}&path={quote(path)}&per_page=100&page={page}")
+        resp = await client.get(url, headers=headers)
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail="Failed to list commits for path")
+        page_commits = resp.json()
+        shas.extend(c["sha"] for c in page_commits)
+        if len(page_commits) < 100:
+            break
+        page += 1
+    await asyncio.to_thread(commit_index.set_path_commits, branch_key, path, head_sha, shas)
+
+# Commit details fetched (and folded into the hotspot index) per round
+HOTSPOT_INDEX_BATCH = 500
+HOTSPOTS_MAX_LIMIT = 200
+
+def is_permanent_github_error(status: int) -> bool:
+    """4xx answers other than rate limiting (403/429) come back the same on every retry"""
+    return 400 <= status < 500 and status not in (403, 429)
+
+async def index_file_changes(client, owner: str, repo: str, branch: str, commits: List[CommitRecord], headers: dict):
+    """
+    Add the changed files of commits not yet in the hotspot index. Details come from the
+    commit detail cache where possible; merge commits are indexed without files, since their
+    changes already count through the merged commits, and so are commits GitHub will not
+    describe (a permanent 4xx), so they are not retried on every run.
+    """
+    branch_key = commit_store.key(owner, repo, branch)
+    pending = await asyncio.to_thread(commit_index.pending_file_commits, branch_key)
+    if not pending:
+        return
+    merges = {c.sha for c in commits if c.is_merge}
+    with span("index_file_changes"):
+        for start in range(0, len(pending), HOTSPOT_INDEX_BATCH):
+            batch = pending[start:start + HOTSPOT_INDEX_BATCH]
+            errors = {}
+            details = await asyncio.gather(*(
+                fetch_commit_detail(client, owner, repo, sha, headers, errors) for _, sha in batch if sha not in merges))
+            details = iter(details)
+            positions, changes = [], []
+            for position, sha in batch:
+                if sha in merges:
+                    positions.append(position)
+                    continue
+                detail = next(details)
+                if detail is None:
+                    if is_permanent_github_error(errors.get(sha, 0)):
+                        positions.append(position)
+                        count("commits_indexed_without_files")
+                    # Otherwise left pending; the next run retries it
+                    continue
+                positions.append(position)
+                # Entries cached before per-file stats were kept only have the file names
+                file_stats = detail.get("file_stats") or [[name, 0, 0] for name in detail["files"]]
+                changes.extend((position, name, additions, deletions) for name, additions, deletions in file_stats)
+            await asyncio.to_thread(commit_index.add_file_changes, branch_key, positions, changes)
+            count("commits_indexed", len(positions))
+
+async def backfill_hotspot_index(owner: str, repo: str, branch: str):
+    """Background job: fold every commit of the branch that is not indexed yet into the hotspot index"""
+    headers = {}
+    with background_priority():
+        async with github_session() as client:
+            commits = await fetch_branch_commits(client, owner, repo, branch, headers)
+            if commits:
+                await index_file_changes(client, owner, repo, branch, commits, headers)
+
+@app.get("/api/hotspots")
+async def get_hotspots(repo_url: str, branch: str, path: Optional[str] = None, limit: int = 20,
+                       sort: str = "score", pairs: int = 20):
+    """
+    Most frequently changed files of a branch, optionally below a directory (or for one
+    file): change count, churn, a recency-weighted change frequency, owners, and the files
+    most often changed together.
+
+    Answers come straight from the hotspot index. Commits not indexed yet (all of them on a
+    branch's first request) are fetched by a background job at background GitHub priority;
+    until it is done, indexed_commits < total_commits and indexing is true.
+    """
+    if sort not in ("score", "commits", "churn"):
+        raise HTTPException(status_code=400, detail="sort must be one of score, commits, churn")
+    if not 1 <= limit <= HOTSPOTS_MAX_LIMIT or not 0 <= pairs <= HOTSPOTS_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit and pairs must be at most {HOTSPOTS_MAX_LIMIT}")
+    try:
+        owner, repo = parse_github_url(repo_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {}
+    if GITHUB_TOKEN:
+        headers["Authorization"] = f"token {GITHUB_TOKEN}"
+        headers["Accept"] = "application/vnd.github.v3+json"
+
+    async with github_session() as client:
+        commits = await fetch_branch_commits(client, owner, repo, branch, headers)
+        if not commits:
+            raise HTTPException(status_code=404, detail="No commits found on this branch.")
+
+    branch_key = commit_store.key(owner, repo, branch)
+    with span("query_hotspots"):
+        result = await asyncio.to_thread(commit_index.hotspots, branch_key, path, limit, sort, pairs)
+    job_key = ("hotspots", branch_key)
+    if result["indexed_commits"] < len(commits) and not precompute_queue.is_active(job_key):
+        precompute_queue.schedule(job_key, lambda: backfill_hotspot_index(owner, repo, branch), delay=0)
+    return {"repository_url": repo_url, "branch": branch, "head_sha": commits[0].sha,
+            "total_commits": len(commits), **result, "indexing": precompute_queue.is_active(job_key),
+            "timings": trace_summary()}
+
 @app.get("/api/commits")
-async def get_commits(repo_url: str, branch: str):
-    """Return a list of commits for a given repo and branch."""
-    owner, repo = parse_github_url(repo_url)
+async def get_commits(repo_url: str, branch: str, cursor: Optional[str] = None, limit: Optional[int] = None,
+                      author: Optional[str] = None, path: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None, format: str = "json"):
+    """
+    Commits of a branch, newest first, served from the local commit index.
+
+    Returns `limit` commits (default COMMITS_PAGE_SIZE) and a next_cursor to pass for the next
+    page. author matches a name, email or GitHub login; path keeps commits touching a file or
+    directory; since/until are ISO 8601 dates or datetimes. format=ndjson streams one commit per
+    line (every match unless limit is given), then a {"done": true, ...} line with the cursor.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use 'json' or 'ndjson'")
+    if limit is not None and not 1 <= limit <= COMMITS_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {COMMITS_PAGE_MAX}")
+    filters = {
+        "author": author,
+        "path": path.strip("/") if path else None,
+        "since": normalize_commit_date(since, "since"),
+        "until": normalize_commit_date(until, "until", end_of_day=True),
+    }
+    try:
+        owner, repo = parse_github_url(repo_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     headers = {}
     if GITHUB_TOKEN:
         headers["Authorization"] = f"token {GITHUB_TOKEN}"
         headers["Accept"] = "application/vnd.github.v3+json"
-    async with httpx.AsyncClient() as client:
-        commits = []
-        page = 1
-        while True:
-            commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
-            resp = await client.get(commits_url, headers=headers)
-            if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
-            page_commits = resp.json()
-            if not page_commits:
+    async with github_session() as client:
+        branch_commits = await fetch_branch_commits(client, owner, repo, branch, headers)
+        if branch_commits and filters["path"]:
+            await index_path_commits(client, owner, repo, branch, branch_commits[0].sha, filters["path"], headers)
+    if not branch_commits:
+        return {"commits": [], "next_cursor": None, "total": 0}
+
+    # Index queries block on SQLite (and on the index lock during a sync), so they run off the event loop
+    branch_key = commit_store.key(owner, repo, branch)
+    try:
+        before = await asyncio.to_thread(commit_index.decode_cursor, branch_key, cursor) if cursor else None
+    except StaleCursor as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def next_cursor(position: Optional[int]) -> Optional[str]:
+        if position is None:
+            return None
+        return await asyncio.to_thread(commit_index.encode_cursor, branch_key, position)
+
+    if format == "json":
+        commits, position = await asyncio.to_thread(
+            commit_index.query, branch_key, before, limit or COMMITS_PAGE_SIZE, **filters)
+        total = await asyncio.to_thread(commit_index.count, branch_key, **filters)
+        return {"commits": commits, "next_cursor": await next_cursor(position), "total": total}
+
+    async def stream():
+        position, remaining, sent = before, limit, 0
+        while remaining is None or remaining > 0:
+            batch = COMMITS_STREAM_BATCH if remaining is None else min(remaining, COMMITS_STREAM_BATCH)
+            commits, position = await asyncio.to_thread(commit_index.query, branch_key, position, batch, **filters)
+            if commits:
+                yield "".join(json.dumps(c) + "\n" for c in commits)
+            sent += len(commits)
+            if remaining is not None:
+                remaining -= len(commits)
+            if position is None:
                 break
-            for c in page_commits:
-                commits.append({
-                    "sha": c["sha"],
-                    "author_name": c["commit"]["author"]["name"],
-                    "message": c["commit"]["message"],
-                    "date": c["commit"]["author"]["date"]
-                })
-            page += 1
-    return {"commits": commits}
+        yield json.dumps({"done": True, "commits": sent, "next_cursor": await next_cursor(position)}) + "\n"
 
-async def save_to_confluence(title: str, markdown_content: str, space_key: str = None) -> dict:
-    """Save markdown content to Confluence as a new page"""
-    
-    if not all([CONFLUENCE_BASE_URL, CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN]):
-        raise HTTPException(status_code=500, detail="Confluence credentials not configured")
-    
-    space_key = space_key or CONFLUENCE_SPACE_KEY
-    if not space_key:
-        raise HTTPException(status_code=500, detail="Confluence space key not provided")
-    
-    # Convert markdown to Confluence storage format
-    confluence_content = markdown_to_confluence_storage(markdown_content)
-    
-    # Confluence API authentication
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def confluence_headers() -> dict:
+    """Basic-auth JSON headers for the Confluence REST API"""
     auth_string = f"{CONFLUENCE_USERNAME}:{CONFLUENCE_API_TOKEN}"
-    auth_bytes = auth_string.encode('ascii')
-    auth_b64 = base64.b64encode(auth_bytes).decode('ascii')
-    
-    headers = {
+    auth_b64 = base64.b64encode(auth_string.encode('ascii')).decode('ascii')
+    return {
         "Authorization": f"Basic {auth_b64}",
         "Content-Type": "application/json",
         "Accept": "application/json"
     }
-    
-    # Create page payload
+
+# Pooled Confluence client shared by every publish; closed on app shutdown
+_confluence_client: Optional[httpx.AsyncClient] = None
+
+def get_confluence_client() -> httpx.AsyncClient:
+    global _confluence_client
+    if _confluence_client is None or _confluence_client.is_closed:
+        _confluence_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=CONFLUENCE_MAX_CONCURRENCY * 2,
+                                max_keepalive_connections=CONFLUENCE_MAX_CONCURRENCY)
+        )
+    return _confluence_client
+
+async def confluence_backoff(attempt: int, response: Optional[httpx.Response]):
+    """Sleep before retry number attempt + 1, honouring Retry-After when Confluence sends it"""
+    delay = CONFLUENCE_RETRY_BASE_SECONDS * (2 ** attempt)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    await asyncio.sleep(delay + random.uniform(0, delay / 2))
+
+async def confluence_request(method: str, path: str, **kwargs) -> httpx.Response:
+    """
+    Send a request to the Confluence REST API over the pooled client, retrying 429
+    responses with exponential backoff. 5xx responses and transport errors are
+    retried only for idempotent methods; for others they are returned (or raised).
+    """
+    url = f"{CONFLUENCE_BASE_URL}/wiki/rest/api{path}"
+    headers = confluence_headers()
+    idempotent = method in CONFLUENCE_IDEMPOTENT_METHODS
+    for attempt in range(CONFLUENCE_MAX_RETRIES + 1):
+        try:
+            started = time.perf_counter()
+            try:
+                with span("confluence"):
+                    response = await get_confluence_client().request(method, url, headers=headers, **kwargs)
+            finally:
+                metrics.confluence_request_duration.observe(time.perf_counter() - started, method=method,
+                                                            endpoint=confluence_endpoint(path))
+            metrics.confluence_requests.inc(method=method, endpoint=confluence_endpoint(path), status=response.status_code)
+            count("confluence_requests")
+            count("confluence_bytes", len(response.content))
+        except httpx.TransportError:
+            if attempt == CONFLUENCE_MAX_RETRIES or not idempotent:
+                raise
+            response = None
+
+        if response is not None and response.status_code != 429 and (response.status_code < 500 or not idempotent):
+            return response
+        if attempt == CONFLUENCE_MAX_RETRIES:
+            return response
+        await confluence_backoff(attempt, response)
+
+def _confluence_page_result(page_info: dict, title: str, space_key: str) -> dict:
+    return {
+        "success": True,
+        "page_id": page_info["id"],
+        "page_url": f"{CONFLUENCE_BASE_URL}/wiki{page_info['_links']['webui']}",
+        "title": title,
+        "space_key": space_key
+    }
+
+async def create_confluence_page(title: str, storage_content: str, space_key: str, parent_id: str = None) -> dict:
+    """Create one Confluence page from storage-format content, optionally under a parent page"""
     page_data = {
         "type": "page",
         "title": title,
         "space": {"key": space_key},
         "body": {
             "storage": {
-                "value": confluence_content,
+                "value": storage_content,
                 "representation": "storage"
             }
         }
     }
-    
-    async with httpx.AsyncClient() as client:
-        # Create the page
-        create_url = f"{CONFLUENCE_BASE_URL}/wiki/rest/api/content"
-        response = await client.post(create_url, headers=headers, json=page_data)
-        
-        if response.status_code == 200:
-            page_info = response.json()
-            page_url = f"{CONFLUENCE_BASE_URL}/wiki{page_info['_links']['webui']}"
-            return {
-                "success": True,
-                "page_id": page_info["id"],
-                "page_url": page_url,
-                "title": title,
-                "space_key": space_key
+    if parent_id:
+        page_data["ancestors"] = [{"id": parent_id}]
+
+    # A create is not retried blindly: after a 5xx or transport error the page may exist
+    # already, so it is looked up by title before the POST is sent again
+    for attempt in range(CONFLUENCE_MAX_RETRIES + 1):
+        try:
+            response = await confluence_request("POST", "/content", json=page_data)
+        except httpx.TransportError:
+            if attempt == CONFLUENCE_MAX_RETRIES:
+                raise
+            response = None
+        if response is not None and response.status_code < 500:
+            break
+        created = await find_confluence_page(title, space_key)
+        if created is not None:
+            count("confluence_creates_recovered")
+            return _confluence_page_result(created, title, space_key)
+        if attempt == CONFLUENCE_MAX_RETRIES:
+            break
+        await confluence_backoff(attempt, response)
+
+    if response.status_code == 200:
+        return _confluence_page_result(response.json(), title, space_key)
+
+    raise HTTPException(
+        status_code=response.status_code,
+        detail=f"Failed to create Confluence page: {response.text}"
+    )
+
+def confluence_content_hash(storage_content: str) -> str:
+    return hashlib.sha256(storage_content.encode("utf-8")).hexdigest()
+
+async def find_confluence_page(title: str, space_key: str) -> Optional[dict]:
+    """Look up a page by exact title in a space, with its version and stored content hash"""
+    response = await confluence_request("GET", "/content", params={
+        "title": title,
+        "spaceKey": space_key,
+        "type": "page",
+        "expand": f"version,metadata.properties.{CONFLUENCE_HASH_PROPERTY}"
+    })
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail=f"Failed to look up Confluence page: {response.text}")
+    results = response.json().get("results", [])
+    return results[0] if results else None
+
+async def set_confluence_content_hash(page_id: str, content_hash: str):
+    """Store the content hash as a page property, creating or bumping the property version"""
+    path = f"/content/{page_id}/property/{CONFLUENCE_HASH_PROPERTY}"
+    existing = await confluence_request("GET", path)
+    if existing.status_code == 200:
+        version = existing.json()["version"]["number"] + 1
+        response = await confluence_request("PUT", path, json={
+            "key": CONFLUENCE_HASH_PROPERTY, "value": {"sha256": content_hash}, "version": {"number": version}
+        })
+    else:
+        response = await confluence_request("POST", f"/content/{page_id}/property", json={
+            "key": CONFLUENCE_HASH_PROPERTY, "value": {"sha256": content_hash}
+        })
+    if response.status_code not in (200, 201):
+        raise HTTPException(status_code=response.status_code, detail=f"Failed to store Confluence content hash: {response.text}")
+
+async def upsert_confluence_page(title: str, storage_content: str, space_key: str, parent_id: str = None) -> dict:
+    """
+    Create the page, or update it in place if a page with this title already exists in the space.
+
+    The SHA-256 of the storage body is kept in a page property; when it matches the new body
+    the page is left untouched, so re-publishing an unchanged document costs one lookup.
+    """
+    content_hash = confluence_content_hash(storage_content)
+    existing = await find_confluence_page(title, space_key)
+
+    if existing is None:
+        result = await create_confluence_page(title, storage_content, space_key, parent_id=parent_id)
+        await set_confluence_content_hash(result["page_id"], content_hash)
+        return {**result, "action": "created"}
+
+    stored = existing.get("metadata", {}).get("properties", {}).get(CONFLUENCE_HASH_PROPERTY, {})
+    if stored.get("value", {}).get("sha256") == content_hash:
+        return {**_confluence_page_result(existing, title, space_key), "action": "unchanged"}
+
+    page_data = {
+        "id": existing["id"],
+        "type": "page",
+        "title": title,
+        "space": {"key": space_key},
+        "version": {"number": existing["version"]["number"] + 1},
+        "body": {
+            "storage": {
+                "value": storage_content,
+                "representation": "storage"
             }
-        else:
-            error_details = response.text
-            raise HTTPException(
-                status_code=response.status_code, 
-                detail=f"Failed to create Confluence page: {error_details}"
-            )
+        }
+    }
+    if parent_id:
+        page_data["ancestors"] = [{"id": parent_id}]
+
+    response = await confluence_request("PUT", f"/content/{existing['id']}", json=page_data)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"Failed to update Confluence page: {response.text}"
+        )
+    await set_confluence_content_hash(existing["id"], content_hash)
+    return {**_confluence_page_result(response.json(), title, space_key), "action": "updated"}
+
+async def delete_stale_confluence_children(parent_id: str, keep_ids: set) -> List[str]:
+    """Delete child pages of parent_id that were not part of the latest publish"""
+    response = await confluence_request("GET", f"/content/{parent_id}/child/page", params={"limit": 500})
+    if response.status_code != 200:
+        return []
+    deleted = []
+    for child in response.json().get("results", []):
+        if child["id"] not in keep_ids:
+            delete_response = await confluence_request("DELETE", f"/content/{child['id']}")
+            if delete_response.status_code in (200, 204):
+                deleted.append(child["id"])
+    return deleted
+
+def _check_confluence_config(space_key: Optional[str]) -> str:
+    if not all([CONFLUENCE_BASE_URL, CONFLUENCE_USERNAME, CONFLUENCE_API_TOKEN]):
+        raise HTTPException(status_code=500, detail="Confluence credentials not configured")
+
+    space_key = space_key or CONFLUENCE_SPACE_KEY
+    if not space_key:
+        raise HTTPException(status_code=500, detail="Confluence space key not provided")
+    return space_key
+
+async def save_to_confluence(title: str, markdown_content: str, space_key: str = None,
+                             chunked: bool = False, upsert: bool = False) -> dict:
+    """
+    Save markdown content to Confluence as a new page.
+
+    With chunked=True, documents whose storage body exceeds CONFLUENCE_MAX_PAGE_BYTES are
+    published as a parent page plus one child page per section (see save_chunked_to_confluence).
+    With upsert=True, existing pages with the same title are updated instead, and skipped
+    entirely when their content hash is unchanged (see upsert_confluence_page).
+    """
+    space_key = _check_confluence_config(space_key)
+
+    # Convert markdown to Confluence storage format
+    confluence_content = await cpu_pool.run(markdown_to_confluence_storage, markdown_content,
+                                            inline=len(markdown_content) < CPU_POOL_INLINE_BYTES)
+
+    if chunked and len(confluence_content.encode("utf-8")) > CONFLUENCE_MAX_PAGE_BYTES:
+        return await save_chunked_to_confluence(title, markdown_content, space_key, upsert=upsert)
+
+    if upsert:
+        return await upsert_confluence_page(title, confluence_content, space_key)
+    return await create_confluence_page(title, confluence_content, space_key)
+
+async def save_chunked_to_confluence(title: str, markdown_content: str, space_key: str, upsert: bool = False) -> dict:
+    """
+    Publish a large document as a parent page with one child page per top-level section.
+
+    The parent holds the text before the first section plus a children macro. Child pages are
+    created concurrently (bounded by CONFLUENCE_MAX_CONCURRENCY) and numbered so they keep
+    document order. With upsert=True every page is upserted and children left over from a
+    previous, longer version of the document are deleted.
+    """
+    publish_page = upsert_confluence_page if upsert else create_confluence_page
+    chunks = await cpu_pool.run(chunk_markdown_for_confluence, markdown_content, CONFLUENCE_MAX_PAGE_BYTES,
+                                inline=len(markdown_content) < CPU_POOL_INLINE_BYTES)
+    intro = ""
+    if chunks and chunks[0][0] is None:
+        intro = chunks.pop(0)[1]
+
+    children_macro = '<ac:structured-macro ac:name="children" ac:schema-version="2" />'
+    parent = await publish_page(title, intro + children_macro, space_key)
+
+    semaphore = asyncio.Semaphore(CONFLUENCE_MAX_CONCURRENCY)
+
+    async def create_child(index: int, heading: Optional[str], storage: str) -> dict:
+        child_title = f"{title} - {index + 1:02d}. {heading or 'Section'}"
+        async with semaphore:
+            return await publish_page(child_title, storage, space_key, parent_id=parent["page_id"])
+
+    children = await asyncio.gather(*(create_child(i, heading, storage) for i, (heading, storage) in enumerate(chunks)))
+
+    result = {**parent, "child_pages": list(children)}
+    if upsert:
+        result["deleted_child_page_ids"] = await delete_stale_confluence_children(
+            parent["page_id"], {child["page_id"] for child in children}
+        )
+    return result
 
-def markdown_to_confluence_storage(markdown_content: str) -> str:
-    """Convert markdown to Confluence storage format"""
-    import re
-    
-    content = markdown_content
-    
-    # Convert headers
-    content = re.sub(r'^### (.*?)$', r'<h3>\1</h3>', content, flags=re.MULTILINE)
-    content = re.sub(r'^## (.*?)$', r'<h2>\1</h2>', content, flags=re.MULTILINE)
-    content = re.sub(r'^# (.*?)$', r'<h1>\1</h1>', content, flags=re.MULTILINE)
-    
-    # Convert code blocks
-    def replace_code_block(match):
-        language = match.group(1) if match.group(1) else "text"
-        code = match.group(2).strip()
-        return f'''<ac:structured-macro ac:name="code" ac:schema-version="1">
-<ac:parameter ac:name="language">{language}</ac:parameter>
-<ac:plain-text-body><![CDATA[{code}]]></ac:plain-text-body>
-</ac:structured-macro>'''
-    
-    content = re.sub(r'```(\w+)?\n(.*?)\n```', replace_code_block, content, flags=re.DOTALL)
-    
-    # Convert inline code
-    content = re.sub(r'`([^`]+)`', r'<code>\1</code>', content)
-    
-    # Convert bold and italic
-    content = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', content)
-    content = re.sub(r'\*(.*?)\*', r'<em>\1</em>', content)
-    
-    # Convert bullet points
-    content = re.sub(r'^- (.*?)$', r'<ul><li>\1</li></ul>', content, flags=re.MULTILINE)
-    
-    # Convert numbered lists
-    content = re.sub(r'^\d+\. (.*?)$', r'<ol><li>\1</li></ol>', content, flags=re.MULTILINE)
-    
-    # Convert line breaks
-    content = content.replace('\n', '<br/>')
-    
-    return content
-from fastapi import Body
-from pydantic import BaseModel
 class EvolutionSummaryRequest(BaseModel):
     markdown: str
     repo_url: Optional[str] = None
     branch: Optional[str] = None
 
 @app.post("/api/parse-evolution-summary")
-def parse_evolution_summary(request: EvolutionSummaryRequest):
+async def parse_evolution_summary(request: EvolutionSummaryRequest):
     """
     Parse the evolution-summary markdown and return a JSON array of commits with sha, author, date, message, and changes.
     """
@@ -1218,106 +1714,362 @@ def parse_evolution_summary(request: EvolutionSummaryRequest):
     if not markdown.strip() and request.repo_url and request.branch:
         cache_key = f"{request.repo_url}::{request.branch}"
         markdown = evolution_summary_cache.get(cache_key, "")
-    # Debug: print the markdown being parsed
-    print("[DEBUG] Markdown sent to parse_evolution_summary:\n", markdown[:1000])
-    commits = []
-    commit_regex = re.compile(r"### Commit `([a-f0-9]+)`[\s\S]*?- \*\*Date:\*\* ([^\n]+)\n- \*\*Author:\*\* ([^\n]+)\n- \*\*Message:\*\* ([^\n]+)\n([\s\S]*?)(?=\n---|$)")
-    for match in commit_regex.finditer(markdown):
-        sha = match.group(1)
-        date = match.group(2)
-        author = match.group(3)
-        message = match.group(4)
-        changes = match.group(5).strip()
-        commits.append({
-            "sha": sha,
-            "date": date,
-            "author": author,
-            "message": message,
-            "changes": changes
-        })
+    commits = await cpu_pool.run(parse_evolution_commits, markdown, inline=len(markdown) < CPU_POOL_INLINE_BYTES)
     # Remove from cache after use
     if request.repo_url and request.branch:
         cache_key = f"{request.repo_url}::{request.branch}"
-        if cache_key in evolution_summary_cache:
-            del evolution_summary_cache[cache_key]
-    print(f"[DEBUG] Parsed {len(commits)} commits from markdown.")
+        evolution_summary_cache.delete(cache_key)
     return {"commits": commits}
 
-@app.get("/api/evolution-timeline")
-async def generate_evolution_timeline(repo_url: str, branch: str, n_clusters: int = 4):
+def summarize_era(era_commits: List[CommitRecord], era_index: int) -> dict:
+    """Ask Gemini for a title and summary of one era of commits"""
+    prompt = (
+        "You are an expert software project historian. "
+        "Given the following list of commit messages, authors, and dates, "
+        "write a concise but insightful summary of this era in the project's evolution. "
+        "Highlight major architectural changes, pivots, and the reasoning behind them. "
+        "Give this era a descriptive title.\n\n"
+        "Commits:\n" +
+        "\n".join([f"- {c.date} {c.author_name}: {c.message}" for c in era_commits]) +
+        "\n\nRespond in JSON with keys: era_title, summary."
+    )
+    try:
+        gemini_result = gemini_response(prompt, task="era_summary")
+        # Try to parse JSON from Gemini
+        import json as pyjson
+        era_json = pyjson.loads(gemini_result)
+        era_title = era_json.get("era_title") or f"Era {era_index+1}"
+        summary = era_json.get("summary") or gemini_result
+    except Exception:
+        era_title = f"Era {era_index+1}"
+        summary = gemini_result
+    return {
+        "era_title": era_title,
+        "summary": summary,
+        "commits": era_commits
+    }
+
+# Era groupings (commit SHAs per era) and era summaries, keyed by branch head and parameters
+timeline_cache = create_document_cache("evolution_timelines")
+
+def known_commit_paths(owner: str, repo: str, branch: str, commits: List[CommitRecord]) -> Optional[List[List[str]]]:
     """
-    Generate a code evolution timeline by clustering commits into eras and summarizing each era using Gemini.
+    Changed files of every commit, in the same order, when they are all known locally (the
+    hotspot index, then the commit detail cache); None as soon as one is missing. Nothing
+    is fetched from GitHub.
     """
+    indexed = commit_index.commit_paths(commit_store.key(owner, repo, branch))
+    repo_key = f"{owner}/{repo}".lower()
+    paths = []
+    for c in commits:
+        files = indexed.get(c.sha)
+        if files is None:
+            detail = commit_detail_cache.get(f"{repo_key}|{c.sha}")
+            if detail is None:
+                return None
+            files = detail["files"]
+        paths.append(files)
+    return paths
+
+async def group_timeline_commits(commits: List[CommitRecord], n_clusters: int, mode: str,
+                                 paths: Optional[List[List[str]]] = None) -> List[List[CommitRecord]]:
+    """
+    Split branch commits (newest first) into eras, each oldest first, eras in chronological
+    order. Contiguous eras also follow shifts in touched directories when the changed files
+    of every commit (paths, aligned with commits) are given.
+    """
+    from segmentation import cluster_messages, find_change_points
+
+    # Only dates, messages and paths go to the CPU pool, not the records
+    if mode == "contiguous":
+        # GitHub lists newest first; segment the chronological stream into consecutive eras
+        chronological = commits[::-1]
+        with span("segment"):
+            starts = await cpu_pool.run(find_change_points, [c.date for c in chronological],
+                                        [c.message for c in chronological], n_clusters,
+                                        paths[::-1] if paths is not None else None,
+                                        inline=len(commits) < CPU_POOL_INLINE_ITEMS)
+        ends = starts[1:] + [len(chronological)]
+        return [chronological[start:end] for start, end in zip(starts, ends)]
+
+    # Cluster commit messages. KMeans takes tens of milliseconds even on a handful of
+    # messages, so this always goes to the pool
+    with span("cluster"):
+        labels = await cpu_pool.run(cluster_messages, [c.message for c in commits], n_clusters)
+    # Group commits by cluster, sorted by date, and order eras by their first commit
+    eras = [[] for _ in range(min(n_clusters, len(commits)))]
+    for commit, label in zip(commits, labels):
+        eras[label].append(commit)
+    for era_commits in eras:
+        era_commits.sort(key=lambda c: c.date)
+    eras.sort(key=lambda era_commits: era_commits[0].date if era_commits else "")
+    return eras
+
+async def load_timeline_eras(repo_url: str, branch: str, n_clusters: int, mode: str) -> tuple:
+    """(cache key, eras as lists of CommitRecords) for the branch's current head"""
     owner, repo = parse_github_url(repo_url)
     headers = {}
     if GITHUB_TOKEN:
         headers["Authorization"] = f"token {GITHUB_TOKEN}"
         headers["Accept"] = "application/vnd.github.v3+json"
-    async with httpx.AsyncClient() as client:
-        # Fetch all commits
-        commits = []
-        page = 1
+    async with github_session() as client:
+        branch_commits = await fetch_branch_commits(client, owner, repo, branch, headers)
+    if not branch_commits:
+        raise HTTPException(status_code=404, detail="No commits found on this branch.")
+    key = "|".join([f"{owner}/{repo}".lower(), branch, branch_commits[0].sha, mode, str(n_clusters)])
+    groups = timeline_cache.get(key + "|groups")
+    if groups is None:
+        paths = None
+        if mode == "contiguous":
+            paths = await asyncio.to_thread(known_commit_paths, owner, repo, branch, branch_commits)
+        eras = await group_timeline_commits(branch_commits, n_clusters, mode, paths)
+        timeline_cache.set(key + "|groups", [[c.sha for c in era_commits] for era_commits in eras])
+        return key, eras
+    by_sha = {c.sha: c for c in branch_commits}
+    return key, [[by_sha[sha] for sha in shas] for shas in groups]
+
+@app.get("/api/evolution-timeline")
+@single_flight("evolution-timeline", key_func=analysis_flight_key)
+async def generate_evolution_timeline(repo_url: str, branch: str, n_clusters: int = 4, mode: str = "cluster",
+                                      summary_only: bool = False):
+    """
+    Generate a code evolution timeline by grouping commits into eras and summarizing each era using Gemini.
+
+    mode="cluster" groups commits by TF-IDF KMeans over their messages; mode="contiguous" splits the
+    chronological history into n_clusters consecutive eras at the strongest change points.
+    With summary_only=True each era carries its commit count and date range instead of its
+    commits, which are then loaded page by page from /api/evolution-timeline/era-commits.
+    """
+    if mode not in ("cluster", "contiguous"):
+        raise HTTPException(status_code=400, detail="Invalid mode. Use 'cluster' or 'contiguous'")
+    key, eras = await load_timeline_eras(repo_url, branch, n_clusters, mode)
+
+    summaries = timeline_cache.get(key + "|summaries")
+    if summaries is None:
+        summaries = []
+        for i, era_commits in enumerate(eras):
+            era = summarize_era(era_commits, i)
+            summaries.append({"era_title": era["era_title"], "summary": era["summary"]})
+        timeline_cache.set(key + "|summaries", summaries)
+
+    if not summary_only:
+        return {"eras": [{**summary, "commits": [c.to_dict() for c in era_commits]}
+                         for summary, era_commits in zip(summaries, eras)]}
+    return {"eras": [
+        {
+            **summary,
+            "era": i,
+            "commit_count": len(era_commits),
+            "first_date": era_commits[0].date if era_commits else None,
+            "last_date": era_commits[-1].date if era_commits else None,
+        }
+        for i, (summary, era_commits) in enumerate(zip(summaries, eras))
+    ]}
+
+@app.get("/api/evolution-timeline/era-commits")
+async def get_timeline_era_commits(repo_url: str, branch: str, era: int, n_clusters: int = 4, mode: str = "cluster",
+                                   offset: int = 0, limit: int = COMMITS_PAGE_SIZE):
+    """One page of an era's commits (oldest first) for timelines fetched with summary_only=True"""
+    if mode not in ("cluster", "contiguous"):
+        raise HTTPException(status_code=400, detail="Invalid mode. Use 'cluster' or 'contiguous'")
+    if not 1 <= limit <= COMMITS_PAGE_MAX or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {COMMITS_PAGE_MAX} and offset non-negative")
+    _, eras = await load_timeline_eras(repo_url, branch, n_clusters, mode)
+    if not 0 <= era < len(eras):
+        raise HTTPException(status_code=404, detail="No such era")
+    era_commits = eras[era]
+    page = [c.to_dict() for c in era_commits[offset:offset + limit]]
+    next_offset = offset + len(page) if offset + len(page) < len(era_commits) else None
+    return {"era": era, "commits": page, "total": len(era_commits), "next_offset": next_offset}
+
+# Multi-repository batch analysis
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Shared by every batch request so concurrent batches don't multiply the load on GitHub and Gemini
+_batch_slots = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+BATCH_DOCUMENT_TYPES = {
+    "usage_guide": lambda repo_url, branch: generate_usage_guide(repo_url, branch),
+    "evolution_history": lambda repo_url, branch: generate_evolution_summary(repo_url, branch),
+    "collaborator_analysis": lambda repo_url, branch: analyze_collaborators(repo_url, branch),
+    "evolution_timeline": lambda repo_url, branch: generate_evolution_timeline(repo_url, branch),
+}
+
+class BatchAnalysisRequest(BaseModel):
+    repo_urls: List[str] = []
+    org: Optional[str] = None  # analyze every repository of this GitHub organization
+    branch: Optional[str] = None  # defaults to each repository's default branch
+    document_types: List[str] = ["usage_guide"]
+
+async def list_org_repositories(org: str) -> List[dict]:
+    """List (repo_url, default_branch) for every repository in a GitHub organization"""
+    repos = []
+    page = 1
+    async with github_session() as client:
         while True:
-            commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
-            resp = await client.get(commits_url, headers=headers)
+            resp = await client.get(f"https://api.github.com/orgs/{org}/repos?per_page=100&page={page}")
             if resp.status_code != 200:
-                raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
-            page_commits = resp.json()
-            if not page_commits:
+                raise HTTPException(status_code=resp.status_code, detail=f"Error listing repositories for {org}")
+            page_repos = resp.json()
+            if not page_repos:
                 break
-            for c in page_commits:
-                commits.append({
-                    "sha": c["sha"],
-                    "author": c["commit"]["author"]["name"],
-                    "date": c["commit"]["author"]["date"],
-                    "message": c["commit"]["message"],
-                })
+            repos.extend({"repo_url": r["html_url"], "branch": r.get("default_branch")} for r in page_repos if not r.get("archived"))
             page += 1
-    if not commits:
-        raise HTTPException(status_code=404, detail="No commits found on this branch.")
-    # Cluster commit messages
-    messages = [c["message"] for c in commits]
-    vectorizer = TfidfVectorizer(stop_words="english")
-    X = vectorizer.fit_transform(messages)
-    n_clusters = min(n_clusters, len(commits))
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(X)
-    # Group commits by cluster
-    eras = []
-    for cluster_id in range(n_clusters):
-        era_commits = [c for i, c in enumerate(commits) if labels[i] == cluster_id]
-        # Sort by date
-        era_commits.sort(key=lambda c: c["date"])
-        # Summarize era with Gemini
-        prompt = (
-            "You are an expert software project historian. "
-            "Given the following list of commit messages, authors, and dates, "
-            "write a concise but insightful summary of this era in the project's evolution. "
-            "Highlight major architectural changes, pivots, and the reasoning behind them. "
-            "Give this era a descriptive title.\n\n"
-            "Commits:\n" +
-            "\n".join([f"- {c['date']} {c['author']}: {c['message']}" for c in era_commits]) +
-            "\n\nRespond in JSON with keys: era_title, summary."
-        )
-        try:
-            gemini_result = gemini_response(prompt)
-            # Try to parse JSON from Gemini
-            import json as pyjson
-            era_json = pyjson.loads(gemini_result)
-            era_title = era_json.get("era_title") or f"Era {cluster_id+1}"
-            summary = era_json.get("summary") or gemini_result
-        except Exception:
-            era_title = f"Era {cluster_id+1}"
-            summary = gemini_result
-        eras.append({
-            "era_title": era_title,
-            "summary": summary,
-            "commits": era_commits
-        })
-    # Sort eras by first commit date
-    eras.sort(key=lambda e: e["commits"][0]["date"] if e["commits"] else "")
-    return {"eras": eras}
+    return repos
+
+async def get_default_branch(repo_url: str) -> str:
+    owner, repo = parse_github_url(repo_url)
+    async with github_session() as client:
+        resp = await client.get(f"https://api.github.com/repos/{owner}/{repo}")
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail="Repository not found")
+    return resp.json().get("default_branch", "main")
+
+async def analyze_repository_batch_item(repo_url: str, branch: Optional[str], document_types: List[str]) -> dict:
+    """Run every requested document type for one repository, collecting results and errors"""
+    start_time = datetime.now()
+    item = {"repo_url": repo_url, "branch": branch, "results": {}, "errors": {}}
+    try:
+        item["branch"] = branch or await get_default_branch(repo_url)
+    except Exception as e:
+        item["errors"]["repository"] = getattr(e, "detail", str(e))
+        return item
+
+    async def run(document_type: str):
+        async with _batch_slots:
+            try:
+                result = await BATCH_DOCUMENT_TYPES[document_type](repo_url, item["branch"])
+                item["results"][document_type] = jsonable_encoder(result)
+            except Exception as e:
+                item["errors"][document_type] = getattr(e, "detail", str(e))
+
+    await asyncio.gather(*(run(document_type) for document_type in document_types))
+    item["processing_time_seconds"] = (datetime.now() - start_time).total_seconds()
+    return item
+
+@app.post("/api/batch-analysis")
+async def batch_analysis(request: BatchAnalysisRequest):
+    """
+    Analyze many repositories (an explicit list and/or a whole organization) in one call.
+
+    Work runs at background GitHub priority under a global concurrency limit, reusing the shared
+    GitHub client, document caches and single-flight coalescing. Results stream back as NDJSON,
+    one line per repository as soon as it finishes, followed by a summary line.
+    """
+    unknown = [t for t in request.document_types if t not in BATCH_DOCUMENT_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown document types: {', '.join(unknown)}. "
+                                                    f"Use any of: {', '.join(BATCH_DOCUMENT_TYPES)}")
+
+    targets = [{"repo_url": url, "branch": request.branch} for url in request.repo_urls]
+    if request.org:
+        for repo in await list_org_repositories(request.org):
+            targets.append({"repo_url": repo["repo_url"], "branch": request.branch or repo["branch"]})
+    if not targets:
+        raise HTTPException(status_code=400, detail="Provide repo_urls or org")
+
+    async def stream():
+        start_time = datetime.now()
+        failed = 0
+        with background_priority():
+            tasks = [
+                asyncio.ensure_future(analyze_repository_batch_item(t["repo_url"], t["branch"], request.document_types))
+                for t in targets
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    item = await next_done
+                    failed += bool(item["errors"])
+                    yield json.dumps(item) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        yield json.dumps({
+            "done": True,
+            "repositories": len(targets),
+            "failed": failed,
+            "processing_time_seconds": (datetime.now() - start_time).total_seconds()
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Webhook-driven precomputation
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET")
+# Quiet period after a push before the branch is refreshed; further pushes restart it
+WEBHOOK_DEBOUNCE_SECONDS = float(os.getenv("WEBHOOK_DEBOUNCE_SECONDS", "10"))
+PRECOMPUTE_MAX_CONCURRENCY = int(os.getenv("PRECOMPUTE_MAX_CONCURRENCY", "2"))
+
+precompute_queue = PrecomputeQueue(WEBHOOK_DEBOUNCE_SECONDS, PRECOMPUTE_MAX_CONCURRENCY)
+
+def verify_github_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check X-Hub-Signature-256 against GITHUB_WEBHOOK_SECRET (accepts everything if no secret is set)"""
+    if not GITHUB_WEBHOOK_SECRET:
+        return True
+    expected = "sha256=" + hmac.new(GITHUB_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return signature is not None and hmac.compare_digest(expected, signature)
+
+async def refresh_branch_analyses(repo_url: str, branch: str):
+    """
+    Bring the cached inputs of every analysis up to date for a branch: the commit store, the
+    diffs and per-commit stats of new commits, and the commit history digest. No LLM calls are
+    made; the documents themselves are still generated on request, from warm data.
+    """
+    owner, repo = parse_github_url(repo_url)
+    headers = {}
+    with background_priority():
+        async with github_session() as client:
+            commits = await fetch_branch_commits(client, owner, repo, branch, headers)
+            if not commits:
+                return
+            await asyncio.gather(*(fetch_commit_detail(client, owner, repo, c.sha, headers) for c in commits))
+            await index_file_changes(client, owner, repo, branch, commits, headers)
+            await build_commit_history_markdown(client, owner, repo, repo_url, branch, commits, headers)
+
+@app.post("/api/webhooks/github", status_code=202)
+async def github_webhook(request: Request):
+    """
+    Receive GitHub push webhooks and queue a debounced background refresh of the pushed branch.
+
+    Configure the webhook with content type application/json and, ideally, a secret matching
+    GITHUB_WEBHOOK_SECRET. Recorded payloads can be replayed locally with replay_webhooks.py.
+    """
+    body = await request.body()
+    if not verify_github_signature(body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    event = request.headers.get("X-GitHub-Event", "")
+    if event == "ping":
+        return {"status": "pong"}
+    if event != "push":
+        return {"status": "ignored", "event": event}
+
+    try:
+        payload = json.loads(body)
+        ref = payload["ref"]
+        repo_url = payload["repository"]["html_url"]
+        owner, repo = parse_github_url(repo_url)
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Malformed push payload")
+    if not ref.startswith("refs/heads/"):
+        return {"status": "ignored", "ref": ref}
+    branch = ref[len("refs/heads/"):]
+
+    key = commit_store.key(owner, repo, branch)
+    if payload.get("deleted"):
+        precompute_queue.cancel(key)
+        commit_store.drop(owner, repo, branch)
+        commit_index.drop(key)
+        return {"status": "dropped", "repository": f"{owner}/{repo}", "branch": branch}
+
+    precompute_queue.schedule(key, lambda: refresh_branch_analyses(repo_url, branch))
+    return {
+        "status": "queued",
+        "repository": f"{owner}/{repo}",
+        "branch": branch,
+        "after": payload.get("after"),
+        "debounce_seconds": WEBHOOK_DEBOUNCE_SECONDS
+    }
 
 # Run the application
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("backend:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Offline benchmark of the analysis endpoints against synthetic repositories.
+
+Every scenario (repository size x endpoint) runs in a fresh interpreter with GitHub
+replaced by benchmarks.fixtures.MockGitHub and Gemini by StubGeminiModel, so no network
+or API keys are needed and nothing is shared between scenarios. Each endpoint is called
+twice: once cold, once warm (served from the caches the first call filled). Reported:
+
+- cold / warm latency
+- outbound GitHub requests (cold / warm) and Gemini calls
+- peak memory: growth of the process's peak RSS during the cold call
+
+"confluence" converts the commit-history markdown of the repository with
+markdown_to_confluence_storage (building the markdown is not timed).
+
+    cd backend
+    python -m benchmarks.analysis [--commits 100 10000 100000] [--endpoints usage-guide timeline]
+        [--recordings responses.json] [--gemini-latency 0.5]
+        [--save results.json] [--baseline results.json --tolerance 0.25]
+
+With --baseline the run exits non-zero when a scenario got slower or used more memory
+than the baseline by more than --tolerance, or made more outbound calls.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "evolution-summary": "/api/evolution-summary",
+    "usage-guide": "/api/usage-guide",
+    "collaborators": "/api/collaborator-analysis",
+    "timeline": "/api/evolution-timeline",
+    "hotspots": "/api/hotspots",
+    "confluence": None,
+}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def _run_scenario(n_commits: int, endpoint: str, recordings_path: str, gemini_latency: float) -> dict:
+    import httpx
+
+    import backend
+    from benchmarks.fixtures import MockGitHub, StubGeminiModel, SyntheticRepo, load_recordings
+    from github_client import configure_github_client
+    from model_router import configure_model_router
+
+    repo = SyntheticRepo(n_commits)
+    github = MockGitHub(repo, load_recordings(recordings_path) if recordings_path else None)
+    configure_github_client(token=None, transport=github.transport())
+    gemini = StubGeminiModel(gemini_latency)
+    router = configure_model_router(client_factory=lambda model: gemini)
+    params = {"repo_url": repo.url, "branch": repo.branch}
+
+    if endpoint == "confluence":
+        from github_client import get_github_client
+
+        client = get_github_client()
+        commits = await backend.fetch_branch_commits(client, repo.owner, repo.name, repo.branch, {})
+        markdown = await backend.build_commit_history_markdown(client, repo.owner, repo.name, repo.url, repo.branch, commits, {})
+        calls_before = sum(github.calls.values())
+        rss_before = _peak_rss_mb()
+        runs = []
+        for _ in range(2):
+            start = time.perf_counter()
+            storage = backend.markdown_to_confluence_storage(markdown)
+            runs.append({"seconds": time.perf_counter() - start, "github_calls": sum(github.calls.values()) - calls_before})
+        return {"runs": runs, "peak_rss_growth_mb": _peak_rss_mb() - rss_before, "gemini_calls": 0,
+                "input_bytes": len(markdown), "output_bytes": len(storage)}
+
+    app_transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=app_transport, base_url="http://benchmark", timeout=None) as client:
+        async def timed_call() -> dict:
+            calls_before = sum(github.calls.values())
+            start = time.perf_counter()
+            resp = await client.get(ENDPOINTS[endpoint], params=params)
+            elapsed = time.perf_counter() - start
+            if resp.status_code != 200:
+                raise RuntimeError(f"{endpoint} returned {resp.status_code}: {resp.text[:300]}")
+            return {"seconds": elapsed, "github_calls": sum(github.calls.values()) - calls_before,
+                    "output_bytes": len(resp.content), "server_timing": resp.headers.get("Server-Timing")}
+
+        rss_before = _peak_rss_mb()
+        cold = await timed_call()
+        # Work the cold call left to background jobs (the hotspot backfill) finishes before the warm call
+        calls_before = sum(github.calls.values())
+        start = time.perf_counter()
+        await backend.precompute_queue.join()
+        background = {"seconds": time.perf_counter() - start,
+                      "github_calls": sum(github.calls.values()) - calls_before}
+        peak_growth = _peak_rss_mb() - rss_before
+        warm = await timed_call()
+    return {"runs": [cold, warm], "background": background, "peak_rss_growth_mb": peak_growth,
+            "gemini_calls": gemini.calls,
+            "gemini_tiers": {name: tier["calls"] for name, tier in router.status()["tiers"].items()},
+            "github_endpoints": dict(github.calls)}
+
+
+def run_worker(n_commits: int, endpoint: str, recordings_path: str, gemini_latency: float):
+    """Run one scenario in this (fresh) process and print its result as JSON"""
+    sys.path.insert(0, BACKEND_DIR)
+    result = asyncio.run(_run_scenario(n_commits, endpoint, recordings_path, gemini_latency))
+    print(json.dumps({"commits": n_commits, "endpoint": endpoint, **result}))
+
+
+def run_scenario(n_commits: int, endpoint: str, args) -> dict:
+    with tempfile.TemporaryDirectory(prefix="gitlit-bench-") as cache_dir:
+        env = {
+            **os.environ,
+            # Cold, isolated caches and no real credentials (an empty value also wins over .env)
+            "DOC_CACHE_BACKEND": "memory",
+            "BLOB_STORE_DIR": os.path.join(cache_dir, "blobs"),
+            "PROFILE_DIR": os.path.join(cache_dir, "profiles"),
+            "GITHUB_TOKEN": "",
+            "GOOGLE_API_KEY": "",
+            "GITHUB_WEBHOOK_SECRET": "",
+        }
+        command = [sys.executable, "-m", "benchmarks.analysis", "--worker", str(n_commits), endpoint,
+                   "--gemini-latency", str(args.gemini_latency)]
+        if args.recordings:
+            command += ["--recordings", os.path.abspath(args.recordings)]
+        proc = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=args.timeout)
+    if proc.returncode != 0:
+        return {"commits": n_commits, "endpoint": endpoint, "error": proc.stderr.strip().splitlines()[-1:]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def regressions(results: list, baseline: list, tolerance: float) -> list:
+    """Human-readable list of scenarios that got worse than the baseline"""
+    previous = {(r["commits"], r["endpoint"]): r for r in baseline if "error" not in r}
+    found = []
+    for result in results:
+        base = previous.get((result["commits"], result["endpoint"]))
+        if base is None:
+            continue
+        label = f"{result['endpoint']} @ {result['commits']} commits"
+        if "error" in result:
+            found.append(f"{label}: failed ({result['error']})")
+            continue
+        for phase, run, base_run in zip(("cold", "warm"), result["runs"], base["runs"]):
+            if run["seconds"] > base_run["seconds"] * (1 + tolerance) and run["seconds"] - base_run["seconds"] > 0.05:
+                found.append(f"{label}: {phase} {run['seconds']:.3f}s vs {base_run['seconds']:.3f}s")
+            if run["github_calls"] > base_run["github_calls"]:
+                found.append(f"{label}: {phase} GitHub calls {run['github_calls']} vs {base_run['github_calls']}")
+        background, base_background = result.get("background"), base.get("background")
+        if background and base_background and background["github_calls"] > base_background["github_calls"]:
+            found.append(f"{label}: background GitHub calls {background['github_calls']} vs {base_background['github_calls']}")
+        if result["gemini_calls"] > base["gemini_calls"]:
+            found.append(f"{label}: Gemini calls {result['gemini_calls']} vs {base['gemini_calls']}")
+        if result["peak_rss_growth_mb"] > base["peak_rss_growth_mb"] * (1 + tolerance) + 5:
+            found.append(f"{label}: peak memory +{result['peak_rss_growth_mb']:.0f} MB vs +{base['peak_rss_growth_mb']:.0f} MB")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the analysis endpoints")
+    parser.add_argument("--commits", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--recordings", help="JSON list of recorded GitHub responses to serve instead of synthetic ones")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="seconds the stub Gemini model takes per call")
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds allowed per scenario")
+    parser.add_argument("--save", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--worker", nargs=2, metavar=("COMMITS", "ENDPOINT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(int(args.worker[0]), args.worker[1], args.recordings, args.gemini_latency)
+        return 0
+
+    print(f"{'endpoint':<18} {'commits':>8} {'cold s':>9} {'warm s':>9} {'GitHub calls':>14} {'Gemini':>7} {'peak MB':>8}")
+    results = []
+    for n_commits in args.commits:
+        for endpoint in args.endpoints:
+            result = run_scenario(n_commits, endpoint, args)
+            results.append(result)
+            if "error" in result:
+                print(f"{endpoint:<18} {n_commits:>8} failed: {result['error']}")
+                continue
+            cold, warm = result["runs"]
+            calls = f"{cold['github_calls']}/{warm['github_calls']}"
+            if result["background"]["github_calls"]:
+                calls = f"{cold['github_calls']}+{result['background']['github_calls']}/{warm['github_calls']}"
+            print(f"{endpoint:<18} {n_commits:>8} {cold['seconds']:>9.3f} {warm['seconds']:>9.3f} {calls:>14} "
+                  f"{result['gemini_calls']:>7} {result['peak_rss_growth_mb']:>8.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    failed = [r for r in results if "error" in r]
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
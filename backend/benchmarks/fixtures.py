@@ -0,0 +1,292 @@
+"""
+Offline stand-ins for GitHub and Gemini used by the analysis benchmarks.
+
+SyntheticRepo generates a deterministic repository of any size (commits, per-commit
+stats and patches, a file tree with real git blob SHAs and importable source files).
+MockGitHub serves it as GitHub REST responses through an httpx.MockTransport, with ETags
+so conditional requests behave as they do against api.github.com. Recorded responses
+(a JSON list of {"url", "status", "headers", "body"} objects, e.g. captured from a real
+repository) take precedence over the synthetic ones for the URLs they cover.
+
+StubGeminiModel replaces the Gemini client: it answers immediately (or after a fixed
+delay) with a deterministic document and reports token usage like the real API.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, unquote
+
+import httpx
+
+from blob_store import git_blob_sha
+
+AUTHORS = ["Ada Lovelace", "Grace Hopper", "Linus Torvalds", "Margaret Hamilton", "Ken Thompson",
+           "Barbara Liskov", "Guido van Rossum", "Frances Allen", "Dennis Ritchie", "Radia Perlman"]
+VERBS = ["Add", "Fix", "Refactor", "Remove", "Update", "Rename", "Document", "Optimize", "Test", "Revert"]
+TOPICS = ["auth flow", "timeline clustering", "cache eviction", "API client", "commit parser", "usage guide",
+          "Confluence export", "webhook handler", "rate limiting", "build config", "CLI options", "UI layout"]
+
+
+class SyntheticRepo:
+    """A deterministic repository with n_commits commits on one branch and n_modules source modules"""
+
+    def __init__(self, n_commits: int, n_modules: int = 200, owner: str = "bench", name: str = "synthetic",
+                 branch: str = "main", seed: int = 42):
+        self.owner, self.name, self.branch, self.seed = owner, name, branch, seed
+        self.n_commits = n_commits
+        self.files = self._build_files(n_modules)
+        self.paths = sorted(self.files)
+        # Index 0 is the root commit; GitHub lists newest first
+        self.shas = [hashlib.sha1(f"{seed}:commit:{i}".encode()).hexdigest() for i in range(n_commits)]
+        self.index = {sha: i for i, sha in enumerate(self.shas)}
+        self.head_sha = self.shas[-1]
+        self.tree_sha = hashlib.sha1(f"{seed}:tree".encode()).hexdigest()
+        self._started = datetime(2015, 1, 1, tzinfo=timezone.utc)
+        self._touching = {}
+
+    @property
+    def url(self) -> str:
+        return f"https://github.com/{self.owner}/{self.name}"
+
+    def _build_files(self, n_modules: int) -> Dict[str, bytes]:
+        rng = random.Random(self.seed)
+        files = {
+            "README.md": b"# Synthetic\n\nInstall with `pip install -r requirements.txt`, run `python main.py`.\n",
+            "requirements.txt": b"fastapi\nhttpx\nnumpy\n",
+            "package.json": json.dumps({"name": "synthetic-ui", "scripts": {"dev": "vite"}}).encode(),
+            "package-lock.json": json.dumps({"name": "synthetic-ui", "lockfileVersion": 3}).encode(),
+            "main.py": b"from app import core\n\nif __name__ == '__main__':\n    core.run()\n",
+            "app/__init__.py": b"",
+            "app/core.py": b"from app import module_0\n\ndef run():\n    module_0.handle()\n",
+            "docs/usage.md": b"# Usage\n\nCall the API.\n" * 20,
+            "frontend/src/main.jsx": b"import App from './App'\nrender(App)\n",
+            "frontend/src/App.jsx": b"export default function App() { return null }\n",
+            "node_modules/left-pad/index.js": b"module.exports = () => ''\n",
+        }
+        for k in range(n_modules):
+            imports = "".join(f"from app import module_{j}\n" for j in rng.sample(range(n_modules), min(3, n_modules)) if j != k)
+            body = "".join(f"\ndef handler_{k}_{f}(request):\n    return {{'status': {f}}}\n" for f in range(rng.randint(2, 12)))
+            files[f"app/module_{k}.py"] = f"{imports}\ndef handle():\n    pass\n{body}".encode()
+            if k % 4 == 0:
+                files[f"tests/test_module_{k}.py"] = f"from app import module_{k}\n\ndef test_handle():\n    module_{k}.handle()\n".encode()
+        return files
+
+    # -- commits -----------------------------------------------------------------------
+
+    def _rng(self, i: int) -> random.Random:
+        return random.Random(self.seed * 1_000_003 + i)
+
+    def commit(self, i: int) -> dict:
+        """List-commits JSON of commit i"""
+        rng = self._rng(i)
+        author = AUTHORS[rng.randrange(len(AUTHORS))]
+        date = (self._started + timedelta(hours=3 * i)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        login = author.split()[0].lower()
+        person = {"name": author, "email": f"{login}@example.com", "date": date}
+        api = f"https://api.github.com/repos/{self.owner}/{self.name}"
+        sha = self.shas[i]
+        # The full shape GitHub returns, URLs and user objects included, so memory use is realistic
+        user = {"login": login, "id": 1000 + AUTHORS.index(author), "node_id": f"MDQ6VXNlcj{login}",
+                "avatar_url": f"https://avatars.githubusercontent.com/u/{1000 + AUTHORS.index(author)}?v=4",
+                "url": f"https://api.github.com/users/{login}", "html_url": f"https://github.com/{login}",
+                "type": "User", "site_admin": False}
+        return {
+            "sha": sha,
+            "node_id": f"C_kwDO{sha[:24]}",
+            "commit": {"author": dict(person), "committer": dict(person),
+                       "message": f"{rng.choice(VERBS)} {rng.choice(TOPICS)} (#{i})",
+                       "tree": {"sha": sha[::-1], "url": f"{api}/git/trees/{sha[::-1]}"},
+                       "url": f"{api}/git/commits/{sha}", "comment_count": 0,
+                       "verification": {"verified": False, "reason": "unsigned", "signature": None,
+                                        "payload": None}},
+            "url": f"{api}/commits/{sha}",
+            "html_url": f"https://github.com/{self.owner}/{self.name}/commit/{sha}",
+            "comments_url": f"{api}/commits/{sha}/comments",
+            "author": user,
+            "committer": dict(user),
+            "parents": [{"sha": self.shas[i - 1], "url": f"{api}/commits/{self.shas[i - 1]}",
+                         "html_url": f"https://github.com/{self.owner}/{self.name}/commit/{self.shas[i - 1]}"}]
+            if i else [],
+        }
+
+    def changed_files(self, i: int) -> List[dict]:
+        """Files touched by commit i, GitHub commit/compare "files" shape"""
+        rng = self._rng(i)
+        files = []
+        for path in rng.sample(self.paths, min(len(self.paths), rng.randint(1, 4))):
+            added, removed = rng.randint(1, 30), rng.randint(0, 15)
+            # Three lines of unchanged context on each side, like git's default
+            context = [f"     context_{n} = {i}\n" for n in range(3)]
+            patch = f"@@ -{i % 90 + 1},{removed + 6} +{i % 90 + 1},{added + 6} @@\n" + "".join(context) + "".join(
+                f"-    old_line_{n} = {i}\n" for n in range(removed)) + "".join(
+                f"+    new_line_{n} = {i}\n" for n in range(added)) + "".join(context)
+            files.append({"filename": path, "status": "modified", "additions": added, "deletions": removed,
+                          "changes": added + removed, "patch": patch})
+        if i % 10 == 5:
+            # Dependency bumps rewrite large parts of the lockfile
+            lines = rng.randint(50, 400)
+            patch = "@@ -1,{0} +1,{0} @@\n".format(lines) + "".join(
+                f"-    \"resolved\": \"https://registry.npmjs.org/pkg-{n}/-/pkg-{n}-1.{i}.0.tgz\",\n"
+                f"+    \"resolved\": \"https://registry.npmjs.org/pkg-{n}/-/pkg-{n}-1.{i + 1}.0.tgz\",\n"
+                for n in range(lines))
+            files.append({"filename": "package-lock.json", "status": "modified", "additions": lines,
+                          "deletions": lines, "changes": 2 * lines, "patch": patch})
+        return files
+
+    def commit_detail(self, i: int) -> dict:
+        files = self.changed_files(i)
+        additions = sum(f["additions"] for f in files)
+        deletions = sum(f["deletions"] for f in files)
+        return {**self.commit(i), "stats": {"additions": additions, "deletions": deletions,
+                                            "total": additions + deletions}, "files": files}
+
+    def commits_page(self, page: int, per_page: int) -> List[dict]:
+        newest = self.n_commits - 1 - (page - 1) * per_page
+        return [self.commit(i) for i in range(newest, max(newest - per_page, -1), -1)]
+
+    def commits_touching(self, path: str) -> List[int]:
+        """Indexes of the commits that change path (a file or directory), newest first"""
+        if path not in self._touching:
+            prefix = path.rstrip("/") + "/"
+            self._touching[path] = [
+                i for i in range(self.n_commits - 1, -1, -1)
+                if any(f["filename"] == path or f["filename"].startswith(prefix) for f in self.changed_files(i))
+            ]
+        return self._touching[path]
+
+    def compare(self, base: int, head: int) -> dict:
+        commits = [self.commit(i) for i in range(base + 1, head + 1)]
+        files = {}
+        for i in range(base + 1, head + 1):
+            for file in self.changed_files(i):
+                files[file["filename"]] = file
+        return {"status": "ahead" if head > base else "identical", "ahead_by": max(head - base, 0),
+                "behind_by": 0, "total_commits": len(commits), "commits": commits[-250:],
+                "files": list(files.values())}
+
+    # -- trees and files ---------------------------------------------------------------
+
+    def tree(self) -> dict:
+        entries = [{"path": path, "mode": "100644", "type": "blob", "sha": git_blob_sha(content), "size": len(content)}
+                   for path, content in sorted(self.files.items())]
+        return {"sha": self.tree_sha, "tree": entries, "truncated": False}
+
+
+def load_recordings(path: str) -> Dict[str, dict]:
+    """Recorded responses by URL from a JSON list of {"url", "status", "headers", "body"}"""
+    with open(path, "r", encoding="utf-8") as f:
+        return {entry["url"]: entry for entry in json.load(f)}
+
+
+class MockGitHub:
+    """httpx.MockTransport handler serving a SyntheticRepo (and recorded responses) as GitHub REST"""
+
+    def __init__(self, repo: SyntheticRepo, recordings: Optional[Dict[str, dict]] = None):
+        self.repo = repo
+        self.recordings = recordings or {}
+        self.calls = Counter()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        from metrics import github_endpoint
+
+        self.calls[github_endpoint(request.url)] += 1
+        recorded = self.recordings.get(str(request.url))
+        if recorded is not None:
+            body = recorded.get("body")
+            content = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            response = httpx.Response(recorded.get("status", 200), headers=recorded.get("headers") or {}, content=content)
+        else:
+            response = self._synthetic(request)
+        if response.status_code != 200:
+            return response
+        etag = '"' + hashlib.md5(response.content).hexdigest() + '"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+        return response
+
+    def _synthetic(self, request: httpx.Request) -> httpx.Response:
+        repo = self.repo
+        path = unquote(request.url.path)
+        query = parse_qs(request.url.query.decode())
+        if request.url.host == "raw.githubusercontent.com":
+            file_path = path.split("/", 4)[-1]
+            content = repo.files.get(file_path)
+            return httpx.Response(200, content=content) if content is not None else httpx.Response(404, text="404: Not Found")
+
+        prefix = f"/repos/{repo.owner}/{repo.name}"
+        if not path.startswith(prefix):
+            return httpx.Response(404, json={"message": "Not Found"})
+        rest = path[len(prefix):]
+        if rest == "":
+            return httpx.Response(200, json={"full_name": f"{repo.owner}/{repo.name}", "default_branch": repo.branch})
+        if rest == "/branches":
+            return httpx.Response(200, json=[{"name": repo.branch, "commit": {"sha": repo.head_sha}}])
+        if rest == "/commits":
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["30"])[0])
+            if "path" in query:
+                touching = repo.commits_touching(query["path"][0])
+                return httpx.Response(200, json=[repo.commit(i) for i in touching[(page - 1) * per_page:page * per_page]])
+            return httpx.Response(200, json=repo.commits_page(page, per_page))
+        match = re.fullmatch(r"/commits/(.+)", rest)
+        if match:
+            ref = match.group(1)
+            i = repo.n_commits - 1 if ref == repo.branch else repo.index.get(ref)
+            if i is None:
+                return httpx.Response(422, json={"message": "No commit found for SHA"})
+            if request.headers.get("accept") == "application/vnd.github.sha":
+                return httpx.Response(200, text=repo.shas[i])
+            return httpx.Response(200, json=repo.commit_detail(i))
+        match = re.fullmatch(r"/compare/([^.]+)\.\.\.(.+)", rest)
+        if match:
+            base, head = (repo.index.get(ref) for ref in match.groups())
+            if base is None or head is None:
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json=repo.compare(base, head))
+        match = re.fullmatch(r"/git/trees/(.+)", rest)
+        if match:
+            if match.group(1) not in (repo.tree_sha, repo.head_sha, repo.branch):
+                return httpx.Response(404, json={"message": "Not Found"})
+            return httpx.Response(200, json=repo.tree())
+        return httpx.Response(404, json={"message": "Not Found"})
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+
+
+class _StubResponse:
+    def __init__(self, text: str, usage: _Usage):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class StubGeminiModel:
+    """Drop-in for genai.GenerativeModel: deterministic answers, optional fixed latency"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def generate_content(self, prompt: str) -> _StubResponse:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        if "Respond in JSON" in prompt:
+            text = json.dumps({"era_title": f"Era {self.calls}", "summary": "Work concentrated on the core modules."})
+        else:
+            text = "# Generated Document\n\n## Overview\n\nStub output.\n\n" + "- point\n" * 40
+        return _StubResponse(text, _Usage(len(prompt) // 4, len(text) // 4))
@@ -0,0 +1,67 @@
+"""
+Throughput benchmark for markdown_to_confluence_storage on large evolution documents.
+
+Builds synthetic "How We Got Here" documents (commit headings, bullet metadata and
+diff code blocks, the same shape generate_evolution_summary produces) and times
+the conversion.
+
+    cd backend
+    python -m benchmarks.markdown [--sizes-mb 1 4 16]
+"""
+import argparse
+import random
+import sys
+import time
+
+from backend import markdown_to_confluence_storage
+
+
+def build_evolution_document(target_bytes: int, seed: int = 42) -> str:
+    """Generate an evolution-summary style markdown document of roughly target_bytes"""
+    rng = random.Random(seed)
+    words = ["refactor", "api", "timeline", "**fix**", "*cache*", "`endpoint`", "docs", "ui", "auth", "<tag>", "&"]
+    parts = ["# How We Got Here - https://github.com/example/repo (main branch)\n\n## Commit-by-Commit Evolution\n\n"]
+    size = len(parts[0])
+    i = 0
+    while size < target_bytes:
+        message = " ".join(rng.choice(words) for _ in range(8))
+        chunk = [
+            f"### Commit `{i:07x}`\n",
+            "- **Date:** 2024-01-01T00:00:00Z\n",
+            f"- **Author:** Dev {i % 17}\n",
+            f"- **Message:** {message}\n",
+            f"  - touched {rng.randint(1, 40)} files\n",
+            "\n#### `src/module.py`\n```diff\n",
+            "\n".join(f"{rng.choice('+- ')} line {j} {message}" for j in range(30)),
+            "\n```\n\n---\n\n",
+        ]
+        text = "".join(chunk)
+        parts.append(text)
+        size += len(text)
+        i += 1
+    return "".join(parts)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Markdown -> Confluence storage converter")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for size_mb in args.sizes_mb:
+        document = build_evolution_document(int(size_mb * 1024 * 1024))
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            storage = markdown_to_confluence_storage(document)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        print(
+            f"{len(document) / 1e6:7.2f} MB markdown -> {len(storage) / 1e6:7.2f} MB storage: "
+            f"best {best:.3f}s ({len(document) / 1e6 / best:.1f} MB/s)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Cold-start benchmark for the backend module.
+
+Imports `backend` in fresh interpreters and fails if the median import time is over
+budget or if any of the heavy, lazily loaded dependencies were pulled in at import.
+
+    cd backend
+    python -m benchmarks.startup [--runs 5] [--budget 1.5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported when an endpoint actually needs them
+LAZY_MODULES = ["sklearn", "google.generativeai", "numpy", "uvicorn"]
+
+DEFAULT_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5"))
+
+_probe = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import backend\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def measure_import(runs: int) -> tuple[list, list]:
+    """Import backend in `runs` fresh interpreters and return the timings and eagerly loaded modules"""
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _probe],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded.update(probe["loaded"])
+    return timings, sorted(loaded)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure cold import time of the backend module")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="Max median import time in seconds")
+    args = parser.parse_args()
+
+    timings, loaded = measure_import(args.runs)
+    median = statistics.median(timings)
+    print(f"import backend: median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s over {args.runs} runs")
+    print(f"budget: {args.budget:.3f}s")
+
+    ok = True
+    if median > args.budget:
+        print("FAIL: cold start is over budget")
+        ok = False
+    if loaded:
+        print(f"FAIL: heavy modules loaded at import time: {', '.join(loaded)}")
+        ok = False
+    if ok:
+        print("OK")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
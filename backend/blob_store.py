@@ -0,0 +1,130 @@
+"""
+Content-addressed store for repository file contents.
+
+Files are stored zlib-compressed under their git blob SHA, so the same content is
+downloaded once no matter how many commits, branches or forks contain it. The store is
+bounded by BLOB_STORE_MAX_BYTES of compressed data and evicts least recently used
+blobs first. Configure the location with BLOB_STORE_DIR.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "blobs"))
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+
+def git_blob_sha(data: bytes) -> str:
+    """The SHA git assigns to a file with this content"""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: str = BLOB_STORE_DIR, max_bytes: int = BLOB_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()  # blob sha -> compressed size, least recently used first
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "rejected": 0, "bytes_saved": 0}
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    def _load_index(self):
+        """Rebuild the LRU order from what is already on disk (oldest modification first)"""
+        found = []
+        for prefix in os.listdir(self.root):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if name.startswith("."):
+                    continue  # temporary file of an interrupted write
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                found.append((st.st_mtime, prefix + name, st.st_size))
+        for _, sha, size in sorted(found):
+            self._sizes[sha] = size
+            self._bytes += size
+
+    def get(self, sha: str) -> Optional[bytes]:
+        """Decompressed content of a blob, or None if it is not stored"""
+        path = self._path(sha)
+        try:
+            with open(path, "rb") as f:
+                data = zlib.decompress(f.read())
+            os.utime(path)
+        except (OSError, zlib.error):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(data)
+            if sha in self._sizes:
+                self._sizes.move_to_end(sha)
+        return data
+
+    def put(self, sha: str, data: bytes) -> bool:
+        """Store content under its blob SHA; content that does not hash to the SHA is refused"""
+        if git_blob_sha(data) != sha:
+            with self._lock:
+                self.stats["rejected"] += 1
+            return False
+        compressed = zlib.compress(data, 6)
+        path = self._path(sha)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so concurrent readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+        with self._lock:
+            self._bytes -= self._sizes.pop(sha, 0)
+            self._sizes[sha] = len(compressed)
+            self._bytes += len(compressed)
+            self.stats["writes"] += 1
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._sizes) > 1:
+                old_sha, size = self._sizes.popitem(last=False)
+                self._bytes -= size
+                evicted.append(old_sha)
+            self.stats["evictions"] += len(evicted)
+        for old_sha in evicted:
+            try:
+                os.remove(self._path(old_sha))
+            except OSError:
+                pass
+        return True
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"blobs": len(self._sizes), "bytes": self._bytes, "max_bytes": self.max_bytes, **self.stats}
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """The process-wide blob store, opened on first use (indexing the directory is not free)"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
@@ -0,0 +1,170 @@
+"""
+Rule-based per-author statistics for the collaborator analysis.
+
+aggregate_collaborators() is pure and takes one compact tuple per commit, so long
+histories can be aggregated in the CPU pool's worker processes.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import List, Tuple
+
+# Map file extensions to languages
+EXT_TO_LANG = {
+    'py': 'Python', 'js': 'JavaScript', 'jsx': 'React/JavaScript',
+    'ts': 'TypeScript', 'tsx': 'React/TypeScript', 'java': 'Java',
+    'cpp': 'C++', 'c': 'C', 'cs': 'C#', 'php': 'PHP', 'rb': 'Ruby',
+    'go': 'Go', 'rs': 'Rust', 'swift': 'Swift', 'kt': 'Kotlin',
+    'html': 'HTML', 'css': 'CSS', 'scss': 'SCSS', 'md': 'Markdown',
+    'json': 'JSON', 'xml': 'XML', 'yaml': 'YAML', 'yml': 'YAML',
+    'sql': 'SQL', 'sh': 'Shell', 'dockerfile': 'Docker'
+}
+
+# (author name, author email, date, message, lines added, lines removed, files)
+CommitRow = Tuple[str, str, str, str, int, int, tuple]
+
+
+def aggregate_collaborators(rows: List[CommitRow]) -> Tuple[List[dict], List[str]]:
+    """
+    CollaboratorContribution fields for every author, most active first, and up to five
+    commit messages per author (prefixed with the name) as a sample for the team summary.
+    """
+    # Group commits by author
+    author_commits = defaultdict(list)
+    for row in rows:
+        author_commits[(row[0], row[1])].append(row)
+
+    collaborators = []
+    all_commit_messages = []
+    for (author_name, author_email), author_rows in author_commits.items():
+        files_modified = set()
+        lines_added = 0
+        lines_removed = 0
+        commit_dates = []
+        commit_messages = []
+        for _, _, date, message, additions, deletions, files in author_rows:
+            commit_dates.append(date)
+            commit_messages.append(message)
+            lines_added += additions
+            lines_removed += deletions
+            files_modified.update(files)
+
+        # Calculate commit frequency
+        if len(commit_dates) > 1:
+            first_dt = datetime.fromisoformat(min(commit_dates).replace('Z', '+00:00'))
+            last_dt = datetime.fromisoformat(max(commit_dates).replace('Z', '+00:00'))
+            weeks_active = max(1, (last_dt - first_dt).days / 7)
+            commit_frequency = len(commit_dates) / weeks_active
+        else:
+            commit_frequency = len(commit_dates)
+
+        # Determine primary languages based on file extensions
+        file_extensions = {}
+        for filename in files_modified:
+            ext = filename.split('.')[-1].lower() if '.' in filename else 'no-ext'
+            file_extensions[ext] = file_extensions.get(ext, 0) + 1
+        primary_languages = [
+            EXT_TO_LANG.get(ext, ext.upper())
+            for ext, _ in sorted(file_extensions.items(), key=lambda x: x[1], reverse=True)[:3]
+        ]
+
+        collaborators.append({
+            "name": author_name,
+            "email": author_email,
+            "commit_count": len(author_rows),
+            "lines_added": lines_added,
+            "lines_removed": lines_removed,
+            "files_modified": list(files_modified)[:20],  # Limit to 20 files for response size
+            "primary_languages": primary_languages,
+            # Rule-based functionality summary and key areas (no LLM call)
+            "functionality_summary": generate_rule_based_summary(commit_messages, files_modified, primary_languages),
+            "first_commit_date": min(commit_dates) if commit_dates else "",
+            "last_commit_date": max(commit_dates) if commit_dates else "",
+            "commit_frequency_per_week": round(commit_frequency, 2),
+            "key_areas": identify_key_areas(files_modified, commit_messages),
+        })
+        all_commit_messages.extend(f"{author_name}: {msg}" for msg in commit_messages[:5])
+
+    # Sort collaborators by commit count (most active first)
+    collaborators.sort(key=lambda x: x["commit_count"], reverse=True)
+    return collaborators, all_commit_messages
+
+
+def generate_rule_based_summary(commit_messages: List[str], files_modified: set, primary_languages: List[str]) -> str:
+    """Generate a functionality summary using rules instead of LLM"""
+    
+    # Analyze commit message patterns
+    patterns = {
+        'feature': ['add', 'implement', 'create', 'new', 'feature'],
+        'bugfix': ['fix', 'bug', 'error', 'issue', 'resolve'],
+        'refactor': ['refactor', 'cleanup', 'reorganize', 'improve'],
+        'ui': ['ui', 'frontend', 'css', 'style', 'design', 'interface'],
+        'backend': ['api', 'backend', 'server', 'database', 'endpoint'],
+        'test': ['test', 'testing', 'spec', 'unit', 'integration'],
+        'docs': ['doc', 'readme', 'documentation', 'comment'],
+        'config': ['config', 'setup', 'deploy', 'build', 'ci']
+    }
+    
+    category_counts = {category: 0 for category in patterns}
+    
+    for message in commit_messages:
+        message_lower = message.lower()
+        for category, keywords in patterns.items():
+            if any(keyword in message_lower for keyword in keywords):
+                category_counts[category] += 1
+    
+    # Find top categories
+    top_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+    active_categories = [cat for cat, count in top_categories if count > 0]
+    
+    # Generate summary based on patterns and file types
+    if not active_categories:
+        summary = f"Contributed {len(commit_messages)} commits"
+    else:
+        summary = f"Focused on {', '.join(active_categories)}"
+    
+    if primary_languages:
+        summary += f" using {', '.join(primary_languages[:2])}"
+    
+    if len(files_modified) > 10:
+        summary += f", touching {len(files_modified)} files across multiple areas"
+    elif files_modified:
+        summary += f", working on {len(files_modified)} files"
+    
+    return summary + "."
+
+
+def identify_key_areas(files_modified: set, commit_messages: List[str]) -> List[str]:
+    """Identify key work areas based on file patterns"""
+    
+    areas = set()
+    
+    # File-based area detection
+    for filename in files_modified:
+        filename_lower = filename.lower()
+        
+        if any(pattern in filename_lower for pattern in ['frontend', 'src', 'components', 'ui']):
+            areas.add('Frontend')
+        if any(pattern in filename_lower for pattern in ['backend', 'api', 'server']):
+            areas.add('Backend')
+        if any(pattern in filename_lower for pattern in ['test', 'spec']):
+            areas.add('Testing')
+        if any(pattern in filename_lower for pattern in ['config', 'setup', '.yml', '.yaml', 'docker']):
+            areas.add('Configuration')
+        if filename_lower.endswith(('.md', '.txt', '.rst')):
+            areas.add('Documentation')
+        if any(pattern in filename_lower for pattern in ['css', 'scss', 'style']):
+            areas.add('Styling')
+        if filename_lower.endswith(('.py', '.js', '.ts', '.jsx', '.tsx')):
+            areas.add('Core Development')
+    
+    # Commit message-based area detection
+    for message in commit_messages:
+        message_lower = message.lower()
+        if any(word in message_lower for word in ['database', 'db', 'sql']):
+            areas.add('Database')
+        if any(word in message_lower for word in ['security', 'auth', 'login']):
+            areas.add('Security')
+        if any(word in message_lower for word in ['performance', 'optimize']):
+            areas.add('Performance')
+    
+    return list(areas)[:5]  # Limit to top 5 areas
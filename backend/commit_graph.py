@@ -0,0 +1,108 @@
+"""
+Parent/child structure of a branch history.
+
+GitHub's commit listing is ordered by date, so neighbours in it are not parent and child
+once a history has merges. CommitGraph rebuilds the DAG from the parents of each listed
+commit, which is enough to:
+
+- diff every commit against its first parent
+- follow the first-parent chain (the mainline as seen from the branch head)
+- list the commits a merge brought in: reachable from its other parents but not from its
+  first parent, i.e. `git log P1..P2`
+
+Ranges are found with the walk git uses for `A..B`. Commits are visited in decreasing
+generation number (1 + the largest generation of their parents), painted by the side
+they are reachable from. The walk stops as soon as every queued commit is reachable from
+the excluded side. Its cost follows the size of the range, not of the whole history.
+"""
+import heapq
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from commit_records import CommitRecord
+
+EXCLUDED, INCLUDED = 1, 2
+
+
+class CommitGraph:
+    def __init__(self, commits: Iterable[CommitRecord]):
+        """commits: a branch listing (any order); parents outside the listing are ignored"""
+        # The records' parent tuples are shared, not copied
+        self.parents: Dict[str, Tuple[str, ...]] = {c.sha: c.parents for c in commits}
+        self._generation = None
+
+    @property
+    def generation(self) -> Dict[str, int]:
+        """Generation numbers, computed on first use (only range() needs them)"""
+        if self._generation is None:
+            self._generation = self._generations()
+        return self._generation
+
+    def _generations(self) -> Dict[str, int]:
+        generation = {}
+        # The listing is newest first, so going through it backwards mostly meets parents first
+        for root in reversed(self.parents):
+            if root in generation:
+                continue
+            # Iterative post-order walk: a commit is numbered once all its parents are
+            stack = [root]
+            while stack:
+                sha = stack[-1]
+                pending = [p for p in self.parents[sha] if p in self.parents and p not in generation]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                stack.pop()
+                if sha not in generation:
+                    generation[sha] = 1 + max((generation[p] for p in self.parents[sha] if p in generation), default=0)
+        return generation
+
+    def is_merge(self, sha: str) -> bool:
+        return len(self.parents.get(sha, ())) > 1
+
+    def first_parent_chain(self, head: str) -> List[str]:
+        """SHAs from head down its first parents, oldest first"""
+        chain = []
+        sha = head
+        while sha in self.parents:
+            chain.append(sha)
+            parents = self.parents[sha]
+            sha = parents[0] if parents else None
+        chain.reverse()
+        return chain
+
+    def range(self, exclude: Iterable[str], include: Iterable[str]) -> Iterator[str]:
+        """
+        Commits reachable from `include` but not from `exclude` (`git log exclude..include`),
+        newest first. They are yielded as the walk finds them, so counting a range or taking
+        its first few commits builds no list.
+        """
+        generation = self.generation
+        flags, queue, include_only = {}, [], 0
+
+        def paint(sha: str, flag: int):
+            nonlocal include_only
+            if sha not in self.parents:
+                return
+            old = flags.get(sha)
+            new = (old or 0) | flag
+            if old == new:
+                return
+            flags[sha] = new
+            if old is None:
+                heapq.heappush(queue, (-generation[sha], sha))
+                include_only += new == INCLUDED
+            elif old == INCLUDED:
+                include_only -= 1
+
+        for sha in exclude:
+            paint(sha, EXCLUDED)
+        for sha in include:
+            paint(sha, INCLUDED)
+        while queue and include_only:
+            _, sha = heapq.heappop(queue)
+            flag = flags[sha]
+            if flag == INCLUDED:
+                include_only -= 1
+                yield sha
+            for parent in self.parents[sha]:
+                paint(parent, flag)
@@ -0,0 +1,462 @@
+"""
+Queryable index of branch histories for /api/commits.
+
+Commits kept by the CommitStore are mirrored into SQLite (in memory by default; set
+COMMIT_INDEX_PATH to keep the index in a file) with indexes on author and date, so pages
+of a filtered history are answered without touching the full commit list.
+
+Each commit gets a position counted from the oldest commit of the branch. Positions are
+stable while commits are only pushed on top, which makes them usable as pagination
+cursors; a force-push or full reload starts a new generation, and cursors from an older
+generation are rejected instead of silently skipping or repeating commits.
+
+Commits touching a path come from GitHub's path-filtered commit listing and are stored
+per (path, head commit), since file lists are not part of the commit listing itself.
+
+The same database holds the file hotspot index behind /api/hotspots. Per-commit file
+lists (from the commit detail API) are folded into per-file aggregates as commits are
+indexed: change count, churn, authors, the pairs of files changed together, and a
+recency-weighted change frequency. Each commit counts 2^(-age / HOTSPOT_HALF_LIFE_DAYS).
+That score is kept relative to the newest change seen, so adding a commit updates it
+exactly, whatever its date. Commits are only ever added. A force-push or reload drops the
+branch, and it is indexed again from the cached commit details.
+"""
+import base64
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from commit_records import CommitRecord
+
+COMMIT_INDEX_PATH = os.getenv("COMMIT_INDEX_PATH", ":memory:")
+COMMIT_INDEX_MAX_BRANCHES = int(os.getenv("COMMIT_INDEX_MAX_BRANCHES", "64"))
+HOTSPOT_HALF_LIFE_DAYS = float(os.getenv("HOTSPOT_HALF_LIFE_DAYS", "90"))
+# Commits touching more files than this (mass renames, formatting) add no co-change pairs
+HOTSPOT_COCHANGE_MAX_FILES = int(os.getenv("HOTSPOT_COCHANGE_MAX_FILES", "30"))
+
+_HALF_LIFE_SECONDS = HOTSPOT_HALF_LIFE_DAYS * 86400
+
+_COLUMNS = "sha, author_name, author_email, author_login, date, message"
+
+
+def _row(columns: tuple) -> dict:
+    sha, author_name, author_email, author_login, date, message = columns
+    return {"sha": sha, "author_name": author_name, "author_email": author_email, "author_login": author_login,
+            "message": message, "date": date}
+
+
+def _timestamp(date: str) -> float:
+    return datetime.fromisoformat(date.replace("Z", "+00:00")).timestamp()
+
+
+def _decay(score: float, score_time: float, now: float) -> float:
+    """A recency score kept as of score_time, as seen at now"""
+    return score * math.pow(2.0, -(now - score_time) / _HALF_LIFE_SECONDS)
+
+
+def _path_range(path: Optional[str], column: str = "path") -> Tuple[str, list]:
+    """SQL condition on `column` for a file or everything below a directory ('' is the whole tree)"""
+    path = (path or "").strip("/")
+    if not path:
+        return "1", []
+    # "/" sorts right before "0", so [dir + "/", dir + "0") is exactly the directory's subtree
+    return f"({column} = ? OR ({column} >= ? AND {column} < ?))", [path, path + "/", path + "0"]
+
+
+def _add_change(score: float, score_time: float, changed_at: float) -> Tuple[float, float]:
+    """Recency score (as of score_time) after one more change at changed_at"""
+    if changed_at <= score_time:
+        return score + math.pow(2.0, -(score_time - changed_at) / _HALF_LIFE_SECONDS), score_time
+    return _decay(score, score_time, changed_at) + 1.0, changed_at
+
+
+# (position, path, additions, deletions) of one changed file
+FileChange = Tuple[int, str, int, int]
+
+
+class StaleCursor(ValueError):
+    """The cursor belongs to an older generation of the branch (force-push or reload)"""
+
+
+class CommitIndex:
+    def __init__(self, path: str = COMMIT_INDEX_PATH, max_branches: int = COMMIT_INDEX_MAX_BRANCHES):
+        self.max_branches = max_branches
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS branches ("
+            " branch TEXT PRIMARY KEY, head_sha TEXT NOT NULL, size INTEGER NOT NULL, generation INTEGER NOT NULL,"
+            " synced_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS commits ("
+            " branch TEXT NOT NULL, position INTEGER NOT NULL, sha TEXT NOT NULL, author_name TEXT,"
+            " author_email TEXT, author_login TEXT, date TEXT, message TEXT, PRIMARY KEY (branch, position));"
+            "CREATE INDEX IF NOT EXISTS commits_author ON commits (branch, author_name COLLATE NOCASE, position);"
+            "CREATE INDEX IF NOT EXISTS commits_email ON commits (branch, author_email COLLATE NOCASE, position);"
+            "CREATE INDEX IF NOT EXISTS commits_login ON commits (branch, author_login COLLATE NOCASE, position);"
+            "CREATE INDEX IF NOT EXISTS commits_date ON commits (branch, date);"
+            "CREATE TABLE IF NOT EXISTS path_commits ("
+            " branch TEXT NOT NULL, path TEXT NOT NULL, head_sha TEXT NOT NULL, sha TEXT NOT NULL,"
+            " PRIMARY KEY (branch, path, sha));"
+            "CREATE TABLE IF NOT EXISTS path_heads ("
+            " branch TEXT NOT NULL, path TEXT NOT NULL, head_sha TEXT NOT NULL, PRIMARY KEY (branch, path));"
+            # Hotspot index
+            "CREATE TABLE IF NOT EXISTS files_indexed ("
+            " branch TEXT NOT NULL, position INTEGER NOT NULL, PRIMARY KEY (branch, position));"
+            "CREATE TABLE IF NOT EXISTS file_changes ("
+            " branch TEXT NOT NULL, path TEXT NOT NULL, position INTEGER NOT NULL, PRIMARY KEY (branch, path, position));"
+            "CREATE TABLE IF NOT EXISTS file_stats ("
+            " branch TEXT NOT NULL, path TEXT NOT NULL, commits INTEGER NOT NULL, additions INTEGER NOT NULL,"
+            " deletions INTEGER NOT NULL, last_date TEXT, score REAL NOT NULL, score_time REAL NOT NULL,"
+            " PRIMARY KEY (branch, path));"
+            "CREATE TABLE IF NOT EXISTS file_authors ("
+            " branch TEXT NOT NULL, path TEXT NOT NULL, author TEXT NOT NULL, commits INTEGER NOT NULL,"
+            " lines INTEGER NOT NULL, PRIMARY KEY (branch, path, author));"
+            "CREATE TABLE IF NOT EXISTS cochanges ("
+            " branch TEXT NOT NULL, path_a TEXT NOT NULL, path_b TEXT NOT NULL, commits INTEGER NOT NULL,"
+            " PRIMARY KEY (branch, path_a, path_b));"
+            "CREATE TABLE IF NOT EXISTS dir_authors ("
+            " branch TEXT NOT NULL, dir TEXT NOT NULL, author TEXT NOT NULL, commits INTEGER NOT NULL,"
+            " PRIMARY KEY (branch, dir, author));"
+            "CREATE INDEX IF NOT EXISTS cochanges_b ON cochanges (branch, path_b);"
+            "CREATE INDEX IF NOT EXISTS cochanges_count ON cochanges (branch, commits);"
+        )
+        self._conn.create_function("hotspot_decay", 3, _decay, deterministic=True)
+        self.stats = {"full_syncs": 0, "appends": 0, "file_commits_indexed": 0}
+
+    # -- maintenance -------------------------------------------------------------------
+
+    def sync(self, branch: str, commits: List[CommitRecord]):
+        """Mirror a branch's commits (newest first) into the index"""
+        if not commits:
+            return
+        with self._lock:
+            state = self._conn.execute(
+                "SELECT head_sha, size, generation FROM branches WHERE branch = ?", (branch,)).fetchone()
+            if state and state[0] == commits[0].sha and state[1] == len(commits):
+                self._conn.execute("UPDATE branches SET synced_at = ? WHERE branch = ?", (time.time(), branch))
+                return
+            # Pushed on top of what is indexed: only the new commits need rows
+            new_count = None
+            if state and len(commits) > state[1] and commits[len(commits) - state[1]].sha == state[0]:
+                new_count = len(commits) - state[1]
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if new_count is not None:
+                    start, rows, generation = state[1], commits[:new_count], state[2]
+                    self.stats["appends"] += 1
+                else:
+                    self._delete_branch(branch)
+                    start, rows, generation = 0, commits, (state[2] + 1 if state else 1)
+                    self.stats["full_syncs"] += 1
+                total = start + len(rows)
+                self._conn.executemany(
+                    "INSERT INTO commits (branch, position, sha, author_name, author_email, author_login, date, message)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((branch, total - 1 - i, c.sha, c.author_name, c.author_email, c.author_login, c.date, c.message)
+                     for i, c in enumerate(rows)),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO branches (branch, head_sha, size, generation, synced_at) VALUES (?, ?, ?, ?, ?)",
+                    (branch, commits[0].sha, len(commits), generation, time.time()),
+                )
+                # Least recently synced branches beyond the limit are dropped (they are re-indexed on next use)
+                for (evicted,) in self._conn.execute(
+                        "SELECT branch FROM branches ORDER BY synced_at DESC LIMIT -1 OFFSET ?", (self.max_branches,)).fetchall():
+                    self._delete_branch(evicted)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _delete_branch(self, branch: str):
+        for table in ("commits", "path_commits", "path_heads", "files_indexed", "file_changes", "file_stats",
+                      "file_authors", "dir_authors", "cochanges", "branches"):
+            self._conn.execute(f"DELETE FROM {table} WHERE branch = ?", (branch,))
+
+    def drop(self, branch: str):
+        with self._lock:
+            self._delete_branch(branch)
+
+    def has_path(self, branch: str, path: str, head_sha: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT head_sha FROM path_heads WHERE branch = ? AND path = ?", (branch, path)).fetchone()
+        return row is not None and row[0] == head_sha
+
+    def set_path_commits(self, branch: str, path: str, head_sha: str, shas: Iterable[str]):
+        """Record which commits (as of head_sha) touch path"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM path_commits WHERE branch = ? AND path = ?", (branch, path))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO path_commits (branch, path, head_sha, sha) VALUES (?, ?, ?, ?)",
+                    ((branch, path, head_sha, sha) for sha in shas),
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO path_heads (branch, path, head_sha) VALUES (?, ?, ?)", (branch, path, head_sha))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    # -- hotspot index -----------------------------------------------------------------
+
+    def pending_file_commits(self, branch: str) -> List[tuple]:
+        """(position, sha) of the commits whose changed files are not in the hotspot index yet, oldest first"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT position, sha FROM commits WHERE branch = ? AND position NOT IN"
+                " (SELECT position FROM files_indexed WHERE branch = ?) ORDER BY position",
+                (branch, branch),
+            ).fetchall()
+
+    def commit_paths(self, branch: str) -> Dict[str, List[str]]:
+        """Changed files of every commit in the hotspot index, by SHA (merges and skipped commits have none)"""
+        with self._lock:
+            paths = {sha: [] for (sha,) in self._conn.execute(
+                "SELECT c.sha FROM files_indexed fi JOIN commits c ON c.branch = fi.branch AND c.position = fi.position"
+                " WHERE fi.branch = ?", (branch,))}
+            for sha, path in self._conn.execute(
+                    "SELECT c.sha, fc.path FROM file_changes fc"
+                    " JOIN commits c ON c.branch = fc.branch AND c.position = fc.position WHERE fc.branch = ?", (branch,)):
+                paths[sha].append(path)
+        return paths
+
+    def _load_file_stats(self, branch: str, paths: List[str]) -> dict:
+        stats = {}
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            for path, *row in self._conn.execute(
+                    f"SELECT path, commits, additions, deletions, last_date, score, score_time FROM file_stats"
+                    f" WHERE branch = ? AND path IN ({','.join('?' * len(chunk))})", [branch] + chunk):
+                stats[path] = row
+        return stats
+
+    def add_file_changes(self, branch: str, positions: Iterable[int], changes: Iterable[FileChange]):
+        """
+        Fold the changed files of the commits at `positions` into the hotspot index. Commits
+        that are already indexed are skipped, so overlapping calls are harmless.
+        """
+        positions = set(positions)
+        if not positions:
+            return
+        with self._lock:
+            low, high = min(positions), max(positions)
+            positions -= {row[0] for row in self._conn.execute(
+                "SELECT position FROM files_indexed WHERE branch = ? AND position BETWEEN ? AND ?", (branch, low, high))}
+            commits = {position: (author, date) for position, author, date in self._conn.execute(
+                "SELECT position, author_name, date FROM commits WHERE branch = ? AND position BETWEEN ? AND ?",
+                (branch, low, high)) if position in positions}
+            by_commit = defaultdict(list)
+            for position, path, additions, deletions in changes:
+                if position in commits:
+                    by_commit[position].append((path, additions, deletions))
+
+            stats = self._load_file_stats(branch, sorted({path for files in by_commit.values() for path, _, _ in files}))
+            authors, dir_authors, pairs = defaultdict(lambda: [0, 0]), defaultdict(int), defaultdict(int)
+            for position in sorted(by_commit):
+                author, date = commits[position]
+                changed_at = _timestamp(date)
+                files = by_commit[position]
+                for path, additions, deletions in files:
+                    n, added, deleted, last_date, score, score_time = stats.get(path) or (0, 0, 0, None, 0.0, changed_at)
+                    score, score_time = _add_change(score, score_time, changed_at)
+                    stats[path] = [n + 1, added + additions, deleted + deletions, max(last_date or date, date),
+                                   score, score_time]
+                    author_stats = authors[(path, author or "")]
+                    author_stats[0] += 1
+                    author_stats[1] += additions + deletions
+                # Every directory above a changed file ("" is the root) counts the commit once
+                directories = {""}
+                for path, _, _ in files:
+                    parts = path.split("/")[:-1]
+                    directories.update("/".join(parts[:depth]) for depth in range(1, len(parts) + 1))
+                for directory in directories:
+                    dir_authors[(directory, author or "")] += 1
+                if 1 < len(files) <= HOTSPOT_COCHANGE_MAX_FILES:
+                    paths = sorted({path for path, _, _ in files})
+                    for i, path_a in enumerate(paths):
+                        for path_b in paths[i + 1:]:
+                            pairs[(path_a, path_b)] += 1
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT INTO files_indexed (branch, position) VALUES (?, ?)",
+                                       ((branch, position) for position in positions))
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO file_changes (branch, path, position) VALUES (?, ?, ?)",
+                    ((branch, path, position) for position, files in by_commit.items() for path, _, _ in files))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO file_stats (branch, path, commits, additions, deletions, last_date, score,"
+                    " score_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    ((branch, path, *row) for path, row in stats.items()))
+                self._conn.executemany(
+                    "INSERT INTO file_authors (branch, path, author, commits, lines) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (branch, path, author) DO UPDATE SET commits = commits + excluded.commits,"
+                    " lines = lines + excluded.lines",
+                    ((branch, path, author, n, lines) for (path, author), (n, lines) in authors.items()))
+                self._conn.executemany(
+                    "INSERT INTO dir_authors (branch, dir, author, commits) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (branch, dir, author) DO UPDATE SET commits = commits + excluded.commits",
+                    ((branch, directory, author, n) for (directory, author), n in dir_authors.items()))
+                self._conn.executemany(
+                    "INSERT INTO cochanges (branch, path_a, path_b, commits) VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT (branch, path_a, path_b) DO UPDATE SET commits = commits + excluded.commits",
+                    ((branch, path_a, path_b, n) for (path_a, path_b), n in pairs.items()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self.stats["file_commits_indexed"] += len(positions)
+
+    def hotspots(self, branch: str, path: Optional[str] = None, limit: int = 20, sort: str = "score",
+                 pairs: int = 20) -> dict:
+        """
+        Most changed files under `path` (a file, a directory or the whole tree), their owners
+        and the files most often changed together (for a single file, also its latest commits). `sort` is "score" (recency-weighted
+        change frequency), "commits" or "churn" (lines added plus removed).
+        """
+        where, params = _path_range(path)
+        order = {"score": "recent DESC", "commits": "commits DESC", "churn": "additions + deletions DESC"}[sort]
+        with self._lock:
+            newest = self._conn.execute(
+                "SELECT date FROM commits WHERE branch = ? ORDER BY position DESC LIMIT 1", (branch,)).fetchone()
+            now = _timestamp(newest[0]) if newest else 0.0
+            indexed = self._conn.execute("SELECT COUNT(*) FROM files_indexed WHERE branch = ?", (branch,)).fetchone()[0]
+            files = []
+            for name, commits, additions, deletions, last_date, recent in self._conn.execute(
+                    f"SELECT path, commits, additions, deletions, last_date, hotspot_decay(score, score_time, ?) AS recent"
+                    f" FROM file_stats WHERE branch = ? AND {where} ORDER BY {order}, path LIMIT ?",
+                    [now, branch] + params + [limit]).fetchall():
+                owners = self._conn.execute(
+                    "SELECT author, commits, lines FROM file_authors WHERE branch = ? AND path = ?"
+                    " ORDER BY commits DESC, lines DESC LIMIT 3", (branch, name)).fetchall()
+                author_count = self._conn.execute(
+                    "SELECT COUNT(*) FROM file_authors WHERE branch = ? AND path = ?", (branch, name)).fetchone()[0]
+                files.append({
+                    "path": name, "commits": commits, "additions": additions, "deletions": deletions,
+                    "churn": additions + deletions, "score": round(recent, 4), "last_changed": last_date,
+                    "authors": author_count,
+                    "top_authors": [{"name": a, "commits": n, "lines": lines} for a, n, lines in owners],
+                })
+
+            file_count, churn = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(additions + deletions), 0) FROM file_stats WHERE branch = ? AND {where}",
+                [branch] + params).fetchone()
+            # Owners and distinct commits: per directory from dir_authors, per file from file_authors
+            # (an author's commits in a directory add up to the directory's commits)
+            target = (path or "").strip("/")
+            owners = self._conn.execute(
+                "SELECT author, commits FROM dir_authors WHERE branch = ? AND dir = ? ORDER BY commits DESC",
+                (branch, target)).fetchall()
+            if not owners:
+                owners = self._conn.execute(
+                    "SELECT author, commits FROM file_authors WHERE branch = ? AND path = ? ORDER BY commits DESC",
+                    (branch, target)).fetchall()
+            commit_count = sum(n for _, n in owners)
+
+            where_a, params_a = _path_range(path, "path_a")
+            where_b, params_b = _path_range(path, "path_b")
+            single_file = bool(target) and file_count == 1 and bool(files) and files[0]["path"] == target
+            recent = []
+            if single_file:
+                recent = [_row(row) for row in self._conn.execute(
+                    f"SELECT {', '.join('c.' + column.strip() for column in _COLUMNS.split(','))} FROM file_changes fc"
+                    f" JOIN commits c ON c.branch = fc.branch AND c.position = fc.position"
+                    f" WHERE fc.branch = ? AND fc.path = ? ORDER BY fc.position DESC LIMIT 10", (branch, target))]
+            pair_where = f"({where_a} OR {where_b})" if single_file else f"{where_a} AND {where_b}"
+            pair_rows = self._conn.execute(
+                f"SELECT path_a, path_b, cc.commits, MIN(a.commits, b.commits) FROM cochanges cc"
+                f" JOIN file_stats a ON a.branch = cc.branch AND a.path = cc.path_a"
+                f" JOIN file_stats b ON b.branch = cc.branch AND b.path = cc.path_b"
+                f" WHERE cc.branch = ? AND {pair_where} ORDER BY cc.commits DESC, path_a, path_b LIMIT ?",
+                [branch] + params_a + params_b + [pairs]).fetchall()
+        return {
+            "path": (path or "").strip("/"),
+            "indexed_commits": indexed,
+            "half_life_days": HOTSPOT_HALF_LIFE_DAYS,
+            "summary": {"files": file_count, "commits": commit_count, "churn": churn,
+                        "top_authors": [{"name": name, "commits": n} for name, n in owners[:5]]},
+            "files": files,
+            "co_changes": [{"paths": [a, b], "commits": n, "ratio": round(n / smaller, 3) if smaller else 0.0}
+                           for a, b, n, smaller in pair_rows],
+            # Latest commits touching the file, when `path` is a single file
+            "recent_commits": recent,
+        }
+
+    # -- queries -----------------------------------------------------------------------
+
+    def encode_cursor(self, branch: str, position: int) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT generation FROM branches WHERE branch = ?", (branch,)).fetchone()
+        raw = f"{row[0] if row else 0}:{position}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, branch: str, cursor: str) -> int:
+        """Position encoded in a cursor; raises ValueError if malformed and StaleCursor if outdated"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+            generation, position = (int(part) for part in raw.split(":"))
+        except Exception:
+            raise ValueError("Malformed cursor")
+        with self._lock:
+            row = self._conn.execute("SELECT generation FROM branches WHERE branch = ?", (branch,)).fetchone()
+        if row is None or row[0] != generation:
+            raise StaleCursor("Cursor is from an older version of the branch history; start again without it")
+        return position
+
+    def _where(self, branch: str, author: Optional[str], path: Optional[str], since: Optional[str],
+               until: Optional[str]) -> tuple:
+        clauses, params = ["branch = ?"], [branch]
+        if author:
+            clauses.append("(author_name = ? COLLATE NOCASE OR author_email = ? COLLATE NOCASE"
+                           " OR author_login = ? COLLATE NOCASE)")
+            params += [author, author, author]
+        if since:
+            clauses.append("date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("date <= ?")
+            params.append(until)
+        if path:
+            clauses.append("sha IN (SELECT sha FROM path_commits WHERE branch = ? AND path = ?)")
+            params += [branch, path]
+        return " AND ".join(clauses), params
+
+    def query(self, branch: str, before: Optional[int] = None, limit: int = 100, author: Optional[str] = None,
+              path: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None) -> tuple:
+        """
+        Up to `limit` matching commits older than position `before`, newest first, and the
+        position to continue from (None when there are no more).
+        """
+        where, params = self._where(branch, author, path, since, until)
+        if before is not None:
+            where += " AND position < ?"
+            params.append(before)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT position, {_COLUMNS} FROM commits WHERE {where} ORDER BY position DESC LIMIT ?",
+                params + [limit + 1],
+            ).fetchall()
+        next_position = rows[limit - 1][0] if len(rows) > limit else None
+        return [_row(row[1:]) for row in rows[:limit]], next_position
+
+    def count(self, branch: str, author: Optional[str] = None, path: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None) -> int:
+        where, params = self._where(branch, author, path, since, until)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM commits WHERE {where}", params).fetchone()[0]
+
+    def status(self) -> dict:
+        with self._lock:
+            branches, commits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM branches").fetchone()
+        return {"branches": branches, "commits": commits, **self.stats}
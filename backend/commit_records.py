@@ -0,0 +1,68 @@
+"""
+Compact in-memory commit records.
+
+An item of GitHub's list-commits JSON is a few KB of nested dicts: author and committer,
+their GitHub user objects, tree, verification, and half a dozen API URLs. The analyses
+read only the SHA, author, date, message and parents, so branch histories are kept as
+CommitRecord objects instead, converted page by page as the history is fetched:
+
+- __slots__, no per-record dict
+- author names, emails and logins are interned, so every author is stored once
+- SHAs are interned too, so a commit's SHA and the parent SHAs of its children share one
+  string, and parents are plain tuples of SHAs
+"""
+import sys
+from typing import Iterable, List, Optional, Tuple
+
+_intern = sys.intern
+
+
+class CommitRecord:
+    __slots__ = ("sha", "author_name", "author_email", "author_login", "date", "message", "parents")
+
+    def __init__(self, sha: str, author_name: str, author_email: Optional[str], author_login: Optional[str],
+                 date: str, message: str, parents: Tuple[str, ...] = ()):
+        self.sha = sha
+        self.author_name = author_name
+        self.author_email = author_email
+        self.author_login = author_login
+        self.date = date
+        self.message = message
+        self.parents = parents
+
+    @property
+    def subject(self) -> str:
+        return self.message.split("\n", 1)[0]
+
+    @property
+    def is_merge(self) -> bool:
+        return len(self.parents) > 1
+
+    def to_dict(self) -> dict:
+        """The {sha, author, date, message} form the API responses use"""
+        return {"sha": self.sha, "author": self.author_name, "date": self.date, "message": self.message}
+
+    def __repr__(self) -> str:
+        return f"CommitRecord({self.sha[:7]} {self.date} {self.author_name!r})"
+
+
+def _intern_optional(value: Optional[str]) -> Optional[str]:
+    return _intern(value) if value is not None else None
+
+
+def from_github(commit: dict) -> CommitRecord:
+    """Record of one item of GitHub's list-commits (or compare "commits") JSON"""
+    author = commit["commit"]["author"]
+    return CommitRecord(
+        _intern(commit["sha"]),
+        _intern(author["name"]),
+        _intern_optional(author.get("email")),
+        _intern_optional((commit.get("author") or {}).get("login")),
+        author["date"],
+        commit["commit"]["message"],
+        tuple(_intern(parent["sha"]) for parent in commit.get("parents") or ()),
+    )
+
+
+def records_from_github(commits: Iterable[dict]) -> List[CommitRecord]:
+    return [from_github(commit) for commit in commits]
@@ -0,0 +1,125 @@
+"""
+Incrementally refreshed per-branch commit lists.
+
+The first request for a branch pages through its full history once. After that the store
+checks the branch head (a conditional request, free when nothing changed) and, when new
+commits were pushed on top, fetches only those through the compare API. Force-pushes and
+very large pushes fall back to a full reload.
+
+Commits are kept as compact CommitRecords (commit_records.py), converted as each page
+arrives, so the raw JSON of a page is dropped before the next one is fetched.
+"""
+import asyncio
+import os
+from collections import OrderedDict
+from typing import List, Optional
+from urllib.parse import quote
+
+from fastapi import HTTPException
+
+from commit_records import CommitRecord, records_from_github
+
+COMMIT_STORE_MAX_BRANCHES = int(os.getenv("COMMIT_STORE_MAX_BRANCHES", "32"))
+# GitHub's compare API lists at most 250 commits; bigger pushes are reloaded in full
+COMPARE_MAX_COMMITS = 250
+
+
+async def get_branch_head_sha(client, owner: str, repo: str, branch: str, headers: Optional[dict] = None) -> str:
+    """Resolve a branch to its head commit SHA (a single lightweight request)"""
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits/{quote(branch)}"
+    resp = await client.get(url, headers={**(headers or {}), "Accept": "application/vnd.github.sha"})
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail="Failed to resolve branch head commit")
+    return resp.text.strip()
+
+
+class CommitStore:
+    """LRU of branch -> commits (CommitRecords, newest first)"""
+
+    def __init__(self, max_branches: int = COMMIT_STORE_MAX_BRANCHES):
+        self.max_branches = max_branches
+        self._branches = OrderedDict()
+        self._locks = {}
+        self.stats = {"full_loads": 0, "incremental_updates": 0, "unchanged": 0}
+
+    def __len__(self) -> int:
+        return len(self._branches)
+
+    @staticmethod
+    def key(owner: str, repo: str, branch: str) -> str:
+        return f"{owner}/{repo}".lower() + f"|{branch}"
+
+    def peek(self, owner: str, repo: str, branch: str) -> Optional[List[CommitRecord]]:
+        """Stored commits without contacting GitHub (None if the branch is not loaded)"""
+        return self._branches.get(self.key(owner, repo, branch))
+
+    def drop(self, owner: str, repo: str, branch: str):
+        self._branches.pop(self.key(owner, repo, branch), None)
+
+    def _put(self, key: str, commits: List[CommitRecord]):
+        self._branches[key] = commits
+        self._branches.move_to_end(key)
+        while len(self._branches) > self.max_branches:
+            evicted, _ = self._branches.popitem(last=False)
+            self._locks.pop(evicted, None)
+
+    async def get_commits(self, client, owner: str, repo: str, branch: str,
+                          headers: Optional[dict] = None) -> List[CommitRecord]:
+        """All commits on the branch, newest first, refreshed against the current head"""
+        key = self.key(owner, repo, branch)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            cached = self._branches.get(key)
+            if cached:
+                head_sha = await get_branch_head_sha(client, owner, repo, branch, headers)
+                if cached[0].sha == head_sha:
+                    self.stats["unchanged"] += 1
+                    self._branches.move_to_end(key)
+                    return cached
+                commits = await self._fetch_new(client, owner, repo, cached, head_sha, headers)
+                if commits is not None:
+                    self.stats["incremental_updates"] += 1
+                    self._put(key, commits)
+                    return commits
+
+            commits = await self._fetch_all(client, owner, repo, branch, headers)
+            self.stats["full_loads"] += 1
+            if commits:
+                self._put(key, commits)
+            return commits
+
+    async def _fetch_all(self, client, owner: str, repo: str, branch: str,
+                         headers: Optional[dict]) -> List[CommitRecord]:
+        commits = []
+        page = 1
+        while True:
+            commits_url = f"https://api.github.com/repos/{owner}/{repo}/commits?sha={branch}&per_page=100&page={page}"
+            resp = await client.get(commits_url, headers=headers)
+            if resp.status_code != 200:
+                raise HTTPException(status_code=resp.status_code, detail="Error fetching commits from GitHub")
+            page_commits = resp.json()
+            if not page_commits:
+                break
+            commits.extend(records_from_github(page_commits))
+            page += 1
+        return commits
+
+    async def _fetch_new(self, client, owner: str, repo: str, cached: List[CommitRecord], head_sha: str,
+                         headers: Optional[dict]) -> Optional[List[CommitRecord]]:
+        """Prepend commits pushed on top of the stored head, or None if a full reload is needed"""
+        compare_url = f"https://api.github.com/repos/{owner}/{repo}/compare/{cached[0].sha}...{head_sha}"
+        resp = await client.get(compare_url, headers=headers)
+        if resp.status_code != 200:
+            return None
+        compare = resp.json()
+        new_commits = records_from_github(compare.get("commits", []))
+        if compare.get("status") != "ahead" or compare.get("ahead_by") != len(new_commits) \
+                or len(new_commits) >= COMPARE_MAX_COMMITS:
+            return None
+
+        # compare lists oldest first, ending at the new head. The order is kept as listed, not
+        # re-sorted by date: rebased or cherry-picked commits keep their old author dates, and
+        # callers rely on commits[0] being the branch head
+        if not new_commits or new_commits[-1].sha != head_sha:
+            return None
+        return new_commits[::-1] + cached
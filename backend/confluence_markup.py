@@ -0,0 +1,252 @@
+"""
+Markdown -> Confluence storage format conversion and page chunking.
+
+These are pure, CPU-bound functions on plain strings, kept out of backend.py so the
+CPU pool's worker processes can import them without loading the web application.
+"""
+import re
+from typing import List
+
+# Line-level and inline tokens for the Markdown -> Confluence storage converter.
+# Inline patterns use negated character classes so each line is matched in linear time.
+_md_heading_re = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_md_fence_re = re.compile(r'^\s*```\s*([\w+#.-]*)')
+_md_bullet_re = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+_md_numbered_re = re.compile(r'^(\s*)\d+[.)]\s+(.*)$')
+# Only * marks emphasis: with __ too, dunder names in prose (__init__, __slots__) would turn bold
+_md_inline_re = re.compile(r'`([^`]+)`|\*\*([^*]+)\*\*|\*([^*\s][^*]*)\*')
+_md_escape_table = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def _md_inline(text: str) -> str:
+    """Escape a line of text and convert inline code, bold and italic spans"""
+    def replace(match):
+        code, bold, italic = match.groups()
+        if code is not None:
+            return f"<code>{code}</code>"
+        if italic is not None:
+            return f"<em>{italic}</em>"
+        return f"<strong>{bold}</strong>"
+
+    return _md_inline_re.sub(replace, text.translate(_md_escape_table))
+
+
+def _md_code_macro(language: str, code_lines: List[str]) -> str:
+    # "]]>" cannot appear inside CDATA, so split it across two sections
+    code = "\n".join(code_lines).replace("]]>", "]]]]><![CDATA[>")
+    return (
+        '<ac:structured-macro ac:name="code" ac:schema-version="1">'
+        f'<ac:parameter ac:name="language">{language or "text"}</ac:parameter>'
+        f'<ac:plain-text-body><![CDATA[{code}]]></ac:plain-text-body>'
+        '</ac:structured-macro>'
+    )
+
+
+def markdown_to_confluence_storage(markdown_content: str) -> str:
+    """
+    Convert markdown to Confluence storage format in a single pass over the lines.
+
+    Consecutive list items are grouped into one <ul>/<ol> (nested by indentation),
+    fenced code blocks become code macros, and runs of text lines become paragraphs.
+    """
+    out = []
+    paragraph = []
+    list_stack = []  # (indent, tag) of the currently open lists, innermost last
+    code_language = None
+    code_lines = []
+    in_code = False
+
+    def flush_paragraph():
+        if paragraph:
+            out.append("<p>" + "<br/>".join(paragraph) + "</p>")
+            paragraph.clear()
+
+    def close_lists(indent: int = -1):
+        while list_stack and list_stack[-1][0] > indent:
+            out.append(f"</li></{list_stack.pop()[1]}>")
+
+    def add_list_item(indent: int, tag: str, text: str):
+        flush_paragraph()
+        close_lists(indent)
+        if list_stack and list_stack[-1][0] == indent:
+            if list_stack[-1][1] == tag:
+                out.append(f"</li><li>{_md_inline(text)}")
+                return
+            out.append(f"</li></{list_stack.pop()[1]}>")
+        # Either the first item of a list or a nested list inside the open <li>
+        list_stack.append((indent, tag))
+        out.append(f"<{tag}><li>{_md_inline(text)}")
+
+    for line in markdown_content.splitlines():
+        if in_code:
+            if line.strip().startswith("```"):
+                out.append(_md_code_macro(code_language, code_lines))
+                code_lines = []
+                in_code = False
+            else:
+                code_lines.append(line)
+            continue
+
+        fence = _md_fence_re.match(line)
+        if fence:
+            flush_paragraph()
+            close_lists()
+            in_code = True
+            code_language = fence.group(1)
+            continue
+
+        if not line.strip():
+            flush_paragraph()
+            close_lists()
+            continue
+
+        heading = _md_heading_re.match(line)
+        if heading:
+            flush_paragraph()
+            close_lists()
+            level = len(heading.group(1))
+            out.append(f"<h{level}>{_md_inline(heading.group(2))}</h{level}>")
+            continue
+
+        bullet = _md_bullet_re.match(line)
+        if bullet:
+            add_list_item(len(bullet.group(1).expandtabs(4)), "ul", bullet.group(2))
+            continue
+
+        numbered = _md_numbered_re.match(line)
+        if numbered:
+            add_list_item(len(numbered.group(1).expandtabs(4)), "ol", numbered.group(2))
+            continue
+
+        stripped = line.strip()
+        if stripped in ("---", "***", "___"):
+            flush_paragraph()
+            close_lists()
+            out.append("<hr/>")
+            continue
+
+        if list_stack:
+            # Continuation line of the current list item
+            out.append("<br/>" + _md_inline(stripped))
+        else:
+            paragraph.append(_md_inline(stripped))
+
+    # Unterminated code fence: keep its content rather than dropping it
+    if in_code:
+        out.append(_md_code_macro(code_language, code_lines))
+    flush_paragraph()
+    close_lists()
+
+    return "".join(out)
+
+
+_md_split_fence_re = re.compile(r'^\s*```')
+
+
+def split_markdown_at_headings(markdown_content: str, level: int) -> List[tuple]:
+    """
+    Split markdown before every heading of exactly `level`, ignoring lines inside
+    code fences. Returns (heading_text, section_markdown) pairs; text before the first
+    heading comes back with heading_text None.
+    """
+    sections = []
+    heading = None
+    lines = []
+    in_code = False
+    for line in markdown_content.splitlines(keepends=True):
+        if _md_split_fence_re.match(line):
+            in_code = not in_code
+        elif not in_code:
+            match = _md_heading_re.match(line)
+            if match and len(match.group(1)) == level:
+                if lines:
+                    sections.append((heading, "".join(lines)))
+                heading = match.group(2)
+                lines = []
+        lines.append(line)
+    if lines:
+        sections.append((heading, "".join(lines)))
+    return sections
+
+
+def _split_lines_by_size(markdown_content: str, max_bytes: int) -> List[str]:
+    """Last-resort split of a section with no usable headings into pieces of at most ~max_bytes"""
+    parts = []
+    current = []
+    size = 0
+    for line in markdown_content.splitlines(keepends=True):
+        line_size = len(line.encode("utf-8"))
+        if current and size + line_size > max_bytes:
+            parts.append("".join(current))
+            current = []
+            size = 0
+        current.append(line)
+        size += line_size
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _storage_size(markdown_content: str) -> int:
+    return len(markdown_to_confluence_storage(markdown_content).encode("utf-8"))
+
+
+def _pack_markdown(section: str, max_bytes: int, level: int) -> List[str]:
+    """
+    Split an oversized section into consecutive pieces at headings deeper than `level`,
+    packing adjacent sub-sections together while their storage body fits in max_bytes.
+    """
+    if level < 6 and len(split_markdown_at_headings(section, level + 1)) > 1:
+        pieces = []
+        for _, sub_section in split_markdown_at_headings(section, level + 1):
+            if _storage_size(sub_section) > max_bytes:
+                pieces.extend(_pack_markdown(sub_section, max_bytes, level + 1))
+            else:
+                pieces.append(sub_section)
+    else:
+        # Markup roughly doubles diff-heavy text, so split raw markdown at half the budget
+        pieces = _split_lines_by_size(section, max_bytes // 2)
+
+    # Storage size is close to additive across pieces, so pack on the summed sizes
+    packed = []
+    packed_size = 0
+    for piece in pieces:
+        piece_size = _storage_size(piece)
+        if packed and packed_size + piece_size <= max_bytes:
+            packed[-1] += piece
+            packed_size += piece_size
+        else:
+            packed.append(piece)
+            packed_size = piece_size
+    return packed
+
+
+def chunk_markdown_for_confluence(markdown_content: str, max_bytes: int) -> List[tuple]:
+    """
+    Break a document into (section_title, storage_content) chunks, one per level-2 section.
+    Sections whose storage body does not fit in max_bytes are split at deeper headings
+    into numbered parts.
+    """
+    chunks = []
+    for heading, section in split_markdown_at_headings(markdown_content, 2):
+        storage = markdown_to_confluence_storage(section)
+        if len(storage.encode("utf-8")) <= max_bytes:
+            chunks.append((heading, storage))
+            continue
+        for i, part in enumerate(_pack_markdown(section, max_bytes, 2)):
+            chunks.append((f"{heading or 'Overview'} (part {i + 1})", markdown_to_confluence_storage(part)))
+    return chunks
+
+
+_evolution_commit_re = re.compile(
+    r"### Commit `([a-f0-9]+)`[\s\S]*?- \*\*Date:\*\* ([^\n]+)\n- \*\*Author:\*\* ([^\n]+)\n"
+    r"- \*\*Message:\*\* ([^\n]+)\n([\s\S]*?)(?=\n---|$)"
+)
+
+
+def parse_evolution_commits(markdown: str) -> List[dict]:
+    """Commits (sha, date, author, message, changes) listed in evolution-summary markdown"""
+    return [
+        {"sha": sha, "date": date, "author": author, "message": message, "changes": changes.strip()}
+        for sha, date, author, message, changes in _evolution_commit_re.findall(markdown)
+    ]
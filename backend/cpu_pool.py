@@ -0,0 +1,157 @@
+"""
+Process pool for CPU-bound analysis stages.
+
+Clustering commit messages, aggregating per-author statistics, ranking large trees and
+converting or parsing big markdown documents are pure Python and would otherwise hold
+the event loop (and the GIL) for seconds on big repositories. CPUPool.run() sends them to
+a bounded pool of worker processes:
+
+- at most CPU_POOL_WORKERS processes (0 runs everything inline), started with "spawn" so
+  no locks or sockets of the server are inherited, and replaced after
+  CPU_POOL_MAX_TASKS_PER_CHILD tasks to keep their memory in check;
+- at most CPU_POOL_MAX_PENDING tasks submitted at once; further callers wait;
+- every task has a deadline (CPU_POOL_TIMEOUT_SECONDS). A task past it cannot be
+  interrupted, so its pool is retired: new tasks go to a fresh pool, the other tasks of the
+  retired one finish there (within their own deadlines), and then its processes are
+  stopped, the stuck one with them.
+
+Pickling is not free, so callers run inputs that take a few milliseconds inline
+(CPU_POOL_INLINE_ITEMS and CPU_POOL_INLINE_BYTES) and pass plain tuples and strings rather
+than GitHub JSON. Worker functions live in modules that do not import backend.py.
+"""
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Set
+
+from fastapi import HTTPException
+
+from timings import count
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_POOL_MAX_PENDING = int(os.getenv("CPU_POOL_MAX_PENDING", "32"))
+CPU_POOL_TIMEOUT_SECONDS = float(os.getenv("CPU_POOL_TIMEOUT_SECONDS", "120"))
+CPU_POOL_MAX_TASKS_PER_CHILD = int(os.getenv("CPU_POOL_MAX_TASKS_PER_CHILD", "100"))
+
+# Below these sizes a stage takes a few milliseconds and runs inline
+CPU_POOL_INLINE_ITEMS = int(os.getenv("CPU_POOL_INLINE_ITEMS", "250"))
+CPU_POOL_INLINE_BYTES = int(os.getenv("CPU_POOL_INLINE_BYTES", str(32 * 1024)))
+
+
+class CPUPool:
+    def __init__(self, workers: int = CPU_POOL_WORKERS, max_pending: int = CPU_POOL_MAX_PENDING,
+                 timeout_seconds: float = CPU_POOL_TIMEOUT_SECONDS,
+                 max_tasks_per_child: int = CPU_POOL_MAX_TASKS_PER_CHILD):
+        self.workers = workers
+        self.timeout_seconds = timeout_seconds
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Tasks in flight per pool, and pools retired after a timeout that still have some
+        self._in_flight: Dict[ProcessPoolExecutor, Set[asyncio.Future]] = {}
+        self._retiring: Set[ProcessPoolExecutor] = set()
+        self._reapers: Set[asyncio.Task] = set()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._running = 0
+        self.stats = {"submitted": 0, "inline": 0, "timeouts": 0, "failures": 0, "restarts": 0, "busy_seconds": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=self.max_tasks_per_child or None,
+            )
+        return self._executor
+
+    def _detach(self, executor: ProcessPoolExecutor) -> bool:
+        """Stop sending new tasks to executor; False if that was already done"""
+        if self._executor is not executor:
+            return False
+        self._executor = None
+        self.stats["restarts"] += 1
+        return True
+
+    @staticmethod
+    def _terminate(executor: ProcessPoolExecutor):
+        """Tear a pool down without waiting (a stuck task would otherwise block forever)"""
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _retire(self, executor: ProcessPoolExecutor):
+        """After a timeout: new tasks go to a fresh pool, this one is stopped once its other tasks are done"""
+        if executor in self._retiring:
+            return
+        self._detach(executor)
+        self._retiring.add(executor)
+        others = {future for future in self._in_flight.get(executor, ()) if not future.done()}
+        reaper = asyncio.get_running_loop().create_task(self._terminate_when_done(executor, others))
+        self._reapers.add(reaper)
+        reaper.add_done_callback(self._reapers.discard)
+
+    async def _terminate_when_done(self, executor: ProcessPoolExecutor, futures: Set[asyncio.Future]):
+        if futures:
+            # Each of them has its own deadline, so this wait is bounded by the same timeout
+            await asyncio.wait(futures, timeout=self.timeout_seconds)
+        self._retiring.discard(executor)
+        self._in_flight.pop(executor, None)
+        self._terminate(executor)
+
+    async def run(self, func: Callable, *args, inline: bool = False, timeout: Optional[float] = None):
+        """func(*args) in a worker process (or inline when asked to, or with no workers configured)"""
+        if inline or self.workers <= 0:
+            self.stats["inline"] += 1
+            return func(*args)
+        timeout = self.timeout_seconds if timeout is None else timeout
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            self.stats["submitted"] += 1
+            self._running += 1
+            count("cpu_pool_tasks")
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, func, *args)
+            in_flight = self._in_flight.setdefault(executor, set())
+            in_flight.add(future)
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self._retire(executor)
+                raise HTTPException(status_code=504, detail=f"{func.__name__} did not finish within {timeout:.0f}s")
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); the pool's other tasks fail with it, so
+                # it is dropped at once and a fresh one serves the next task
+                self.stats["failures"] += 1
+                if self._detach(executor):
+                    self._in_flight.pop(executor, None)
+                    self._terminate(executor)
+                raise HTTPException(status_code=503, detail=f"{func.__name__} failed: worker process died")
+            finally:
+                in_flight.discard(future)
+                if not in_flight and executor is not self._executor and executor not in self._retiring:
+                    self._in_flight.pop(executor, None)
+                self._running -= 1
+                self.stats["busy_seconds"] += time.perf_counter() - started
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for executor in self._retiring:
+            self._terminate(executor)
+        self._retiring.clear()
+        self._in_flight.clear()
+
+    def status(self) -> dict:
+        return {"workers": self.workers, "started": self._executor is not None, "running": self._running,
+                "retiring_pools": len(self._retiring),
+                **self.stats, "busy_seconds": round(self.stats["busy_seconds"], 3)}
+
+
+cpu_pool = CPUPool()
@@ -0,0 +1,185 @@
+"""
+Diff compaction for the commit-history prompts.
+
+GitHub's compare API returns one unified-diff patch per changed file. Pasted as-is, most
+of a large history is noise: lockfiles, minified bundles, generated and vendored code,
+re-indented files and long runs of unchanged context. compact_file() reduces each file to
+what explains the change:
+
+- lockfiles, vendored or build-output paths (file_ranking.LOCK_FILES / EXCLUDED_DIRS),
+  minified, generated and binary files keep no patch, only a note with +/- line counts
+- whitespace-only changes and pure renames become a one-line note
+- unchanged context is cut to DIFF_CONTEXT_LINES around each change
+- hunks with more than DIFF_HUNK_MAX_LINES changed lines are cut to their first lines and
+  their +/- counts
+- what is left is cut at DIFF_PATCH_MAX_CHARS on a line boundary
+
+Compacted files are {"filename", "patch", "note"}; patch is None when only the note is
+kept. DIFF_FORMAT is part of the cache keys of compacted diffs and history digests, so
+changing the rules here should bump it.
+"""
+import os
+import posixpath
+import re
+from typing import List, Optional
+
+from file_ranking import EXCLUDED_DIRS, LOCK_FILES
+
+DIFF_FORMAT = "compact-1"
+
+DIFF_PATCH_MAX_CHARS = int(os.getenv("DIFF_PATCH_MAX_CHARS", "2000"))
+DIFF_CONTEXT_LINES = int(os.getenv("DIFF_CONTEXT_LINES", "1"))
+DIFF_HUNK_MAX_LINES = int(os.getenv("DIFF_HUNK_MAX_LINES", "80"))
+# Lines of an oversized hunk shown before its +/- counts
+DIFF_HUNK_HEAD_LINES = 8
+# A changed line this long is minified or data, not something to read
+DIFF_MINIFIED_LINE_CHARS = 1000
+
+_generated_name_re = re.compile(
+    r"(\.min\.(js|css|mjs)|\.(js|css)\.map|_pb2(_grpc)?\.pyi?|\.pb\.(go|cc|h)|\.pb\.gw\.go|\.g\.dart|\.freezed\.dart"
+    r"|\.generated\.\w+|\.designer\.cs|\.snap)$",
+    re.IGNORECASE,
+)
+_generated_marker_re = re.compile(r"@generated|DO NOT EDIT|auto-?generated", re.IGNORECASE)
+_hunk_header_re = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+def low_signal_reason(path: str) -> Optional[str]:
+    """Why a file's patch is not worth showing, judged from its path alone"""
+    segments = path.split("/")
+    if segments[-1] in LOCK_FILES:
+        return "lockfile"
+    if any(segment in EXCLUDED_DIRS for segment in segments[:-1]):
+        return "vendored or build output"
+    if _generated_name_re.search(posixpath.basename(path)):
+        return "minified" if ".min." in path.lower() or path.lower().endswith(".map") else "generated"
+    return None
+
+
+def _changed_lines(patch: str) -> tuple:
+    added, removed = [], []
+    for line in patch.splitlines():
+        if line.startswith("+"):
+            added.append(line[1:])
+        elif line.startswith("-"):
+            removed.append(line[1:])
+    return added, removed
+
+
+def _squash_whitespace(lines: List[str]) -> List[str]:
+    return sorted(squashed for squashed in ("".join(line.split()) for line in lines) if squashed)
+
+
+def is_whitespace_only(patch: str) -> bool:
+    """True if the added and removed lines are the same apart from whitespace"""
+    added, removed = _changed_lines(patch)
+    if not added and not removed:
+        return False
+    return _squash_whitespace(added) == _squash_whitespace(removed)
+
+
+def _split_hunks(patch: str) -> List[List[str]]:
+    """[[header, line, ...], ...]; lines before the first header form a header-less hunk"""
+    hunks = []
+    for line in patch.splitlines():
+        if _hunk_header_re.match(line) or not hunks:
+            hunks.append([line])
+        else:
+            hunks[-1].append(line)
+    return hunks
+
+
+def _compact_hunk(hunk: List[str], context: int, hunk_max_lines: int) -> List[str]:
+    header, body = (hunk[0], hunk[1:]) if _hunk_header_re.match(hunk[0]) else (None, hunk)
+    changed = [i for i, line in enumerate(body) if line[:1] in ("+", "-")]
+    added = sum(1 for i in changed if body[i].startswith("+"))
+    lines = [header] if header is not None else []
+    if len(changed) > hunk_max_lines:
+        # The first lines usually say what the block is (a new function, class or section)
+        return lines + body[:DIFF_HUNK_HEAD_LINES] + [f"... large change: +{added} -{len(changed) - added} lines ..."]
+
+    keep = set()
+    for i in changed:
+        keep.update(range(i - context, i + context + 1))
+    skipped = []
+
+    def flush():
+        # A marker only pays off for runs longer than itself
+        if len(skipped) > 2:
+            lines.append(f" ... {len(skipped)} unchanged lines ...")
+        else:
+            lines.extend(skipped)
+        skipped.clear()
+
+    for i, line in enumerate(body):
+        if line.startswith("\\"):
+            # "\ No newline at end of file" belongs to the line before it
+            if not skipped:
+                lines.append(line)
+        elif i in keep or line[:1] in ("+", "-"):
+            flush()
+            lines.append(line)
+        else:
+            skipped.append(line)
+    flush()
+    return lines
+
+
+def compact_patch(patch: str, context: int = DIFF_CONTEXT_LINES, hunk_max_lines: int = DIFF_HUNK_MAX_LINES,
+                  max_chars: int = DIFF_PATCH_MAX_CHARS) -> str:
+    """Patch with context cut down, oversized hunks summarized, and the result capped at max_chars"""
+    lines = []
+    for hunk in _split_hunks(patch):
+        lines.extend(_compact_hunk(hunk, context, hunk_max_lines))
+    kept, size = [], 0
+    for n, line in enumerate(lines):
+        if size + len(line) + 1 > max_chars:
+            remaining = sum(1 for rest in lines[n:] if rest[:1] in ("+", "-"))
+            kept.append(f"...diff truncated ({remaining} more changed lines)...")
+            break
+        kept.append(line)
+        size += len(line) + 1
+    return "\n".join(kept)
+
+
+def _starts_at_top(patch: str) -> bool:
+    """Whether the first hunk covers the top of the file, where generators put their banner"""
+    return patch.startswith(("@@ -0,0 +1", "@@ -1,", "@@ -1 "))
+
+
+def _line_stats(file: dict) -> str:
+    return f"+{file.get('additions', 0)} -{file.get('deletions', 0)}"
+
+
+def compact_file(file: dict) -> dict:
+    """One file of a GitHub compare/commit response reduced to {"filename", "patch", "note"}"""
+    filename = file["filename"]
+    patch = file.get("patch")
+    renamed_from = file.get("previous_filename") if file.get("status") == "renamed" else None
+    note = None
+
+    reason = low_signal_reason(filename)
+    if reason is None and renamed_from and not file.get("changes"):
+        return {"filename": filename, "patch": None, "note": f"renamed from `{renamed_from}` (no content changes)"}
+    if reason is None and not patch and file.get("status") != "removed":
+        reason = "binary or too large to diff"
+    if reason is None and patch:
+        added, removed = _changed_lines(patch)
+        if any(len(line) > DIFF_MINIFIED_LINE_CHARS for line in added + removed):
+            reason = "minified"
+        elif _starts_at_top(patch) and _generated_marker_re.search("\n".join(patch.splitlines()[1:6])):
+            reason = "generated"
+        elif is_whitespace_only(patch):
+            reason = "whitespace-only"
+    if reason is not None:
+        return {"filename": filename, "patch": None, "note": f"{reason} ({_line_stats(file)})"}
+
+    if file.get("status") == "removed":
+        return {"filename": filename, "patch": None, "note": f"deleted ({_line_stats(file)})"}
+    if renamed_from:
+        note = f"renamed from `{renamed_from}`"
+    return {"filename": filename, "patch": compact_patch(patch), "note": note}
+
+
+def compact_files(files: List[dict]) -> List[dict]:
+    return [compact_file(file) for file in files]
@@ -0,0 +1,367 @@
+"""
+Bounded caches for generated documents.
+
+Two interchangeable backends share the DocumentCache interface:
+
+- MemoryDocumentCache: per-process LRU with a byte budget and TTL, optionally spilling
+  evicted entries to a directory on disk instead of dropping them. Every namespace has its
+  own budget, and all of them together share the process-wide MemoryBudget, which evicts
+  the least recently used entry of any namespace. Spilled files have a byte budget of
+  their own; the oldest (and expired) ones are deleted when more are spilled.
+- SQLiteDocumentCache: a single SQLite file (WAL mode) that every uvicorn worker on the
+  host opens, so all workers see the same entries.
+
+Values are JSON-serializable objects. Configure with DOC_CACHE_BACKEND (memory|sqlite),
+DOC_CACHE_MAX_BYTES (per namespace), DOC_CACHE_TOTAL_MAX_BYTES (all memory caches of a
+process), DOC_CACHE_TTL_SECONDS, DOC_CACHE_SPILL_DIR, DOC_CACHE_SPILL_MAX_BYTES (per
+namespace) and DOC_CACHE_SQLITE_PATH.
+"""
+import abc
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+DOC_CACHE_BACKEND = os.getenv("DOC_CACHE_BACKEND", "memory")
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+DOC_CACHE_TOTAL_MAX_BYTES = int(os.getenv("DOC_CACHE_TOTAL_MAX_BYTES", str(256 * 1024 * 1024)))
+DOC_CACHE_TTL_SECONDS = float(os.getenv("DOC_CACHE_TTL_SECONDS", str(24 * 3600)))
+DOC_CACHE_SPILL_DIR = os.getenv("DOC_CACHE_SPILL_DIR")
+DOC_CACHE_SPILL_MAX_BYTES = int(os.getenv("DOC_CACHE_SPILL_MAX_BYTES", str(256 * 1024 * 1024)))
+DOC_CACHE_SQLITE_PATH = os.getenv("DOC_CACHE_SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "documents.sqlite3"))
+
+
+class DocumentCache(abc.ABC):
+    """Interface shared by the cache backends"""
+
+    def __init__(self, namespace: str, max_bytes: int, ttl_seconds: float):
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @abc.abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: Any):
+        ...
+
+    @abc.abstractmethod
+    def delete(self, key: str):
+        ...
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    @abc.abstractmethod
+    def entry_stats(self) -> tuple:
+        """Return (entries, bytes) currently held"""
+
+    def stats(self) -> dict:
+        entries, size = self.entry_stats()
+        lookups = self.hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "backend": type(self).__name__,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MemoryBudget:
+    """
+    Byte budget shared by memory caches. It tracks their entries in one LRU order and, when
+    the total is over budget, evicts the least recently used entry of whichever cache holds it.
+    The caches sharing a budget also share its lock.
+    """
+
+    def __init__(self, max_bytes: int = DOC_CACHE_TOTAL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self._lru = OrderedDict()  # (cache, key) -> None, least recently used first
+
+    def add(self, cache: "MemoryDocumentCache", key: str, size: int):
+        self._lru[(cache, key)] = None
+        self.bytes += size
+
+    def touch(self, cache: "MemoryDocumentCache", key: str):
+        self._lru.move_to_end((cache, key))
+
+    def remove(self, cache: "MemoryDocumentCache", key: str, size: int):
+        del self._lru[(cache, key)]
+        self.bytes -= size
+
+    def enforce(self):
+        # The newest entry is always kept, as in the per-namespace limit
+        while self.bytes > self.max_bytes and len(self._lru) > 1:
+            cache, key = next(iter(self._lru))
+            cache._evict(key)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {"entries": len(self._lru), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+# Shared by every MemoryDocumentCache of the process unless one is given its own
+memory_budget = MemoryBudget()
+
+
+class MemoryDocumentCache(DocumentCache):
+    """In-process LRU + TTL cache bounded by the total size of the serialized values"""
+
+    def __init__(self, namespace: str, max_bytes: int = DOC_CACHE_MAX_BYTES,
+                 ttl_seconds: float = DOC_CACHE_TTL_SECONDS, spill_dir: Optional[str] = DOC_CACHE_SPILL_DIR,
+                 budget: Optional[MemoryBudget] = None, spill_max_bytes: int = DOC_CACHE_SPILL_MAX_BYTES):
+        super().__init__(namespace, max_bytes, ttl_seconds)
+        self._entries = OrderedDict()  # key -> (payload, expires_at), least recently used first
+        self._bytes = 0
+        self._budget = budget if budget is not None else memory_budget
+        self._lock = self._budget.lock
+        self.spill_dir = os.path.join(spill_dir, namespace) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self._spilled = OrderedDict()  # file name -> (size, expires_at), oldest spill first
+        self._spilled_bytes = 0
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._load_spilled()
+
+    def _load_spilled(self):
+        """Account for files spilled by an earlier process; they expire at the latest a TTL after being written"""
+        files = []
+        for entry in os.scandir(self.spill_dir):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(files):
+            self._spilled[name] = (size, mtime + self.ttl_seconds)
+            self._spilled_bytes += size
+
+    @staticmethod
+    def _spill_name(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json"
+
+    def _forget_spilled(self, name: str, remove: bool = True):
+        size, _ = self._spilled.pop(name, (0, 0))
+        self._spilled_bytes -= size
+        if remove:
+            try:
+                os.remove(os.path.join(self.spill_dir, name))
+            except OSError:
+                pass
+
+    def _spill(self, key: str, payload: str, expires_at: float):
+        name = self._spill_name(key)
+        self._forget_spilled(name, remove=False)
+        record = json.dumps({"expires_at": expires_at, "payload": payload})
+        try:
+            with open(os.path.join(self.spill_dir, name), "w", encoding="utf-8") as f:
+                f.write(record)
+        except OSError:
+            return
+        self._spilled[name] = (len(record), expires_at)
+        self._spilled_bytes += len(record)
+        # Oldest spills go first: once expired, or while the directory is over its budget
+        now = time.time()
+        while self._spilled:
+            oldest, (_, oldest_expires_at) = next(iter(self._spilled.items()))
+            if oldest_expires_at > now and self._spilled_bytes <= self.spill_max_bytes:
+                break
+            self._forget_spilled(oldest)
+
+    def _unspill(self, key: str) -> Optional[tuple]:
+        name = self._spill_name(key)
+        try:
+            with open(os.path.join(self.spill_dir, name), encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            self._forget_spilled(name)
+            return None
+        self._forget_spilled(name)
+        return record["payload"], record["expires_at"]
+
+    def _remove(self, key: str) -> tuple:
+        payload, expires_at = self._entries.pop(key)
+        self._bytes -= len(payload)
+        self._budget.remove(self, key, len(payload))
+        return payload, expires_at
+
+    def _evict(self, key: str):
+        payload, expires_at = self._remove(key)
+        self.evictions += 1
+        if self.spill_dir:
+            self._spill(key, payload, expires_at)
+
+    def _insert(self, key: str, payload: str, expires_at: float):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (payload, expires_at)
+        self._bytes += len(payload)
+        self._budget.add(self, key, len(payload))
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._evict(next(iter(self._entries)))
+        self._budget.enforce()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.spill_dir:
+                entry = self._unspill(key)
+                if entry is not None:
+                    self._insert(key, *entry)
+            if entry is None:
+                self.misses += 1
+                return default
+            payload, expires_at = entry
+            if expires_at <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._budget.touch(self, key)
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, key: str, value: Any):
+        payload = json.dumps(value)
+        with self._lock:
+            self._insert(key, payload, time.time() + self.ttl_seconds)
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if self.spill_dir:
+                self._forget_spilled(self._spill_name(key))
+
+    def entry_stats(self) -> tuple:
+        """Entries and bytes held in memory and, when spilling, on disk"""
+        with self._lock:
+            return len(self._entries) + len(self._spilled), self._bytes + self._spilled_bytes
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update(memory_entries=len(self._entries), memory_bytes=self._bytes,
+                         spilled_entries=len(self._spilled), spilled_bytes=self._spilled_bytes,
+                         spill_max_bytes=self.spill_max_bytes if self.spill_dir else None)
+        return stats
+
+
+class SQLiteDocumentCache(DocumentCache):
+    """LRU + TTL cache in a SQLite file shared by every worker process on the host"""
+
+    def __init__(self, namespace: str, path: str = DOC_CACHE_SQLITE_PATH,
+                 max_bytes: int = DOC_CACHE_MAX_BYTES, ttl_seconds: float = DOC_CACHE_TTL_SECONDS):
+        super().__init__(namespace, max_bytes, ttl_seconds)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, payload TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_lru ON documents (namespace, last_access)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM documents WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM documents WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._conn.execute(
+                "UPDATE documents SET last_access = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+            )
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        payload = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (namespace, key, payload, size, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.namespace, key, payload, len(payload), now + self.ttl_seconds, now),
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float):
+        expired = self._conn.execute(
+            "DELETE FROM documents WHERE namespace = ? AND expires_at <= ?", (self.namespace, now)
+        ).rowcount
+        self.expirations += max(expired, 0)
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM documents WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Walk least recently used entries until enough bytes are freed (always keep the newest)
+        to_delete = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM documents WHERE namespace = ? ORDER BY last_access ASC", (self.namespace,)
+        ).fetchall()[:-1]:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((self.namespace, key))
+            total -= size
+        self._conn.executemany("DELETE FROM documents WHERE namespace = ? AND key = ?", to_delete)
+        self.evictions += len(to_delete)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def entry_stats(self) -> tuple:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+        return count, size
+
+
+def create_document_cache(namespace: str, backend: str = DOC_CACHE_BACKEND, **kwargs) -> DocumentCache:
+    """Build the configured cache backend for one namespace"""
+    if backend == "sqlite":
+        return SQLiteDocumentCache(namespace, **kwargs)
+    if backend == "memory":
+        return MemoryDocumentCache(namespace, **kwargs)
+    raise ValueError(f"Unknown DOC_CACHE_BACKEND: {backend}")
@@ -0,0 +1,257 @@
+"""
+File selection for the usage guide prompt.
+
+Files are classified by role from their path segments (not substrings, so "calibration/"
+or "capital/" are not mistaken for backend code), vendored and generated content is
+dropped, and every remaining file is scored by a list of pluggable scorers:
+
+- role: manifests > entry points > docs > source > config > tests
+- depth: files near the repository root describe it better than deeply nested ones
+- size: very large files are mostly data; tiny ones carry no information
+- centrality: how many other candidate files import it (needs file contents)
+
+rank_files() runs the metadata-only scorers over the whole tree; after the contents of
+the top candidates are fetched, import_in_degree() and a second rank_files() pass add
+centrality, and select_within_budget() keeps the best files that fit the prompt budget.
+Apart from the final sort, everything is linear in the number of files.
+"""
+import math
+import posixpath
+import re
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Directories whose contents never help explain how to use a project
+EXCLUDED_DIRS = {
+    "node_modules", "bower_components", "jspm_packages", "vendor", "third_party", "third-party",
+    "dist", "build", "out", "target", ".next", ".nuxt", ".svelte-kit", "coverage", ".git",
+    "__pycache__", ".venv", "venv", "env", "site-packages", ".tox", ".mypy_cache", ".pytest_cache",
+    ".gradle", ".idea", ".vscode", ".cache", "Pods", "DerivedData",
+}
+
+MANIFEST_FILES = {
+    'package.json', 'requirements.txt', 'Pipfile', 'pyproject.toml', 'setup.py', 'setup.cfg',
+    'Dockerfile', 'docker-compose.yml', 'docker-compose.yaml', 'Makefile', 'CMakeLists.txt',
+    'pom.xml', 'build.gradle', 'build.gradle.kts', 'Cargo.toml', 'go.mod', 'Gemfile', 'composer.json',
+    '.env.example', '.env.template', 'Procfile',
+}
+
+ENTRYPOINT_FILES = {
+    'main.py', 'app.py', 'run.py', 'server.py', 'manage.py', 'wsgi.py', 'asgi.py', '__main__.py', 'cli.py',
+    'index.js', 'main.js', 'server.js', 'app.js', 'start.js',
+    'index.ts', 'main.ts', 'server.ts', 'app.ts', 'index.tsx', 'main.tsx', 'main.jsx', 'App.jsx', 'App.tsx',
+    'main.go', 'main.rs', 'lib.rs', 'Main.java', 'Program.cs', 'config.ru',
+    'index.html', 'index.htm', 'main.html',
+}
+
+DOC_KEYWORDS = ('readme', 'install', 'setup', 'usage', 'getting', 'start', 'quick', 'tutorial', 'guide')
+
+LOCK_FILES = {
+    'package-lock.json', 'yarn.lock', 'pnpm-lock.yaml', 'poetry.lock', 'Pipfile.lock', 'Cargo.lock',
+    'go.sum', 'composer.lock', 'Gemfile.lock',
+}
+
+FRONTEND_DIRS = {'frontend', 'client', 'public', 'web', 'ui', 'www', 'components', 'pages', 'views'}
+BACKEND_DIRS = {'backend', 'server', 'api', 'services', 'cmd', 'internal'}
+TEST_DIRS = {'test', 'tests', 'spec', 'specs', '__tests__', 'testing', 'e2e'}
+
+FRONTEND_EXTS = {'jsx', 'tsx', 'vue', 'svelte', 'html', 'htm', 'css', 'scss', 'less'}
+BACKEND_EXTS = {'py', 'java', 'go', 'php', 'rb', 'rs', 'cpp', 'cc', 'c', 'h', 'cs', 'kt', 'scala', 'ex', 'exs'}
+SCRIPT_EXTS = {'js', 'mjs', 'cjs', 'ts'}
+CONFIG_EXTS = {'yml', 'yaml', 'toml', 'json', 'ini', 'cfg', 'conf'}
+DOC_EXTS = {'md', 'rst', 'txt'}
+
+# Anything bigger is data or generated code, not something to show the model
+MAX_FILE_BYTES = 512 * 1024
+
+# Rough characters per token, for turning a token budget into a byte budget
+CHARS_PER_TOKEN = 4
+# Approximate prompt overhead per file (heading and code fence)
+FILE_OVERHEAD_BYTES = 48
+
+ROLE_WEIGHTS = {"manifest": 10.0, "entrypoint": 8.0, "docs": 6.0, "source": 3.0, "config": 2.0, "test": 1.0, "other": 0.5}
+
+# Roles whose files drive the usage guide (shallow entry points and docs only)
+CRITICAL_ROLES = {"manifest", "entrypoint", "docs"}
+
+
+def classify_file(path: str, size: int = 0) -> Optional[dict]:
+    """Role, project area and depth of a tree path, or None for files that should never be analyzed"""
+    segments = path.split("/")
+    directories, filename = segments[:-1], segments[-1]
+    if any(d in EXCLUDED_DIRS for d in directories) or filename in LOCK_FILES or size > MAX_FILE_BYTES:
+        return None
+    lower = filename.lower()
+    ext = lower.rsplit('.', 1)[-1] if '.' in lower else ''
+    if lower.endswith(('.min.js', '.min.css', '.map')):
+        return None
+    depth = len(directories)
+    dir_set = {d.lower() for d in directories}
+
+    if filename in MANIFEST_FILES:
+        role, area = "manifest", "config"
+    elif dir_set & TEST_DIRS or lower.startswith('test_') or re.search(r'[._-](test|spec)\.\w+$', lower):
+        role, area = "test", "tests"
+    elif filename in ENTRYPOINT_FILES and depth <= 2:
+        role = "entrypoint"
+        area = "backend" if ext in BACKEND_EXTS else "frontend" if ext in FRONTEND_EXTS | SCRIPT_EXTS else "other"
+    elif ext in DOC_EXTS and (ext != 'txt' or lower.startswith('readme')):
+        role = "docs" if depth <= 2 and any(keyword in lower for keyword in DOC_KEYWORDS) else "other"
+        area = "docs"
+    elif ext in FRONTEND_EXTS or (ext in SCRIPT_EXTS and dir_set & FRONTEND_DIRS):
+        role, area = "source", "frontend"
+    elif ext in BACKEND_EXTS or (ext in SCRIPT_EXTS and dir_set & BACKEND_DIRS):
+        role, area = "source", "backend"
+    elif ext in SCRIPT_EXTS:
+        role, area = "source", "other"
+    elif ext in CONFIG_EXTS:
+        role, area = "config", "config"
+    else:
+        return None  # binaries, images, fonts and other assets
+    return {"role": role, "area": area, "depth": depth, "critical": role in CRITICAL_ROLES}
+
+
+def classify_files(tree_items: Iterable[dict]) -> List[dict]:
+    """Tree blob entries annotated with their classification (unanalyzable files dropped)"""
+    files = []
+    for item in tree_items:
+        info = classify_file(item["path"], item.get("size") or 0)
+        if info is not None:
+            files.append({**item, **info})
+    return files
+
+
+# -- scorers ---------------------------------------------------------------------------
+
+def role_score(file: dict) -> float:
+    return ROLE_WEIGHTS[file["role"]]
+
+
+def depth_score(file: dict) -> float:
+    return -0.5 * file["depth"]
+
+
+def size_score(file: dict) -> float:
+    size = file.get("size") or 0
+    if size < 32:
+        return -2.0
+    if size > 16 * 1024:
+        return -math.log2(size / (16 * 1024))
+    return 0.0
+
+
+def centrality_score(file: dict) -> float:
+    """Share of the most-imported file's in-degree (0 until import_in_degree() has run)"""
+    return 4.0 * file.get("centrality", 0.0)
+
+
+Scorer = Callable[[dict], float]
+DEFAULT_SCORERS: List[Scorer] = [role_score, depth_score, size_score, centrality_score]
+
+
+def rank_files(files: List[dict], scorers: Optional[List[Scorer]] = None) -> List[dict]:
+    """Set each file's score to the sum of the scorers and return the files best first"""
+    scorers = DEFAULT_SCORERS if scorers is None else scorers
+    for file in files:
+        file["score"] = sum(scorer(file) for scorer in scorers)
+    return sorted(files, key=lambda f: (-f["score"], f["path"]))
+
+
+def file_cost(file: dict, max_content_bytes: int) -> int:
+    return min(file.get("size") or 0, max_content_bytes) + FILE_OVERHEAD_BYTES
+
+
+def select_within_budget(ranked: List[dict], budget_bytes: int, max_content_bytes: Callable[[dict], int]) -> List[dict]:
+    """Take files in rank order, skipping any that no longer fit, until the budget is spent"""
+    selected, seen, spent = [], set(), 0
+    for file in ranked:
+        if file["path"] in seen:
+            continue
+        cost = file_cost(file, max_content_bytes(file))
+        if spent + cost > budget_bytes:
+            continue
+        seen.add(file["path"])
+        selected.append(file)
+        spent += cost
+    return selected
+
+
+# -- import graph ----------------------------------------------------------------------
+
+_python_import_re = re.compile(r'^\s*(?:from\s+(\.*[\w.]*)\s+import|import\s+([\w.]+(?:\s*,\s*[\w.]+)*))', re.MULTILINE)
+_js_import_re = re.compile(r'''(?:import\s[^'"]*?from\s*|import\s*\(?\s*|require\s*\(\s*)['"](\.{1,2}/[^'"]+)['"]''')
+_js_extensions = ('', '.js', '.ts', '.jsx', '.tsx', '.mjs', '.vue', '/index.js', '/index.ts', '/index.jsx', '/index.tsx')
+
+
+def _python_modules(path: str) -> List[str]:
+    """Dotted module names a .py file can be imported as (every suffix, to allow src/ layouts)"""
+    parts = path[:-3].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts)) if parts[i:]]
+
+
+def import_in_degree(files: List[dict], contents: Dict[str, str]):
+    """
+    Set each file's "centrality" from how many of the other given files import it.
+
+    Python absolute/relative imports and JS/TS relative imports/requires are resolved
+    against the given files only; other languages simply get no centrality.
+    """
+    paths = {f["path"] for f in files}
+    python_index = {}
+    for path in sorted(paths, key=len):
+        if path.endswith(".py"):
+            for module in _python_modules(path):
+                python_index.setdefault(module, path)
+
+    in_degree = dict.fromkeys(paths, 0)
+    for path, content in contents.items():
+        targets = set()
+        if path.endswith(".py"):
+            package = path.rsplit("/", 1)[0].split("/") if "/" in path else []
+            for relative, absolute in _python_import_re.findall(content):
+                names = [relative] if relative else [n.strip() for n in absolute.split(",")]
+                for name in names:
+                    dots = len(name) - len(name.lstrip("."))
+                    if dots:
+                        base = package[:len(package) - dots + 1] if dots <= len(package) + 1 else []
+                        name = ".".join(base + ([name[dots:]] if name[dots:] else []))
+                    # "import a.b.c" may refer to a module a.b.c or a name in package a.b
+                    while name:
+                        target = python_index.get(name)
+                        if target:
+                            targets.add(target)
+                            break
+                        name = name.rpartition(".")[0]
+        elif path.rsplit(".", 1)[-1] in SCRIPT_EXTS | {'jsx', 'tsx', 'vue', 'svelte'}:
+            directory = posixpath.dirname(path)
+            for spec in _js_import_re.findall(content):
+                base = posixpath.normpath(posixpath.join(directory, spec))
+                for suffix in _js_extensions:
+                    if base + suffix in paths:
+                        targets.add(base + suffix)
+                        break
+        targets.discard(path)
+        for target in targets:
+            in_degree[target] += 1
+
+    most = max(in_degree.values(), default=0)
+    for file in files:
+        file["centrality"] = in_degree[file["path"]] / most if most else 0.0
+
+
+def candidate_pool(ranked: List[dict], budget_bytes: int, max_content_bytes: Callable[[dict], int],
+                   max_files: int = 400) -> List[dict]:
+    """The best-ranked files worth fetching: about twice what fits in the budget"""
+    pool, spent = [], 0
+    for file in ranked:
+        if len(pool) >= max_files or spent >= 2 * budget_bytes:
+            break
+        pool.append(file)
+        spent += file_cost(file, max_content_bytes(file))
+    return pool
+
+
+def rank_tree(tree_items: List[dict]) -> List[dict]:
+    """classify_files() and rank_files() over a whole tree in one call (for the CPU pool)"""
+    return rank_files(classify_files(tree_items))
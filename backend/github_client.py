@@ -0,0 +1,326 @@
+"""
+Central GitHub request layer.
+
+Every GitHub call in the backend goes through one shared GitHubClient, which:
+
+- remembers ETag / Last-Modified validators and sends conditional requests, so unchanged
+  resources come back as 304 (free against the rate limit) and are served from memory.
+  Raw file downloads are not kept (the blob store already keeps them by content), nor are
+  responses over GITHUB_ETAG_CACHE_ENTRY_MAX_BYTES;
+- tracks X-RateLimit-Remaining / X-RateLimit-Reset and throttles to the remaining budget,
+  keeping a reserve that only interactive requests may spend. Background requests that
+  would have to dip into it raise RateLimitDeferred instead, so their callers can retry
+  after the window resets;
+- waits out secondary rate limits (403/429 with Retry-After) and retries;
+- limits concurrency with a priority queue so interactive endpoints go ahead of
+  background crawls (see background_priority()).
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from metrics import github_endpoint, github_request_duration, github_requests
+from timings import count
+
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "8"))
+# Requests left in the window that background work must leave for interactive endpoints
+GITHUB_INTERACTIVE_RESERVE = int(os.getenv("GITHUB_INTERACTIVE_RESERVE", "200"))
+# Longest we will sleep for a rate-limit reset before giving up and returning the error
+GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS = float(os.getenv("GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS", "60"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+GITHUB_ETAG_CACHE_MAX_BYTES = int(os.getenv("GITHUB_ETAG_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+GITHUB_ETAG_CACHE_ENTRY_MAX_BYTES = int(os.getenv("GITHUB_ETAG_CACHE_ENTRY_MAX_BYTES", str(1024 * 1024)))
+# File contents are stored by blob SHA in blob_store.py, so keeping their bodies here would duplicate them
+ETAG_CACHE_SKIP_HOSTS = {"raw.githubusercontent.com"}
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class RateLimitDeferred(HTTPException):
+    """A background request was held back: only the interactive reserve is left until retry_at"""
+
+    def __init__(self, retry_at: float):
+        super().__init__(status_code=503, detail="GitHub rate limit reserved for interactive requests; retry later",
+                         headers={"Retry-After": str(max(1, int(retry_at - time.time())))})
+        self.retry_at = retry_at
+
+_request_priority = contextvars.ContextVar("github_request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    """Run the GitHub calls made inside this block (and tasks it spawns) at background priority"""
+    token = _request_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class PrioritySemaphore:
+    """Semaphore whose waiters are woken lowest priority value first, FIFO within a priority"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted just as we were cancelled: hand the slot on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class GitHubClient:
+    """Shared, rate-limit-aware GitHub HTTP client with conditional-request caching"""
+
+    def __init__(self, token: Optional[str] = GITHUB_TOKEN, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 max_concurrency: int = GITHUB_MAX_CONCURRENCY):
+        self.token = token
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency),
+            follow_redirects=True,
+        )
+        self._slots = PrioritySemaphore(max_concurrency)
+        self._validators = OrderedDict()  # cache key -> (etag, last_modified, content, headers)
+        self._validator_bytes = 0
+
+        self.rate_limit = None
+        self.rate_remaining = None
+        self.rate_reset_at = None
+        self._next_background_at = 0.0
+        self.stats = {
+            "requests": 0,
+            "not_modified": 0,
+            "retries": 0,
+            "rate_limit_waits": 0,
+            "rate_limit_wait_seconds": 0.0,
+            "background_deferred": 0,
+        }
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _default_headers(self, url: str) -> dict:
+        headers = {}
+        if httpx.URL(url).host == "api.github.com":
+            headers["Accept"] = "application/vnd.github.v3+json"
+            if self.token:
+                headers["Authorization"] = f"token {self.token}"
+        return headers
+
+    # -- conditional request cache -------------------------------------------------
+
+    def _remember(self, key: str, response: httpx.Response):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        self._forget(key)
+        if not (etag or last_modified) or len(response.content) > GITHUB_ETAG_CACHE_ENTRY_MAX_BYTES \
+                or response.request.url.host in ETAG_CACHE_SKIP_HOSTS:
+            return
+        keep_headers = {k: v for k, v in response.headers.items() if k.lower() in ("content-type", "link", "etag", "last-modified")}
+        self._validators[key] = (etag, last_modified, response.content, keep_headers)
+        self._validator_bytes += len(response.content)
+        while self._validator_bytes > GITHUB_ETAG_CACHE_MAX_BYTES and self._validators:
+            self._forget(next(iter(self._validators)))
+
+    def _forget(self, key: str):
+        entry = self._validators.pop(key, None)
+        if entry is not None:
+            self._validator_bytes -= len(entry[2])
+
+    # -- rate limit accounting -----------------------------------------------------
+
+    def _update_rate_limit(self, response: httpx.Response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        limit = response.headers.get("X-RateLimit-Limit")
+        if remaining is not None and remaining.isdigit():
+            self.rate_remaining = int(remaining)
+        if reset is not None and reset.isdigit():
+            self.rate_reset_at = float(reset)
+        if limit is not None and limit.isdigit():
+            self.rate_limit = int(limit)
+
+    async def _sleep(self, seconds: float):
+        self.stats["rate_limit_waits"] += 1
+        self.stats["rate_limit_wait_seconds"] += seconds
+        await asyncio.sleep(seconds)
+
+    async def _wait_for_budget(self, priority: int):
+        """
+        Hold a request back when the rate-limit window is (nearly) spent. A background request
+        that would have to wait longer than GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS raises
+        RateLimitDeferred; an interactive one goes ahead and meets GitHub's own 403/429.
+        """
+        while self.rate_remaining is not None and self.rate_reset_at is not None:
+            now = time.time()
+            if now >= self.rate_reset_at:
+                return
+            reserve = GITHUB_INTERACTIVE_RESERVE if priority == BACKGROUND else 0
+            spendable = self.rate_remaining - reserve
+            if spendable > 0:
+                if priority == BACKGROUND and self.rate_limit and self.rate_remaining < self.rate_limit // 4:
+                    # Running low: spread background requests evenly over the rest of the window
+                    interval = (self.rate_reset_at - now) / spendable
+                    start_at = max(now, self._next_background_at)
+                    self._next_background_at = start_at + interval
+                    if start_at > now:
+                        await self._sleep(start_at - now)
+                return
+            wait = self.rate_reset_at - now + 1
+            if wait > GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS:
+                if priority == BACKGROUND:
+                    self.stats["background_deferred"] += 1
+                    count("github_background_deferred")
+                    raise RateLimitDeferred(self.rate_reset_at + 1)
+                return
+            await self._sleep(wait)
+
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying a throttled or failed response, or None if not retryable"""
+        if response.status_code in (403, 429):
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+            if response.headers.get("X-RateLimit-Remaining") == "0":
+                reset = response.headers.get("X-RateLimit-Reset")
+                if reset and reset.isdigit():
+                    return max(0.0, float(reset) - time.time() + 1)
+            if "secondary rate limit" in response.text.lower():
+                return 60.0 * (2 ** attempt)
+            return None
+        if response.status_code in (502, 503, 504):
+            return 2.0 ** attempt
+        return None
+
+    # -- requests ------------------------------------------------------------------
+
+    async def get(self, url: str, headers: Optional[dict] = None, params: Optional[dict] = None) -> httpx.Response:
+        """GET a GitHub URL; 304 answers are transparently turned into the cached 200 response"""
+        request_headers = {**self._default_headers(url), **(headers or {})}
+        request = self._client.build_request("GET", url, headers=request_headers, params=params)
+        cache_key = f"{request.url}|{request.headers.get('Accept', '')}"
+        priority = _request_priority.get()
+
+        for attempt in range(GITHUB_MAX_RETRIES + 1):
+            cached = self._validators.get(cache_key)
+            if cached is not None:
+                etag, last_modified = cached[0], cached[1]
+                if etag:
+                    request.headers["If-None-Match"] = etag
+                if last_modified:
+                    request.headers["If-Modified-Since"] = last_modified
+
+            await self._wait_for_budget(priority)
+            async with self._slots.slot(priority):
+                self.stats["requests"] += 1
+                started = time.perf_counter()
+                response = await self._client.send(request)
+                await response.aread()
+            endpoint = github_endpoint(request.url)
+            github_request_duration.observe(time.perf_counter() - started, endpoint=endpoint)
+            github_requests.inc(endpoint=endpoint, status=response.status_code)
+            count("github_requests")
+            count("github_bytes", len(response.content))
+            self._update_rate_limit(response)
+
+            if response.status_code == 304 and cached is not None:
+                self.stats["not_modified"] += 1
+                count("github_not_modified")
+                self._validators.move_to_end(cache_key)
+                return httpx.Response(200, content=cached[2], headers=cached[3], request=request)
+
+            if response.status_code == 200:
+                self._remember(cache_key, response)
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or delay > GITHUB_MAX_RATE_LIMIT_WAIT_SECONDS or attempt == GITHUB_MAX_RETRIES:
+                return response
+            self.stats["retries"] += 1
+            await self._sleep(delay)
+
+        return response
+
+    def status(self) -> dict:
+        return {
+            "rate_limit": self.rate_limit,
+            "rate_limit_remaining": self.rate_remaining,
+            "rate_limit_reset_at": self.rate_reset_at,
+            "conditional_cache_entries": len(self._validators),
+            "conditional_cache_bytes": self._validator_bytes,
+            **self.stats,
+        }
+
+
+_github_client: Optional[GitHubClient] = None
+
+
+def get_github_client() -> GitHubClient:
+    """The process-wide GitHub client, created on first use"""
+    global _github_client
+    if _github_client is None or _github_client.is_closed:
+        _github_client = GitHubClient()
+    return _github_client
+
+
+def configure_github_client(**kwargs) -> GitHubClient:
+    """Replace the shared client, e.g. with a mock transport for benchmarks"""
+    global _github_client
+    _github_client = GitHubClient(**kwargs)
+    return _github_client
+
+
+async def close_github_client():
+    if _github_client is not None and not _github_client.is_closed:
+        await _github_client.aclose()
+
+
+@asynccontextmanager
+async def github_session():
+    """Borrow the shared client for a block of GitHub calls (the client stays open afterwards)"""
+    yield get_github_client()
@@ -0,0 +1,207 @@
+"""
+Prometheus-style metrics without extra dependencies.
+
+Counters, gauges and histograms are registered on a module-level registry and rendered
+in the Prometheus text exposition format by render(). Values that already live
+elsewhere (GitHub rate-limit budget, cache statistics) are read at scrape time through
+collector callbacks instead of being copied into metrics.
+
+Metrics are per process: with several uvicorn workers, scrape each worker or sum them.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+from urllib.parse import urlsplit
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# (name, type, help, [(labels, value), ...]) as produced by collector callbacks
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self._labels(key))} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, total, n) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(labels)} {n}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Add a callback returning metric families computed at scrape time"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "gitlit_http_requests_total", "API requests served", ("route", "method", "status")))
+http_request_duration = REGISTRY.register(Histogram(
+    "gitlit_http_request_duration_seconds", "API request latency", ("route", "method")))
+http_in_flight = REGISTRY.register(Gauge(
+    "gitlit_http_requests_in_flight", "API requests currently being served", ("route",)))
+
+github_requests = REGISTRY.register(Counter(
+    "gitlit_github_requests_total", "Outbound GitHub requests (304s included)", ("endpoint", "status")))
+github_request_duration = REGISTRY.register(Histogram(
+    "gitlit_github_request_duration_seconds", "Outbound GitHub request latency", ("endpoint",)))
+
+confluence_requests = REGISTRY.register(Counter(
+    "gitlit_confluence_requests_total", "Outbound Confluence requests", ("method", "endpoint", "status")))
+confluence_request_duration = REGISTRY.register(Histogram(
+    "gitlit_confluence_request_duration_seconds", "Outbound Confluence request latency", ("method", "endpoint")))
+
+gemini_requests = REGISTRY.register(Counter(
+    "gitlit_gemini_requests_total", "Gemini generate_content calls", ("status", "tier")))
+gemini_request_duration = REGISTRY.register(Histogram(
+    "gitlit_gemini_request_duration_seconds", "Gemini call latency", ("tier",),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)))
+gemini_tokens = REGISTRY.register(Counter(
+    "gitlit_gemini_tokens_total", "Gemini prompt and response tokens", ("kind", "tier")))
+gemini_cost = REGISTRY.register(Counter(
+    "gitlit_gemini_cost_usd_total", "Estimated Gemini spend from token counts and tier prices", ("tier",)))
+
+
+_GITHUB_RESOURCES = {
+    "commits", "compare", "git", "trees", "blobs", "refs", "branches", "contents", "tags", "releases",
+    "pulls", "issues", "stats", "languages", "contributors", "repos",
+}
+
+
+def github_endpoint(url) -> str:
+    """Low-cardinality label for a GitHub URL: owner, repo, SHAs and paths are templated"""
+    parts = urlsplit(str(url))
+    if parts.hostname == "raw.githubusercontent.com":
+        return "raw/{owner}/{repo}/{ref}/{path}"
+    segments = [s for s in parts.path.split("/") if s]
+    if segments[:1] == ["repos"] and len(segments) >= 3:
+        template = ["repos", "{owner}", "{repo}"]
+        for segment in segments[3:]:
+            template.append(segment if segment in _GITHUB_RESOURCES else "{ref}")
+    elif segments[:1] == ["orgs"] and len(segments) >= 2:
+        template = ["orgs", "{org}"] + [s if s in _GITHUB_RESOURCES else "{ref}" for s in segments[2:]]
+    else:
+        template = segments[:1]
+    return "/" + "/".join(template)
+
+
+def confluence_endpoint(path: str) -> str:
+    """Low-cardinality label for a Confluence REST path (/content/{id}/property/{key} etc.)"""
+    segments = [s for s in path.split("?", 1)[0].split("/") if s]
+    template = []
+    for i, segment in enumerate(segments):
+        previous = segments[i - 1] if i else ""
+        if previous in ("content", "space", "property"):
+            template.append("{id}" if previous == "content" else "{key}")
+        else:
+            template.append(segment)
+    return "/" + "/".join(template)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,173 @@
+"""
+Minimal in-memory stand-in for the Confluence Cloud REST API, for exercising the
+publishing code without a real Confluence site.
+
+    cd backend
+    uvicorn mock_confluence:app --port 8090
+    CONFLUENCE_BASE_URL=http://localhost:8090 uvicorn backend:app
+
+Any username/token is accepted. Set MOCK_CONFLUENCE_FAIL_RATE (0-1) to answer that
+fraction of writes with 429/503, and MOCK_CONFLUENCE_MAX_BODY_BYTES to reject
+oversized page bodies with 413 like Confluence does.
+"""
+import itertools
+import os
+import random
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+FAIL_RATE = float(os.getenv("MOCK_CONFLUENCE_FAIL_RATE", "0"))
+MAX_BODY_BYTES = int(os.getenv("MOCK_CONFLUENCE_MAX_BODY_BYTES", "5000000"))
+
+app = FastAPI(title="Mock Confluence")
+
+pages = {}  # page id -> page dict
+_ids = itertools.count(1000)
+stats = {"writes": 0, "throttled": 0}
+
+
+def reset():
+    """Forget all pages and counters"""
+    pages.clear()
+    stats.update(writes=0, throttled=0)
+
+
+def _page_json(page: dict, expand: str = "") -> dict:
+    result = {
+        "id": page["id"],
+        "type": "page",
+        "title": page["title"],
+        "space": {"key": page["space"]},
+        "ancestors": [{"id": a} for a in page["ancestors"]],
+        "version": {"number": page["version"]},
+        "_links": {"webui": f"/spaces/{page['space']}/pages/{page['id']}"},
+    }
+    if "body.storage" in expand:
+        result["body"] = {"storage": {"value": page["body"], "representation": "storage"}}
+    if "metadata.properties" in expand:
+        result["metadata"] = {"properties": {key: {"key": key, **prop} for key, prop in page["properties"].items()}}
+    return result
+
+
+def _maybe_fail() -> Optional[JSONResponse]:
+    stats["writes"] += 1
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        stats["throttled"] += 1
+        if random.random() < 0.5:
+            return JSONResponse({"message": "Rate limited"}, status_code=429, headers={"Retry-After": "0"})
+        return JSONResponse({"message": "Service unavailable"}, status_code=503)
+    return None
+
+
+@app.get("/wiki/rest/api/space/{space_key}")
+async def get_space(space_key: str):
+    return {"key": space_key, "name": f"Mock space {space_key}"}
+
+
+@app.post("/wiki/rest/api/content")
+async def create_content(request: Request):
+    failure = _maybe_fail()
+    if failure:
+        return failure
+
+    data = await request.json()
+    body = data["body"]["storage"]["value"]
+    if len(body.encode("utf-8")) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Page body too large")
+
+    space = data["space"]["key"]
+    if any(p["space"] == space and p["title"] == data["title"] for p in pages.values()):
+        raise HTTPException(status_code=400, detail="A page with this title already exists")
+
+    page = {
+        "id": str(next(_ids)),
+        "title": data["title"],
+        "space": space,
+        "body": body,
+        "version": 1,
+        "ancestors": [a["id"] for a in data.get("ancestors", [])],
+        "properties": {},
+    }
+    pages[page["id"]] = page
+    return _page_json(page)
+
+
+@app.get("/wiki/rest/api/content")
+async def find_content(title: str = None, spaceKey: str = None, expand: str = ""):
+    matches = [
+        _page_json(p, expand) for p in pages.values()
+        if (title is None or p["title"] == title) and (spaceKey is None or p["space"] == spaceKey)
+    ]
+    return {"results": matches, "size": len(matches)}
+
+
+@app.put("/wiki/rest/api/content/{page_id}")
+async def update_content(page_id: str, request: Request):
+    failure = _maybe_fail()
+    if failure:
+        return failure
+    if page_id not in pages:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+    page = pages[page_id]
+    data = await request.json()
+    if data["version"]["number"] != page["version"] + 1:
+        raise HTTPException(status_code=409, detail="Version conflict")
+    body = data["body"]["storage"]["value"]
+    if len(body.encode("utf-8")) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="Page body too large")
+
+    page.update(title=data["title"], body=body, version=data["version"]["number"])
+    if data.get("ancestors"):
+        page["ancestors"] = [a["id"] for a in data["ancestors"]]
+    return _page_json(page)
+
+
+@app.delete("/wiki/rest/api/content/{page_id}", status_code=204)
+async def delete_content(page_id: str):
+    if pages.pop(page_id, None) is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+
+
+@app.get("/wiki/rest/api/content/{page_id}/property/{key}")
+async def get_property(page_id: str, key: str):
+    prop = pages.get(page_id, {}).get("properties", {}).get(key)
+    if prop is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    return {"key": key, **prop}
+
+
+@app.post("/wiki/rest/api/content/{page_id}/property")
+async def create_property(page_id: str, request: Request):
+    if page_id not in pages:
+        raise HTTPException(status_code=404, detail="Page not found")
+    data = await request.json()
+    prop = pages[page_id]["properties"][data["key"]] = {"value": data["value"], "version": {"number": 1}}
+    return {"key": data["key"], **prop}
+
+
+@app.put("/wiki/rest/api/content/{page_id}/property/{key}")
+async def update_property(page_id: str, key: str, request: Request):
+    prop = pages.get(page_id, {}).get("properties", {}).get(key)
+    if prop is None:
+        raise HTTPException(status_code=404, detail="Property not found")
+    data = await request.json()
+    if data["version"]["number"] != prop["version"]["number"] + 1:
+        raise HTTPException(status_code=409, detail="Version conflict")
+    prop.update(value=data["value"], version={"number": data["version"]["number"]})
+    return {"key": key, **prop}
+
+
+@app.get("/wiki/rest/api/content/{page_id}")
+async def get_content(page_id: str, expand: str = ""):
+    if page_id not in pages:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return _page_json(pages[page_id], expand)
+
+
+@app.get("/wiki/rest/api/content/{page_id}/child/page")
+async def get_child_pages(page_id: str):
+    children = [_page_json(p) for p in pages.values() if p["ancestors"] and p["ancestors"][-1] == page_id]
+    return {"results": children, "size": len(children)}
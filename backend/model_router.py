@@ -0,0 +1,152 @@
+"""
+Per-task Gemini model routing.
+
+Every prompt names the task it belongs to. Each task is served by a tier:
+
+- "fast" (GEMINI_FAST_MODEL, a flash-class model): era titles and summaries, the team
+  blurb of the collaborator analysis, and other short intermediate calls
+- "pro" (GEMINI_PRO_MODEL): the final documents, i.e. the changelog and the usage guide,
+  and answers to history questions
+
+Tasks that are not listed go to "pro". GEMINI_TASK_TIERS overrides the mapping, e.g.
+"era_summary=pro,qa=fast". Model clients are created on first use per model name, so
+importing this module does not load google.generativeai.
+
+Calls, errors, latency, tokens and an estimated cost (GEMINI_<TIER>_PRICE, USD per
+million prompt and response tokens) are accumulated per tier for /api/model-status and
+/metrics.
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+GEMINI_PRO_MODEL = os.getenv("GEMINI_PRO_MODEL", "models/gemini-2.5-pro")
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "models/gemini-2.5-flash")
+# "prompt,response" USD per million tokens
+GEMINI_PRO_PRICE = os.getenv("GEMINI_PRO_PRICE", "1.25,10.0")
+GEMINI_FAST_PRICE = os.getenv("GEMINI_FAST_PRICE", "0.30,2.50")
+GEMINI_TASK_TIERS = os.getenv("GEMINI_TASK_TIERS", "")
+
+DEFAULT_TIER = "pro"
+DEFAULT_TASK_TIERS = {
+    "changelog": "pro",
+    "usage_guide": "pro",
+    "qa": "pro",
+    "era_summary": "fast",
+    "team_summary": "fast",
+}
+
+
+@dataclass
+class ModelTier:
+    name: str
+    model: str
+    prompt_price: float  # USD per million prompt tokens
+    response_price: float  # USD per million response tokens
+
+    def cost(self, prompt_tokens: int, response_tokens: int) -> float:
+        return (prompt_tokens * self.prompt_price + response_tokens * self.response_price) / 1_000_000
+
+
+def _parse_price(value: str) -> tuple:
+    prompt_price, response_price = (float(part) for part in value.split(","))
+    return prompt_price, response_price
+
+
+def default_tiers() -> Dict[str, ModelTier]:
+    return {
+        "pro": ModelTier("pro", GEMINI_PRO_MODEL, *_parse_price(GEMINI_PRO_PRICE)),
+        "fast": ModelTier("fast", GEMINI_FAST_MODEL, *_parse_price(GEMINI_FAST_PRICE)),
+    }
+
+
+def parse_task_tiers(value: str) -> Dict[str, str]:
+    """Parse "task=tier,task=tier" into {task: tier}"""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        task, _, tier = item.partition("=")
+        overrides[task.strip()] = tier.strip()
+    return overrides
+
+
+_genai_configured = False
+
+
+def gemini_client(model: str):
+    """A google.generativeai model client (the SDK is imported and configured on first call)"""
+    global _genai_configured
+    import google.generativeai as genai
+    if not _genai_configured:
+        genai.configure(api_key=GOOGLE_API_KEY)
+        _genai_configured = True
+    return genai.GenerativeModel(model)
+
+
+class ModelRouter:
+    def __init__(self, tiers: Optional[Dict[str, ModelTier]] = None, task_tiers: Optional[Dict[str, str]] = None,
+                 client_factory: Callable[[str], object] = gemini_client):
+        self.tiers = tiers or default_tiers()
+        overrides = parse_task_tiers(GEMINI_TASK_TIERS) if task_tiers is None else task_tiers
+        self.task_tiers = {**DEFAULT_TASK_TIERS, **overrides}
+        unknown = {tier for tier in self.task_tiers.values() if tier not in self.tiers}
+        if unknown:
+            raise ValueError(f"Unknown model tier(s) {', '.join(sorted(unknown))}; expected one of {', '.join(self.tiers)}")
+        self._client_factory = client_factory
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.stats = {name: {"calls": 0, "errors": 0, "seconds": 0.0, "prompt_tokens": 0, "response_tokens": 0,
+                             "cost_usd": 0.0} for name in self.tiers}
+
+    def tier_for(self, task: str) -> ModelTier:
+        return self.tiers[self.task_tiers.get(task, DEFAULT_TIER)]
+
+    def client(self, tier: ModelTier):
+        with self._lock:
+            if tier.model not in self._clients:
+                self._clients[tier.model] = self._client_factory(tier.model)
+            return self._clients[tier.model]
+
+    def record(self, tier: ModelTier, seconds: float, prompt_tokens: int = 0, response_tokens: int = 0,
+               error: bool = False) -> float:
+        """Account one call to a tier; returns its estimated cost in USD"""
+        cost = tier.cost(prompt_tokens, response_tokens)
+        with self._lock:
+            stats = self.stats[tier.name]
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] += seconds
+            stats["prompt_tokens"] += prompt_tokens
+            stats["response_tokens"] += response_tokens
+            stats["cost_usd"] += cost
+        return cost
+
+    def status(self) -> dict:
+        with self._lock:
+            tiers = {
+                name: {"model": tier.model, **self.stats[name], "seconds": round(self.stats[name]["seconds"], 3),
+                       "cost_usd": round(self.stats[name]["cost_usd"], 6),
+                       "mean_seconds": round(self.stats[name]["seconds"] / self.stats[name]["calls"], 3)
+                       if self.stats[name]["calls"] else None}
+                for name, tier in self.tiers.items()
+            }
+        return {"default_tier": DEFAULT_TIER, "tasks": dict(self.task_tiers), "tiers": tiers}
+
+
+_model_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
+
+
+def configure_model_router(**kwargs) -> ModelRouter:
+    """Replace the shared router, e.g. with stub model clients for benchmarks"""
+    global _model_router
+    _model_router = ModelRouter(**kwargs)
+    return _model_router
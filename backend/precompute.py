@@ -0,0 +1,87 @@
+"""
+Debounced background jobs.
+
+Webhook bursts (a push of many commits, several pushes in quick succession) schedule
+the same job over and over. PrecomputeQueue waits for a quiet period per key and then
+runs only the most recently scheduled job, with a cap on how many jobs run at once.
+Jobs are GitHub background work; one held back by the rate-limit reserve
+(RateLimitDeferred) is scheduled again for when the window resets.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Hashable, Optional
+
+from github_client import RateLimitDeferred
+
+logger = logging.getLogger(__name__)
+
+
+class PrecomputeQueue:
+    def __init__(self, delay_seconds: float, max_concurrency: int):
+        self.delay_seconds = delay_seconds
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._pending = {}  # key -> task still inside its quiet period
+        self._running = set()
+        self._running_keys = Counter()
+        self.stats = {"scheduled": 0, "debounced": 0, "completed": 0, "failed": 0, "deferred": 0}
+
+    def schedule(self, key: Hashable, job: Callable[[], Awaitable], delay: Optional[float] = None):
+        """Run job after delay (default delay_seconds) without another schedule() for the same key"""
+        self.stats["scheduled"] += 1
+        if self.cancel(key):
+            self.stats["debounced"] += 1
+        self._pending[key] = asyncio.ensure_future(self._run_after_delay(key, job, delay))
+
+    def is_active(self, key: Hashable) -> bool:
+        """Whether a job for key is waiting or running"""
+        return key in self._pending or self._running_keys[key] > 0
+
+    def cancel(self, key: Hashable) -> bool:
+        """Drop a job that has not started yet; returns whether there was one"""
+        task = self._pending.pop(key, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def _run_after_delay(self, key: Hashable, job: Callable[[], Awaitable], delay: Optional[float] = None):
+        await asyncio.sleep(self.delay_seconds if delay is None else delay)
+        # Past the quiet period: later events schedule a fresh run instead of cancelling this one
+        task = self._pending.pop(key)
+        self._running.add(task)
+        self._running_keys[key] += 1
+        try:
+            async with self._slots:
+                await job()
+            self.stats["completed"] += 1
+        except RateLimitDeferred as e:
+            # Unless a newer push already rescheduled it, run again once the window has reset
+            self.stats["deferred"] += 1
+            if key not in self._pending:
+                self._pending[key] = asyncio.ensure_future(
+                    self._run_after_delay(key, job, max(self.delay_seconds, e.retry_at - time.time())))
+        except Exception:
+            self.stats["failed"] += 1
+            logger.exception("Background job for %s failed", key)
+        finally:
+            self._running.discard(task)
+            self._running_keys[key] -= 1
+            if not self._running_keys[key]:
+                del self._running_keys[key]
+
+    async def join(self):
+        """Wait until every scheduled job has run (used by replays and benchmarks)"""
+        while self._pending or self._running:
+            await asyncio.gather(*self._pending.values(), *self._running, return_exceptions=True)
+
+    async def shutdown(self):
+        tasks = [*self._pending.values(), *self._running]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._pending.clear()
+
+    def status(self) -> dict:
+        return {**self.stats, "pending": len(self._pending), "running": len(self._running)}
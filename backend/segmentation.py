@@ -0,0 +1,134 @@
+import re
+from collections import defaultdict
+from itertools import chain, count
+from typing import List, Optional
+
+import numpy as np
+
+# Number of hashed buckets used for the message vocabulary and directory features
+VOCAB_BUCKETS = 128
+DIR_BUCKETS = 32
+
+# Upper bound on candidate boundaries; larger histories are scored in blocks of commits
+MAX_BLOCKS = 4096
+
+# Relative weight of each signal in the combined change-point score
+RATE_WEIGHT = 1.0
+VOCAB_WEIGHT = 1.0
+DIR_WEIGHT = 1.0
+
+_token_re = re.compile(r"[a-z][a-z0-9_]{2,}")
+
+
+def _block_counts(rows: List[List[str]], blocks: np.ndarray, n_blocks: int, n_buckets: int) -> np.ndarray:
+    """Count tokens per (block of commits, hashed bucket) into an (n_blocks x n_buckets) matrix"""
+    ids = defaultdict(count().__next__)
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    cols = np.fromiter(map(ids.__getitem__, chain.from_iterable(rows)), dtype=np.int64, count=int(lengths.sum()))
+    flat = np.repeat(blocks, lengths) * n_buckets + cols % n_buckets
+    return np.bincount(flat, minlength=n_blocks * n_buckets).reshape(n_blocks, n_buckets).astype(np.float64)
+
+
+def _window_novelty(features: np.ndarray, window: int, cosine: bool = True) -> np.ndarray:
+    """
+    Distance between the mean feature vector of the `window` blocks before each
+    boundary and the `window` blocks after it. Uses prefix sums, so the cost is
+    O(n * d) regardless of the window size.
+    """
+    n = features.shape[0]
+    prefix = np.zeros((n + 1, features.shape[1]), dtype=np.float64)
+    np.cumsum(features, axis=0, out=prefix[1:])
+
+    boundaries = np.arange(1, n)
+    left = prefix[boundaries] - prefix[np.maximum(boundaries - window, 0)]
+    right = prefix[np.minimum(boundaries + window, n)] - prefix[boundaries]
+    if cosine:
+        left /= np.maximum(np.linalg.norm(left, axis=1, keepdims=True), 1e-12)
+        right /= np.maximum(np.linalg.norm(right, axis=1, keepdims=True), 1e-12)
+    return np.linalg.norm(left - right, axis=1)
+
+
+def _normalize(score: np.ndarray) -> np.ndarray:
+    peak = score.max() if score.size else 0.0
+    return score / peak if peak > 0 else score
+
+
+def find_change_points(dates: List[str], messages: List[str], n_segments: int = 4,
+                       paths: Optional[List[List[str]]] = None) -> List[int]:
+    """
+    Return the start indices of `n_segments` contiguous eras over a chronologically
+    ordered commit stream. Boundaries are placed at the strongest shifts in commit
+    rate, message vocabulary and (when per-commit file lists are given) touched
+    top-level directories.
+    """
+    n = len(dates)
+    n_segments = max(1, min(n_segments, n))
+    if n_segments == 1:
+        return [0]
+    if n_segments == n:
+        return list(range(n))
+
+    # Aggregate commits into at most MAX_BLOCKS blocks; boundaries are placed between blocks
+    block_size = -(-n // MAX_BLOCKS)
+    blocks = np.arange(n, dtype=np.int64) // block_size
+    n_blocks = int(blocks[-1]) + 1
+    block_starts = np.arange(n_blocks) * block_size
+    if n_segments > n_blocks:
+        return sorted(set(int(i) for i in np.linspace(0, n, n_segments, endpoint=False)))
+
+    window = max(1, n_blocks // (n_segments * 2))
+    # Minimum era length in blocks: half the mean era length, rounded up
+    min_gap = -(-n_blocks // (n_segments * 2))
+
+    # Commit rate: mean log of the gap (seconds) since the previous commit. The first commit
+    # has no previous one; it takes the second commit's gap rather than a spurious zero
+    timestamps = np.array([d[:19] for d in dates], dtype="datetime64[s]").astype(np.int64)
+    gaps = np.diff(timestamps, prepend=timestamps[0]).astype(np.float64)
+    gaps[0] = gaps[1]
+    log_gaps = np.log1p(np.clip(gaps, 0, None))
+    rate = np.stack([
+        np.bincount(blocks, weights=log_gaps, minlength=n_blocks),
+        np.bincount(blocks, minlength=n_blocks).astype(np.float64),
+    ], axis=1)
+    prefix = np.zeros((n_blocks + 1, 2))
+    np.cumsum(rate, axis=0, out=prefix[1:])
+    bounds = np.arange(1, n_blocks)
+    left = prefix[bounds] - prefix[np.maximum(bounds - window, 0)]
+    right = prefix[np.minimum(bounds + window, n_blocks)] - prefix[bounds]
+    score = RATE_WEIGHT * _normalize(np.abs(left[:, 0] / left[:, 1] - right[:, 0] / right[:, 1]))
+
+    # Message vocabulary (subject line only)
+    tokens = [_token_re.findall(m.split("\n", 1)[0].lower()) for m in messages]
+    vocab = _block_counts(tokens, blocks, n_blocks, VOCAB_BUCKETS)
+    score += VOCAB_WEIGHT * _normalize(_window_novelty(vocab, window))
+
+    # Touched top-level directories, only when the caller has per-commit file lists
+    if paths is not None:
+        top_dirs = [[p.split("/", 1)[0] if "/" in p else "." for p in commit_paths] for commit_paths in paths]
+        dirs = _block_counts(top_dirs, blocks, n_blocks, DIR_BUCKETS)
+        score += DIR_WEIGHT * _normalize(_window_novelty(dirs, window))
+
+    # Pick the strongest boundaries, suppressing neighbours so eras keep a minimum size.
+    # score[i] is the boundary before block i + 1.
+    score[: min_gap - 1] = -np.inf
+    score[max(0, n_blocks - min_gap):] = -np.inf
+    starts = []
+    for _ in range(n_segments - 1):
+        best = int(np.argmax(score))
+        if not np.isfinite(score[best]):
+            break
+        starts.append(int(block_starts[best + 1]))
+        score[max(0, best - min_gap + 1):best + min_gap] = -np.inf
+
+    return [0] + sorted(starts)
+
+
+def cluster_messages(messages: List[str], n_clusters: int) -> List[int]:
+    """Cluster label of every commit message (TF-IDF vectors grouped by KMeans)"""
+    # scikit-learn is only needed here, so it is imported on first use
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.cluster import KMeans
+
+    X = TfidfVectorizer(stop_words="english").fit_transform(messages)
+    kmeans = KMeans(n_clusters=min(n_clusters, len(messages)), random_state=42, n_init=10)
+    return kmeans.fit_predict(X).tolist()
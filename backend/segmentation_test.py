@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from segmentation import find_change_points
+
+
+def daily_dates(n: int, spacing=lambda i: i) -> list:
+    start = datetime(2024, 1, 1)
+    return [(start + timedelta(days=spacing(i))).strftime("%Y-%m-%dT%H:%M:%SZ") for i in range(n)]
+
+
+def test_first_commit_does_not_form_its_own_era():
+    # Evenly spaced commits with one message: no signal, but no one-commit eras either
+    assert find_change_points(daily_dates(10), ["fix parser bug"] * 10, 4) == [0, 3, 5, 7]
+
+
+def test_boundaries_follow_message_vocabulary():
+    messages = ["fix parser"] * 2 + ["add docs"] * 3 + ["refactor api"] * 3 + ["release"] * 2
+    assert find_change_points(daily_dates(10), messages, 4) == [0, 2, 5, 8]
+
+
+def test_boundary_follows_commit_rate():
+    # Daily commits, then one every ten days from the sixth on
+    dates = daily_dates(10, lambda i: i if i < 5 else 5 + (i - 5) * 10)
+    assert find_change_points(dates, ["fix parser bug"] * 10, 2) == [0, 6]
+
+
+def test_boundaries_follow_touched_directories():
+    paths = [["api/routes.py"]] * 5 + [["web/app.jsx"]] * 5
+    assert find_change_points(daily_dates(10), ["update"] * 10, 2, paths) == [0, 5]
@@ -0,0 +1,67 @@
+"""
+Request coalescing for expensive analyses.
+
+Concurrent calls with the same key share one in-flight computation: the first caller
+starts it, later callers wait on the same task, and everyone gets its result (or its
+exception). Once the task finishes the key is released, so the next call after that
+starts fresh (caching finished results is left to the document caches).
+"""
+import asyncio
+import functools
+import inspect
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight = {}
+        self.stats = {"started": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["started"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.stats["coalesced"] += 1
+        # Shield the shared task so one waiter disconnecting does not cancel it for the others
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved so an unawaited failure is not logged twice
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+
+flights = SingleFlight()
+
+
+def single_flight(name: str, key_func: Optional[Callable[..., Hashable]] = None):
+    """
+    Coalesce concurrent calls of an async function that have identical arguments.
+
+    The key is (name, key_func(**arguments)) when key_func is given, otherwise (name, all
+    bound arguments). functools.wraps keeps the signature visible to FastAPI.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if key_func is not None:
+                key = (name, key_func(**bound.arguments))
+            else:
+                key = (name, tuple(sorted(bound.arguments.items())))
+            return await flights.do(key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
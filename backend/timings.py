@@ -0,0 +1,139 @@
+"""
+Lightweight per-request instrumentation.
+
+Every request gets a RequestTrace (set by the tracing middleware in backend.py) that
+collects named phase durations and counters: outbound HTTP calls and bytes, Gemini
+calls and prompt/response sizes. Code marks phases with `with span("fetch_commits"):`
+and counts with count(); both are no-ops outside a request. Tasks spawned by a request
+inherit its trace, so concurrent work is attributed to the request that started it
+(phase durations of concurrent spans add up, and phases may nest).
+
+The trace is returned as the Server-Timing header on every response and as the
+`timings` field of the analysis response models.
+
+With PROFILE_REQUESTS=1, a request carrying `X-Profile: 1` (or `?profile=1`) is also
+profiled (pyinstrument if installed, else cProfile) and the report written to
+PROFILE_DIR. The profiler sees everything on the event loop, so profile on an otherwise
+idle worker.
+"""
+import contextvars
+import os
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "profiles"))
+
+_current_trace = contextvars.ContextVar("request_trace", default=None)
+
+
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}  # name -> [seconds, count]
+        self.counters = defaultdict(int)
+
+    def add_phase(self, name: str, seconds: float):
+        phase = self.phases.setdefault(name, [0.0, 0])
+        phase[0] += seconds
+        phase[1] += 1
+
+    def summary(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "phases": {name: {"seconds": round(seconds, 6), "count": n} for name, (seconds, n) in self.phases.items()},
+            **self.counters,
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in milliseconds)"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.phases.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def start_trace():
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """Time a phase of the current request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(name, time.perf_counter() - started)
+
+
+def count(name: str, value: int = 1):
+    """Add to a counter of the current request"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.counters[name] += value
+
+
+def trace_summary() -> Optional[dict]:
+    """Timings collected so far for the current request (None outside a request)"""
+    trace = _current_trace.get()
+    return trace.summary() if trace is not None else None
+
+
+class RequestProfiler:
+    """Profiles one request and writes the report to PROFILE_DIR"""
+
+    def __init__(self, label: str):
+        self.label = re.sub(r"[^\w.-]+", "_", label).strip("_") or "root"
+        try:
+            from pyinstrument import Profiler
+            self._profiler = Profiler(async_mode="enabled")
+            self._kind = "pyinstrument"
+        except ImportError:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._kind = "cprofile"
+
+    def start(self):
+        if self._kind == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self) -> str:
+        """Stop profiling and return the report path"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stem = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.label}")
+        if self._kind == "pyinstrument":
+            self._profiler.stop()
+            path = stem + ".html"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self._profiler.output_html())
+        else:
+            self._profiler.disable()
+            path = stem + ".prof"
+            self._profiler.dump_stats(path)
+        return path
+
+
+def wants_profile(headers, query_params) -> bool:
+    if not PROFILE_REQUESTS:
+        return False
+    flag = headers.get("X-Profile") or query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
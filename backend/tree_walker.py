@@ -0,0 +1,104 @@
+"""
+Complete repository trees, even for very large repositories.
+
+GitHub's recursive tree listing stops at about 100,000 entries (or 7 MB) and flags the
+response with "truncated": true. When that happens, the tree is walked one directory
+at a time instead: subtrees are listed non-recursively and concurrently, and vendored
+or build-output directories (file_ranking.EXCLUDED_DIRS) are pruned before they are
+requested.
+
+Tree objects are immutable, so every listing is cached by its SHA. An unchanged
+subdirectory keeps its SHA across commits and is never requested again.
+"""
+import asyncio
+import hashlib
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from doc_cache import create_document_cache
+from file_ranking import EXCLUDED_DIRS
+
+# One-level directory listings and assembled recursive trees, both keyed by git object SHA
+tree_cache = create_document_cache("git_trees")
+
+_ENTRY_FIELDS = ("path", "type", "sha", "size")
+
+
+def _compact(entry: dict, prefix: str = "") -> dict:
+    compact = {field: entry[field] for field in _ENTRY_FIELDS if field in entry}
+    compact["path"] = prefix + entry["path"]
+    return compact
+
+
+async def _list_tree(client, owner: str, repo: str, tree_sha: str, headers: dict, stats: dict) -> Optional[List[dict]]:
+    """Non-recursive listing of one tree object, or None if GitHub refused it"""
+    key = f"{owner}/{repo}".lower() + f"|{tree_sha}"
+    entries = tree_cache.get(key)
+    if entries is not None:
+        stats["cached_subtrees"] += 1
+        return entries
+    resp = await client.get(f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}", headers=headers)
+    stats["subtree_requests"] += 1
+    if resp.status_code != 200:
+        return None
+    entries = [_compact(entry) for entry in resp.json().get("tree", [])]
+    tree_cache.set(key, entries)
+    return entries
+
+
+async def _walk(client, owner: str, repo: str, tree_sha: str, prefix: str, headers: dict, prune: set,
+                stats: dict) -> List[dict]:
+    entries = await _list_tree(client, owner, repo, tree_sha, headers, stats)
+    if entries is None:
+        stats["incomplete"] = True
+        return []
+    files = [_compact(entry, prefix) for entry in entries if entry["type"] != "tree"]
+    subtrees = []
+    for entry in entries:
+        if entry["type"] == "tree":
+            if entry["path"] in prune:
+                stats["pruned"] += 1
+            else:
+                subtrees.append(entry)
+    nested = await asyncio.gather(*(
+        _walk(client, owner, repo, entry["sha"], prefix + entry["path"] + "/", headers, prune, stats)
+        for entry in subtrees
+    ))
+    for subtree_files in nested:
+        files.extend(subtree_files)
+    return files
+
+
+async def fetch_repository_tree(client, owner: str, repo: str, tree_ish: str, headers: dict,
+                                prune: set = EXCLUDED_DIRS) -> dict:
+    """
+    Every file of a commit or tree as {"tree": [entries], "truncated": bool, ...}.
+
+    Tries the single recursive request first; only when GitHub truncates it is the tree
+    walked directory by directory. "truncated" is True only if some subtree could not be
+    listed at all.
+    """
+    prune_key = hashlib.sha1("/".join(sorted(prune)).encode("utf-8")).hexdigest()[:12]
+    key = f"{owner}/{repo}".lower() + f"|{tree_ish}|recursive|{prune_key}"
+    assembled = tree_cache.get(key)
+    if assembled is not None:
+        return assembled
+
+    tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_ish}?recursive=1"
+    resp = await client.get(tree_url, headers=headers)
+    if resp.status_code != 200:
+        raise HTTPException(status_code=resp.status_code, detail="Failed to fetch repository tree")
+    data = resp.json()
+
+    if not data.get("truncated"):
+        assembled = {"sha": data.get("sha"), "tree": [_compact(entry) for entry in data.get("tree", [])],
+                     "truncated": False, "walked": False}
+    else:
+        stats = {"subtree_requests": 0, "cached_subtrees": 0, "pruned": 0, "incomplete": False}
+        files = await _walk(client, owner, repo, data["sha"], "", headers, set(prune), stats)
+        assembled = {"sha": data["sha"], "tree": files, "truncated": stats.pop("incomplete"), "walked": True, **stats}
+
+    if not assembled["truncated"]:
+        tree_cache.set(key, assembled)
+    return assembled
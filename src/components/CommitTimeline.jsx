@@ -20,18 +20,47 @@ const TimelineButton = ({ onClick, disabled }) => (
   </button>
 );
 
+const ERA_COMMITS_PAGE_SIZE = 100;
+
 const EvolutionTimeline = ({ repoUrl, branch, onClose }) => {
   const [eras, setEras] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState("");
   const [selectedEra, setSelectedEra] = useState(null);
+  // Commits of the selected era, loaded page by page: { commits, nextOffset, loading, error }
+  const [eraCommits, setEraCommits] = useState(null);
+
+  const loadEraCommits = (era, offset = 0) => {
+    setEraCommits((prev) => ({ commits: offset && prev ? prev.commits : [], nextOffset: null, loading: true, error: "" }));
+    fetch(
+      `http://localhost:8000/api/evolution-timeline/era-commits?repo_url=${encodeURIComponent(repoUrl)}&branch=${encodeURIComponent(branch)}&era=${era.era}&offset=${offset}&limit=${ERA_COMMITS_PAGE_SIZE}`
+    )
+      .then((res) => {
+        if (!res.ok) throw new Error("Failed to load commits");
+        return res.json();
+      })
+      .then((data) =>
+        setEraCommits((prev) => ({
+          commits: [...(offset && prev ? prev.commits : []), ...data.commits],
+          nextOffset: data.next_offset,
+          loading: false,
+          error: "",
+        }))
+      )
+      .catch((err) => setEraCommits((prev) => ({ ...prev, loading: false, error: err.message })));
+  };
+
+  const selectEra = (era) => {
+    setSelectedEra(era);
+    loadEraCommits(era);
+  };
 
   useEffect(() => {
     if (!repoUrl || !branch) return;
     setLoading(true);
     setError("");
     fetch(
-      `http://localhost:8000/api/evolution-timeline?repo_url=${encodeURIComponent(repoUrl)}&branch=${encodeURIComponent(branch)}`
+      `http://localhost:8000/api/evolution-timeline?repo_url=${encodeURIComponent(repoUrl)}&branch=${encodeURIComponent(branch)}&summary_only=true`
     )
       .then((res) => {
         if (!res.ok) throw new Error("Failed to generate evolution timeline");
@@ -72,7 +101,7 @@ const EvolutionTimeline = ({ repoUrl, branch, onClose }) => {
                   <div key={idx} className="relative flex flex-col items-center" style={{ minWidth: '120px' }}>
                     {/* Era point clickable */}
                     <div className={`w-16 h-16 bg-gradient-to-br from-blue-400 via-indigo-500 to-purple-500 rounded-full border-4 border-white shadow-2xl flex items-center justify-center cursor-pointer transition-transform duration-200 ${selectedEra === era ? 'scale-110 ring-4 ring-purple-400' : 'hover:scale-110'}`}
-                      onClick={() => setSelectedEra(era)}
+                      onClick={() => selectEra(era)}
                     >
                       <span className="text-white font-extrabold text-2xl drop-shadow-lg">{idx + 1}</span>
                     </div>
@@ -92,7 +121,10 @@ const EvolutionTimeline = ({ repoUrl, branch, onClose }) => {
             <div className="bg-white rounded-2xl shadow-2xl p-8 max-w-xl w-full relative flex flex-col items-center border-2 border-blue-400">
               <button
                 className="absolute top-4 right-4 text-gray-500 hover:text-gray-700 bg-white rounded-full shadow-lg p-2"
-                onClick={() => setSelectedEra(null)}
+                onClick={() => {
+                  setSelectedEra(null);
+                  setEraCommits(null);
+                }}
                 aria-label="Close Era Details"
               >
                 <svg className="w-6 h-6" fill="none" stroke="currentColor" strokeWidth="2" viewBox="0 0 24 24">
@@ -101,9 +133,9 @@ const EvolutionTimeline = ({ repoUrl, branch, onClose }) => {
               </button>
               <h3 className="text-2xl font-bold text-blue-700 mb-4 text-center w-full">{selectedEra.era_title}</h3>
               <div className="mb-4 text-gray-700 whitespace-pre-line text-center w-full max-w-lg font-medium">{cleanFullSummary(selectedEra.summary)}</div>
-              <div className="mb-2 text-xs text-gray-500">Commits: {selectedEra.commits.length}</div>
+              <div className="mb-2 text-xs text-gray-500">Commits: {selectedEra.commit_count}</div>
               <ul className="space-y-2 w-full max-h-[35vh] overflow-y-auto px-2">
-                {selectedEra.commits.map((commit) => (
+                {(eraCommits?.commits || []).map((commit) => (
                   <li key={commit.sha} className="bg-gray-100 rounded p-2 text-xs flex flex-col gap-1 shadow">
                     <div><span className="font-bold">SHA:</span> {commit.sha.slice(0, 7)}</div>
                     <div><span className="font-bold">Author:</span> {commit.author}</div>
@@ -111,6 +143,18 @@ const EvolutionTimeline = ({ repoUrl, branch, onClose }) => {
                     <div><span className="font-bold">Message:</span> {cleanMessage(commit.message)}</div>
                   </li>
                 ))}
+                {eraCommits?.loading && <li className="text-xs text-gray-500 text-center animate-pulse">Loading commits...</li>}
+                {eraCommits?.error && <li className="text-xs text-red-500 text-center">{eraCommits.error}</li>}
+                {eraCommits && !eraCommits.loading && eraCommits.nextOffset != null && (
+                  <li className="text-center">
+                    <button
+                      className="text-xs text-blue-700 font-semibold hover:underline"
+                      onClick={() => loadEraCommits(selectedEra, eraCommits.nextOffset)}
+                    >
+                      Load more commits
+                    </button>
+                  </li>
+                )}
               </ul>
             </div>
           </div>